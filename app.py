@@ -1,25 +1,362 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-import matplotlib.patches as patches
-import tkinter as tk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import time
 import math
+import time
+import sys
+import argparse
 import socket
 import struct
 import threading
 import queue
+import asyncio
+import os
+import logging
+from collections import OrderedDict, deque
+
+import metrics
+
+# matplotlib and tkinter are imported lazily by ArmVisualizer/ArmGUI so the
+# kinematics and transport can be used headless without paying for them
+
+log = logging.getLogger('robotic_arm')
+# Per-command messages; sampled by metrics.setup_logging
+command_log = logging.getLogger('robotic_arm.commands')
+
+# Command-path metrics, recorded only after metrics.enable()
+IK_SECONDS = metrics.histogram('arm_ik_seconds', "Time in RoboticArm.inverse_kinematics")
+MOVE_SECONDS = metrics.histogram('arm_move_seconds', "Animated move time from request to final command")
+FRAME_SECONDS = metrics.histogram('arm_frame_seconds', "Animation frame update and render time")
+QUEUE_WAIT_SECONDS = metrics.histogram('arm_send_queue_wait_seconds',
+                                       "Time from send_angles until the command is written")
+SEND_SECONDS = metrics.histogram('arm_send_seconds', "Socket write time (sendall, or write + drain)")
+BYTES_SENT = metrics.counter('arm_bytes_sent_total', "Bytes written to arm sockets")
+COMMANDS_SENT = metrics.counter('arm_commands_sent_total', "Pose commands written")
+FRAMES_SENT = metrics.counter('arm_stream_frames_sent_total', "Waypoint and command batch frames written")
+COMMANDS_COALESCED = metrics.counter('arm_commands_coalesced_total',
+                                     "Commands replaced by a newer one before being sent")
+DRAG_EVENTS_COALESCED = metrics.counter('arm_drag_events_coalesced_total',
+                                        "Canvas drag events replaced by a newer one before the next frame")
+CONNECTIONS = metrics.counter('arm_connections_total', "Accepted arm connections, reconnects included")
+SEND_ERRORS = metrics.counter('arm_send_errors_total', "Failed socket writes")
+
+def record_write(start, nbytes, queued_at=None, sent=COMMANDS_SENT, count=1):
+    """
+    Record a finished socket write.
+    
+    Args:
+        start (float): time.perf_counter() before the write, None when
+            metrics were disabled
+        nbytes (int): Bytes written
+        queued_at (float): time.perf_counter() when the command was queued
+        sent (metrics.Counter): Counter of written messages
+        count (int): Messages in the write
+    """
+    if start is None:
+        return
+    SEND_SECONDS.observe(time.perf_counter() - start)
+    if queued_at is not None:
+        QUEUE_WAIT_SECONDS.observe(start - queued_at)
+    BYTES_SENT.inc(nbytes)
+    sent.inc(count)
+
+def pack_angles(theta1, theta2, *wrist):
+    """
+    Pack joint angles into the firmware's wire format: one int32 of whole
+    degrees per joint (8 bytes for the two-joint arm).
+    
+    Joints after the second (e.g. a wrist) are sent as 90 plus their
+    relative angle wrapped to (-180, 180], so 90 means straight. The
+    firmware must be built with the same JOINT_COUNT.
+    
+    Args:
+        theta1 (float): First joint angle in radians
+        theta2 (float): Second joint angle in radians
+        *wrist (float): Further joint angles in radians
+        
+    Returns:
+        tuple: (packed bytes, theta1_deg, theta2_deg, *wrist_deg)
+    """
+    theta1_deg = int(np.degrees(theta1))
+    # Send the absolute value of theta2 degrees (e.g., 115.78°)
+    theta2_deg = int(abs(np.degrees(theta2)))
+    wrist_deg = [int(90 + (np.degrees(angle) + 180) % 360 - 180) for angle in wrist]
+    # Pack as one integer per joint
+    degrees = (theta1_deg, theta2_deg, *wrist_deg)
+    return (struct.pack('i' * len(degrees), *degrees),) + degrees
+
+# Waypoint batch frame: header (magic, count, flags) + count x (t_ms, theta1, theta2)
+# with angles in unsigned centi-degrees. The magic can never be a legacy angle,
+# which lets the firmware tell the two message types apart.
+STREAM_MAGIC = 0x314A5254           # b"TRJ1"
+STREAM_FLAG_NEW = 0x0001            # First batch of a new move: reset time base
+STREAM_HEADER = struct.Struct('<IHH')
+STREAM_WAYPOINT = struct.Struct('<IHH')
+STREAM_MAX_BATCH = 32
+
+def format_joint_angles(angles):
+    """
+    Log/GUI text for joint angles in radians, matching what the servos get.
+    
+    Uses the absolute value for theta2 and the relative angle for further
+    joints.
+    
+    Args:
+        angles (sequence): Joint angles in radians, base first
+        
+    Returns:
+        str: e.g. 'theta1=90.0°, theta2=45.0°'
+    """
+    degrees = np.degrees(angles)
+    parts = [f"theta1={degrees[0]:.1f}°", f"theta2={abs(degrees[1]):.1f}°"]
+    parts += [f"theta{i}={(deg + 180) % 360 - 180:.1f}°" for i, deg in enumerate(degrees[2:], 3)]
+    return ", ".join(parts)
+
+def format_degrees(degrees):
+    """Log text for wire angles, e.g. 'theta1=90°, theta2=45°'."""
+    return ", ".join(f"theta{i}={deg}°" for i, deg in enumerate(degrees, 1))
+
+def pack_waypoints(waypoints, new_stream=False):
+    """
+    Pack time-stamped joint waypoints into one batch frame.
+    
+    Angles are converted to the same servo-side values as pack_angles
+    (theta1 in degrees, |theta2| in degrees) at 0.01° resolution.
+    
+    Args:
+        waypoints (list): (t, theta1, theta2) tuples, t in seconds from
+            the start of the move and angles in radians
+        new_stream (bool): Mark this as the first batch of a new move
+        
+    Returns:
+        bytes: The packed frame
+    """
+    if not waypoints:
+        raise ValueError("a waypoint frame needs at least one waypoint")
+    if len(waypoints) > STREAM_MAX_BATCH:
+        raise ValueError(f"at most {STREAM_MAX_BATCH} waypoints per frame")
+    flags = STREAM_FLAG_NEW if new_stream else 0
+    frame = bytearray(STREAM_HEADER.size + STREAM_WAYPOINT.size * len(waypoints))
+    STREAM_HEADER.pack_into(frame, 0, STREAM_MAGIC, len(waypoints), flags)
+    offset = STREAM_HEADER.size
+    for t, theta1, theta2 in waypoints:
+        # Wrap theta1 to (-180, 180] and keep it inside the servo range
+        theta1_deg = min(max((np.degrees(theta1) + 180) % 360 - 180, 0.0), 180.0)
+        theta2_deg = abs(np.degrees(theta2)) % 360
+        STREAM_WAYPOINT.pack_into(frame, offset, int(round(t * 1000)),
+                                  int(round(theta1_deg * 100)), int(round(theta2_deg * 100)))
+        offset += STREAM_WAYPOINT.size
+    return bytes(frame)
+
+# Framed command protocol: header (magic, body length, version, flags), then a
+# batch header (sequence number of the first command, sender timestamp in us,
+# command count, joints per command) and count x joints int16 joint angles in
+# centi-degrees. The length prefix lets the firmware skip frames it cannot
+# parse without losing sync, and the magic can never be a legacy angle.
+FRAME_MAGIC = 0x324D5241            # b"ARM2"
+FRAME_VERSION = 1
+FRAME_FLAG_REPLACE = 0x01           # Drop queued commands before running these
+FRAME_HEADER = struct.Struct('<IHBB')
+FRAME_BATCH = struct.Struct('<IIBB')
+FRAME_MAX_COMMANDS = 32
+FRAME_MAX_JOINTS = 8
+
+def wire_centidegrees(angles):
+    """
+    Convert joint angles to the framed protocol's int16 centi-degrees.
+    
+    The values are the ones pack_angles sends (theta1, |theta2|, 90 plus
+    the relative wrist angles), rounded to 0.01° instead of truncated to
+    whole degrees and wrapped to (-180, 180] to fit an int16. The firmware
+    adds 360° to negative values, which restores the legacy 0-360 range.
+    
+    Args:
+        angles (array_like): (..., joints) joint angles in radians
+        
+    Returns:
+        ndarray: int16 array of the same shape
+    """
+    degrees = np.degrees(np.asarray(angles, dtype=float))
+    degrees[..., 1] = np.abs(degrees[..., 1])
+    degrees[..., 2:] = 90 + (degrees[..., 2:] + 180) % 360 - 180
+    cdeg = np.round(degrees * 100).astype(np.int64)
+    return ((cdeg + 17999) % 36000 - 17999).astype(np.int16)
+
+def pose_centidegrees(angles):
+    """
+    wire_centidegrees for a single pose, without numpy overhead.
+    
+    Args:
+        angles (sequence): Joint angles in radians
+        
+    Returns:
+        list: int centi-degrees
+    """
+    degrees = [math.degrees(angle) for angle in angles]
+    degrees[1] = abs(degrees[1])
+    for i in range(2, len(degrees)):
+        degrees[i] = 90 + (degrees[i] + 180) % 360 - 180
+    return [(round(degree * 100) + 17999) % 36000 - 17999 for degree in degrees]
+
+class FramePacker:
+    def __init__(self, max_commands=FRAME_MAX_COMMANDS, max_joints=FRAME_MAX_JOINTS):
+        """
+        Packs framed command batches into a preallocated buffer.
+        
+        pack() returns a memoryview of the buffer, so a command costs no
+        allocation. The view is only valid until the next pack(); a writer
+        that keeps a reference past that (e.g. an asyncio transport that
+        buffered it) must call detach().
+        
+        Args:
+            max_commands (int): Largest batch
+            max_joints (int): Most joints per command
+        """
+        self.max_commands = max_commands
+        self.max_joints = max_joints
+        self.size = FRAME_HEADER.size + FRAME_BATCH.size + 2 * max_commands * max_joints
+        self.sequence = 0
+        self.detach()
+        
+    def detach(self):
+        """Switch to a fresh buffer, leaving views already returned intact."""
+        self.buffer = bytearray(self.size)
+        self.view = memoryview(self.buffer)
+        
+    def pack(self, commands, replace=True):
+        """
+        Pack commands into one frame.
+        
+        Args:
+            commands (array_like): (count, joints) joint angles in radians
+            replace (bool): The firmware drops queued commands first
+            
+        Returns:
+            memoryview: The frame
+        """
+        return self.pack_centidegrees(wire_centidegrees(np.atleast_2d(commands)), replace)
+        
+    def pack_centidegrees(self, cdeg, replace=True, timestamp=None):
+        """
+        Pack commands already converted with wire_centidegrees.
+        
+        Each command takes the next sequence number.
+        
+        Args:
+            cdeg (ndarray): (count, joints) int16 centi-degrees
+            replace (bool): The firmware drops queued commands first
+            timestamp (int): Sender time in us (wraps at 2**32), default
+                time.monotonic()
+                
+        Returns:
+            memoryview: The frame
+        """
+        count, joints = cdeg.shape
+        offset = self._pack_headers(count, joints, replace, timestamp)
+        # Write the angles straight into the buffer
+        np.frombuffer(self.buffer, dtype='<i2', count=count * joints, offset=offset)[:] = cdeg.ravel()
+        return self.view[:offset + 2 * count * joints]
+    
+    def pack_pose(self, cdeg, replace=True, timestamp=None):
+        """
+        Pack a single command from pose_centidegrees (the fast path for
+        send_angles).
+        
+        Args:
+            cdeg (list): int centi-degrees, one per joint
+            replace (bool): The firmware drops queued commands first
+            timestamp (int): Sender time in us, default time.monotonic()
+            
+        Returns:
+            memoryview: The frame
+        """
+        joints = len(cdeg)
+        offset = self._pack_headers(1, joints, replace, timestamp)
+        struct.pack_into(f'<{joints}h', self.buffer, offset, *cdeg)
+        return self.view[:offset + 2 * joints]
+    
+    def _pack_headers(self, count, joints, replace, timestamp):
+        """Write both headers, take the sequence numbers, return the data offset."""
+        if not 0 < count <= self.max_commands or not 0 < joints <= self.max_joints:
+            raise ValueError(f"frame holds 1-{self.max_commands} commands of "
+                             f"1-{self.max_joints} joints, got {count} x {joints}")
+        if timestamp is None:
+            timestamp = int(time.monotonic() * 1e6)
+        FRAME_HEADER.pack_into(self.buffer, 0, FRAME_MAGIC, FRAME_BATCH.size + 2 * count * joints,
+                               FRAME_VERSION, FRAME_FLAG_REPLACE if replace else 0)
+        FRAME_BATCH.pack_into(self.buffer, FRAME_HEADER.size, self.sequence & 0xFFFFFFFF,
+                              timestamp & 0xFFFFFFFF, count, joints)
+        self.sequence += count
+        return FRAME_HEADER.size + FRAME_BATCH.size
+
+def pack_command(packer, angles):
+    """
+    Pack one pose command for a sender.
+    
+    Args:
+        packer (FramePacker): Framed protocol packer, None for the legacy
+            int32 format
+        angles (tuple): Joint angles in radians
+        
+    Returns:
+        tuple: (data, wire degrees for logging)
+    """
+    if packer is None:
+        data, *degrees = pack_angles(*angles)
+        return data, degrees
+    cdeg = pose_centidegrees(angles)
+    return packer.pack_pose(cdeg), [d / 100 for d in cdeg]
+
+def unpack_frame(data, offset=0):
+    """
+    Decode one framed command batch (used by the emulator and benchmarks).
+    
+    Args:
+        data (bytes): Buffer holding the frame
+        offset (int): Start of the frame
+        
+    Returns:
+        tuple: (flags, sequence, timestamp_us, (count, joints) int16
+            centi-degree array, offset after the frame)
+    """
+    magic, body, version, flags = FRAME_HEADER.unpack_from(data, offset)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError(f"not a version {FRAME_VERSION} command frame")
+    sequence, timestamp, count, joints = FRAME_BATCH.unpack_from(data, offset + FRAME_HEADER.size)
+    start = offset + FRAME_HEADER.size + FRAME_BATCH.size
+    cdeg = np.frombuffer(data, dtype='<i2', count=count * joints, offset=start).reshape(count, joints)
+    return flags, sequence, timestamp, cdeg, offset + FRAME_HEADER.size + body
+
+PROTOCOLS = ('framed', 'legacy')
+
+# Senders transport.make_sender can create (asyncio/threaded TCP, UDP, in-process)
+TRANSPORTS = ('asyncio', 'threaded', 'udp', 'loopback')
+
+def make_packer(protocol):
+    """
+    Get the packer for a sender's wire protocol.
+    
+    Args:
+        protocol (str): 'framed' (FRAME_MAGIC batches, firmware with the
+            framed receiver) or 'legacy' (bare int32 degrees)
+        
+    Returns:
+        FramePacker: Packer, or None for the legacy format
+    """
+    if protocol not in PROTOCOLS:
+        raise ValueError(f"unknown protocol: {protocol!r}")
+    return FramePacker() if protocol == 'framed' else None
 
 class TCPSender:
-    def __init__(self, port=3000):
+    def __init__(self, port=3000, protocol='framed'):
         """
         Initialize the TCP sender.
         
         Args:
             port (int): Port number to use for TCP communication
+            protocol (str): Wire protocol, 'framed' or 'legacy'
         """
         self.port = port
+        self.protocol = protocol
+        self.packer = make_packer(protocol)
         self.server_socket = None
         self.client_socket = None
         self.running = False
@@ -41,7 +378,7 @@ class TCPSender:
     def _server_thread(self):
         """Server thread function to handle connections."""
         try:
-            print("Starting TCP server, waiting for connection...")
+            log.info("Starting TCP server, waiting for connection...")
             server_address = ("", self.port)
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -51,7 +388,8 @@ class TCPSender:
             while self.running:
                 try:
                     self.client_socket, client_address = self.server_socket.accept()
-                    print(f"Connection established from: {client_address}")
+                    log.info("Connection established from: %s", client_address)
+                    CONNECTIONS.inc()
                     self.connected = True
                     
                     # Wait for the client to disconnect
@@ -61,7 +399,7 @@ class TCPSender:
                 except socket.timeout:
                     continue
                 except Exception as e:
-                    print(f"Connection error: {e}")
+                    log.warning("Connection error: %s", e)
                     self.connected = False
                     
                 # Reset for next connection
@@ -70,7 +408,7 @@ class TCPSender:
                     self.client_socket = None
                     
         except Exception as e:
-            print(f"Server thread error: {e}")
+            log.error("Server thread error: %s", e)
         finally:
             self.cleanup()
             
@@ -84,24 +422,23 @@ class TCPSender:
                     
                 try:
                     # Get data with timeout to allow checking running status
-                    angles = self.send_queue.get(timeout=0.1)
+                    angles, queued_at = self.send_queue.get(timeout=0.1)
                     
                     # Send the final target angles
                     if self.connected and self.client_socket:
-                        theta1_deg = int(np.degrees(angles[0]))
-                        # Send the absolute value of theta2 degrees (e.g., 115.78°)
-                        theta2_deg = int(abs(np.degrees(angles[1])))
-                        # Pack as two integers
-                        packed_data = struct.pack('ii', theta1_deg, theta2_deg)
+                        packed_data, degrees = pack_command(self.packer, angles)
+                        start = time.perf_counter() if metrics.enabled else None
                         self.client_socket.sendall(packed_data)
-                        print(f"[Sent] FINAL TARGET ANGLES: theta1={theta1_deg}°, theta2={theta2_deg}°")
+                        record_write(start, len(packed_data), queued_at)
+                        command_log.info("[Sent] FINAL TARGET ANGLES: %s", format_degrees(degrees))
                         
                 except queue.Empty:
                     # Queue empty, continue loop
                     continue
                     
             except Exception as e:
-                print(f"Sender error: {e}")
+                log.warning("Sender error: %s", e)
+                SEND_ERRORS.inc()
                 self.connected = False
                 if self.client_socket:
                     try:
@@ -111,23 +448,24 @@ class TCPSender:
                     self.client_socket = None
                 time.sleep(0.1)
                 
-    def send_angles(self, theta1, theta2):
+    def send_angles(self, *angles):
         """
         Add angles to the send queue.
         
         Args:
-            theta1 (float): First joint angle in radians
-            theta2 (float): Second joint angle in radians
+            *angles (float): Joint angles in radians (theta1, theta2, ...)
         """
         # Clear the queue first to make sure we only have the most recent angles
         while not self.send_queue.empty():
             try:
                 self.send_queue.get_nowait()
+                COMMANDS_COALESCED.inc()
             except queue.Empty:
                 break
                 
-        # Add the new target angles to the queue
-        self.send_queue.put((theta1, theta2))
+        # Add the new target angles to the queue, stamped for the wait metric
+        queued_at = time.perf_counter() if metrics.enabled else None
+        self.send_queue.put((angles, queued_at))
                 
     def cleanup(self):
         """Clean up sockets and threads."""
@@ -146,17 +484,499 @@ class TCPSender:
             except:
                 pass
 
+def queue_frames(slot, waypoints, new_stream):
+    """
+    Pack waypoints into frames on a sender slot's frame queue.
+    
+    Args:
+        slot: Object with frames/pending/last_angles (a sender or ArmLink)
+        waypoints (list): (t, theta1, theta2) tuples
+        new_stream (bool): First batch of a new move
+    """
+    if new_stream:
+        slot.frames.clear()
+        # A streamed move supersedes any single-pose command still pending
+        if slot.pending is not None:
+            COMMANDS_COALESCED.inc()
+        slot.pending = None
+    for i in range(0, len(waypoints), STREAM_MAX_BATCH):
+        slot.frames.append(pack_waypoints(waypoints[i:i + STREAM_MAX_BATCH],
+                                          new_stream and i == 0))
+    if waypoints:
+        # A reconnecting arm is sent the end of the stream as a plain pose
+        slot.last_angles = tuple(waypoints[-1][1:])
+
+def queue_batch(slot, commands, replace=False):
+    """
+    Pack pose commands into frames on a sender slot's frame queue.
+    
+    Args:
+        slot: Object with packer/frames/last_angles (a sender or ArmLink)
+        commands (array_like): (count, joints) joint angles in radians
+        replace (bool): First frame replaces the firmware's queued poses
+    """
+    if slot.packer is None:
+        raise ValueError("command batches need the framed protocol")
+    commands = np.atleast_2d(np.asarray(commands, dtype=float))
+    for i in range(0, len(commands), FRAME_MAX_COMMANDS):
+        frame = slot.packer.pack(commands[i:i + FRAME_MAX_COMMANDS], replace and i == 0)
+        # Frames wait in the queue, so they get their own copy
+        slot.frames.append(bytes(frame))
+    if len(commands):
+        slot.last_angles = tuple(commands[-1])
+
+class AsyncTCPSender:
+    def __init__(self, port=3000, keepalive_idle=2, keepalive_interval=1, keepalive_count=3,
+                 protocol='framed'):
+        """
+        Initialize the asyncio TCP sender.
+        
+        Same surface as TCPSender (start_server, send_angles, cleanup,
+        connected, port) but event driven: one event loop thread serves the
+        socket, sends are pushed as soon as send_angles is called, and a
+        new connection replaces the current one immediately.
+        
+        Args:
+            port (int): Port number to use for TCP communication
+            keepalive_idle (int): Seconds of idle before keepalive probes
+            keepalive_interval (int): Seconds between keepalive probes
+            keepalive_count (int): Failed probes before the peer is dropped
+            protocol (str): Wire protocol, 'framed' or 'legacy'
+        """
+        self.port = port
+        self.protocol = protocol
+        self.packer = make_packer(protocol)
+        self.keepalive = (keepalive_idle, keepalive_interval, keepalive_count)
+        self.running = False
+        self.connected = False
+        self.loop = None
+        self.loop_thread = None
+        self.server = None
+        self.writer = None
+        
+        # Latest-value slot: only the most recent angles are ever sent
+        self.pending = None
+        self.pending_since = None
+        self.last_angles = None
+        self.wakeup = None
+        self.ready = threading.Event()
+        
+        # Waypoint frames are sent in order, never coalesced
+        self.frames = deque()
+        
+    def start_server(self):
+        """Start the event loop and TCP server in a background thread."""
+        self.running = True
+        self.loop_thread = threading.Thread(target=self._run_loop)
+        self.loop_thread.daemon = True
+        self.loop_thread.start()
+        self.ready.wait(5)
+        
+    def _run_loop(self):
+        """Event loop thread function."""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.wakeup = asyncio.Event()
+        self.loop = loop
+        try:
+            log.info("Starting TCP server, waiting for connection...")
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle_client, "", self.port, reuse_address=True))
+            self.ready.set()
+            self.loop.run_forever()
+        except Exception as e:
+            log.error("Server thread error: %s", e)
+        finally:
+            self.ready.set()
+            self.running = False
+            self.connected = False
+            self.loop.close()
+            
+    def _configure_socket(self, sock):
+        """Disable Nagle and enable keepalive so dead peers are noticed."""
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        idle, interval, count = self.keepalive
+        # Keepalive tuning options are platform specific
+        for name, value in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval),
+                            ('TCP_KEEPCNT', count)):
+            if hasattr(socket, name):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+        
+    async def _handle_client(self, reader, writer):
+        """Serve one connection until it drops or is replaced."""
+        client_address = writer.get_extra_info('peername')
+        self._configure_socket(writer.get_extra_info('socket'))
+        
+        # A reconnecting ESP32 replaces whatever connection we had
+        if self.writer is not None:
+            self.writer.close()
+        self.writer = writer
+        self.connected = True
+        CONNECTIONS.inc()
+        log.info("Connection established from: %s", client_address)
+        
+        # Commands may have been lost with the old connection, so bring a
+        # reconnecting arm to the latest pose straight away
+        self.frames.clear()
+        if self.pending is None:
+            self.pending = self.last_angles
+        
+        sender = asyncio.ensure_future(self._send_loop(writer))
+        try:
+            # The firmware never sends data, so a read only returns on
+            # EOF, reset or keepalive failure
+            while await reader.read(256):
+                pass
+        except (ConnectionError, OSError) as e:
+            log.warning("Connection error: %s", e)
+        except asyncio.CancelledError:
+            # Shutting down
+            pass
+        finally:
+            sender.cancel()
+            writer.close()
+            if self.writer is writer:
+                self.writer = None
+                self.connected = False
+                log.info("Connection closed: %s", client_address)
+                
+    async def _send_loop(self, writer, slot=None):
+        """
+        Write the pending angles whenever send_angles signals.
+        
+        Args:
+            writer (asyncio.StreamWriter): Connection to write to
+            slot: Object holding pending/wakeup for this connection
+                (defaults to the sender itself)
+        """
+        slot = slot if slot is not None else self
+        try:
+            while True:
+                if slot.frames:
+                    # Coalesce all queued waypoint frames into one write
+                    count = len(slot.frames)
+                    data = b''.join(slot.frames)
+                    slot.frames.clear()
+                    start = time.perf_counter() if metrics.enabled else None
+                    writer.write(data)
+                    await writer.drain()
+                    record_write(start, len(data), sent=FRAMES_SENT, count=count)
+                    continue
+                if slot.pending is None:
+                    slot.wakeup.clear()
+                    await slot.wakeup.wait()
+                    continue
+                angles, slot.pending = slot.pending, None
+                queued_at = slot.pending_since
+                packed_data, degrees = pack_command(slot.packer, angles)
+                start = time.perf_counter() if metrics.enabled else None
+                writer.write(packed_data)
+                if slot.packer is not None and writer.transport.get_write_buffer_size():
+                    # The transport may still reference the packer's buffer
+                    slot.packer.detach()
+                await writer.drain()
+                record_write(start, len(packed_data), queued_at)
+                command_log.info("[Sent] FINAL TARGET ANGLES: %s", format_degrees(degrees))
+        except asyncio.CancelledError:
+            pass
+        except (ConnectionError, OSError) as e:
+            log.warning("Sender error: %s", e)
+            SEND_ERRORS.inc()
+            writer.close()
+            
+    def send_angles(self, *angles):
+        """
+        Set the angles to send, replacing any not yet sent.
+        
+        Args:
+            *angles (float): Joint angles in radians (theta1, theta2, ...)
+        """
+        if self.pending is not None:
+            COMMANDS_COALESCED.inc()
+        self.pending_since = time.perf_counter() if metrics.enabled else None
+        self.pending = angles
+        self.last_angles = self.pending
+        if self.loop is not None and self.running:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+            
+    def send_batch(self, commands, replace=False):
+        """
+        Queue poses the firmware runs in order (framed protocol only).
+        
+        Unlike send_angles, batches are never coalesced. The firmware
+        queues up to FRAME_MAX_COMMANDS poses.
+        
+        Args:
+            commands (array_like): (count, joints) joint angles in radians
+            replace (bool): Drop poses the firmware has queued but not run
+        """
+        queue_batch(self, commands, replace)
+        if self.loop is not None and self.running:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+            
+    def send_waypoints(self, waypoints, new_stream=False):
+        """
+        Queue a batch of time-stamped waypoints for streaming.
+        
+        A new stream drops any frames of the previous move not yet sent.
+        
+        Args:
+            waypoints (list): (t, theta1, theta2) tuples, see pack_waypoints
+            new_stream (bool): First batch of a new move
+        """
+        queue_frames(self, waypoints, new_stream)
+        if self.loop is not None and self.running:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+            
+    def cleanup(self):
+        """Close the connection and stop the event loop."""
+        if not self.running or self.loop is None:
+            self.running = False
+            return
+        self.running = False
+        self.connected = False
+        
+        async def shutdown():
+            if self.server is not None:
+                self.server.close()
+            if self.writer is not None:
+                self.writer.close()
+            # Let connection handlers finish before stopping the loop
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.loop.stop()
+            
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop)
+        except RuntimeError:
+            pass
+        if self.loop_thread is not threading.current_thread():
+            self.loop_thread.join(2)
+
+def jacobian_2link(theta1, theta2, l1, l2):
+    """
+    Analytic Jacobian of a 2-link chain's end effector.
+    
+    All arguments broadcast together, so one call covers many arms or
+    poses.
+    
+    Args:
+        theta1 (array_like): First joint angles in radians
+        theta2 (array_like): Second joint angles in radians
+        l1 (array_like): First segment lengths in cm
+        l2 (array_like): Second segment lengths in cm
+        
+    Returns:
+        ndarray: (..., 2, 2) matrices d(y, z) / d(theta1, theta2)
+    """
+    theta12 = np.add(theta1, theta2)
+    s1, c1 = np.multiply(l1, np.sin(theta1)), np.multiply(l1, np.cos(theta1))
+    s12, c12 = np.multiply(l2, np.sin(theta12)), np.multiply(l2, np.cos(theta12))
+    return np.stack((np.stack((-s1 - s12, -s12), axis=-1),
+                     np.stack((c1 + c12, c12), axis=-1)), axis=-2)
+
+def dls_velocity(theta1, theta2, vy, vz, l1, l2, damping=0.5, threshold=0.15):
+    """
+    Damped-least-squares joint velocities for a Cartesian velocity.
+    
+    The Jacobian determinant is l1 * l2 * sin(theta2), which vanishes at
+    full extension (theta2 = 0) and at the fully folded inner limit
+    |l1 - l2| (theta2 = pi). Damping is applied only when the
+    manipulability |det J| drops below threshold * l1 * l2 and grows
+    smoothly to damping**2 at the singularity, so away from the limits
+    this is the exact inverse.
+    
+    Args:
+        theta1 (array_like): First joint angles in radians
+        theta2 (array_like): Second joint angles in radians
+        vy (array_like): Cartesian y velocities (or displacements)
+        vz (array_like): Cartesian z velocities (or displacements)
+        l1 (array_like): First segment lengths in cm
+        l2 (array_like): Second segment lengths in cm
+        damping (float): Damping factor at the singularity (> 0), in cm
+        threshold (float): Fraction of the peak manipulability below
+            which damping starts
+            
+    Returns:
+        tuple: (w1, w2) joint velocities (or displacements)
+    """
+    theta12 = np.add(theta1, theta2)
+    s1, c1 = np.multiply(l1, np.sin(theta1)), np.multiply(l1, np.cos(theta1))
+    s12, c12 = np.multiply(l2, np.sin(theta12)), np.multiply(l2, np.cos(theta12))
+    a, b, c, d = -s1 - s12, -s12, c1 + c12, c12
+    
+    # Singularity-aware damping from the manipulability |det J|
+    peak = np.multiply(l1, l2)
+    w = np.abs(peak * np.sin(theta2))
+    w0 = threshold * peak
+    lam2 = np.where(w < w0, damping**2 * (1 - (w / w0)**2), 0.0)
+    
+    # J^T (J J^T + lambda^2 I)^-1 v with the 2x2 inverse written out
+    m11 = a * a + b * b + lam2
+    m12 = a * c + b * d
+    m22 = c * c + d * d + lam2
+    det = m11 * m22 - m12 * m12
+    u1 = (m22 * vy - m12 * vz) / det
+    u2 = (m11 * vz - m12 * vy) / det
+    return a * u1 + c * u2, b * u1 + d * u2
+
+def dls_step(theta1, theta2, y, z, l1, l2, damping=0.5, threshold=0.15, max_error=2.0):
+    """
+    One differential IK step towards a target, warm-started from a pose.
+    
+    Angles change continuously (no wrapping), and the step never crosses
+    into the elbow-down branch: if it would, theta2 stops on the straight
+    (or folded) boundary. Vectorized across arms like dls_velocity.
+    
+    Args:
+        theta1 (array_like): Current first joint angles in radians
+        theta2 (array_like): Current second joint angles in radians
+        y (array_like): Target y coordinates in cm
+        z (array_like): Target z coordinates in cm
+        l1 (array_like): First segment lengths in cm
+        l2 (array_like): Second segment lengths in cm
+        damping (float): See dls_velocity
+        threshold (float): See dls_velocity
+        max_error (float): Longest Cartesian error in cm corrected in one
+            step; larger errors are scaled down to keep the step stable
+            
+    Returns:
+        tuple: (theta1, theta2, error) new angles and the Cartesian error
+            in cm before the step
+    """
+    theta12 = np.add(theta1, theta2)
+    ey = y - (np.multiply(l1, np.cos(theta1)) + np.multiply(l2, np.cos(theta12)))
+    ez = z - (np.multiply(l1, np.sin(theta1)) + np.multiply(l2, np.sin(theta12)))
+    error = np.hypot(ey, ez)
+    scale = np.minimum(1.0, max_error / np.maximum(error, 1e-12))
+    d1, d2 = dls_velocity(theta1, theta2, ey * scale, ez * scale, l1, l2, damping, threshold)
+    new1 = theta1 + d1
+    new2 = theta2 + d2
+    
+    # Elbow-up means sin(theta2) <= 0
+    new2 = np.where(np.sin(new2) > 0, np.round(new2 / np.pi) * np.pi, new2)
+    return new1, new2, error
+
+def fk_2link(theta1s, theta2s, l1, l2):
+    """
+    Joint and end positions for many angle pairs at once.
+    
+    Args:
+        theta1s (array_like): First joint angles in radians
+        theta2s (array_like): Second joint angles in radians
+        l1 (float or array_like): First segment lengths in cm
+        l2 (float or array_like): Second segment lengths in cm
+        
+    Returns:
+        tuple: (j2_pos, ee_pos) arrays of shape (..., 2) holding the
+            (y, z) coordinates of the second joint and end effector
+    """
+    theta1s, theta2s = np.broadcast_arrays(np.asarray(theta1s, dtype=float),
+                                           np.asarray(theta2s, dtype=float))
+    
+    # Position of second joint (first joint is always at origin)
+    j2_y = l1 * np.cos(theta1s)
+    j2_z = l1 * np.sin(theta1s)
+    
+    # Position of end effector
+    theta12 = theta1s + theta2s
+    ee_y = j2_y + l2 * np.cos(theta12)
+    ee_z = j2_z + l2 * np.sin(theta12)
+    
+    return np.stack((j2_y, j2_z), axis=-1), np.stack((ee_y, ee_z), axis=-1)
+
+def ik_2link(ys, zs, l1, l2, limits=None):
+    """
+    Elbow-up joint angles for many targets at once.
+    
+    Same solution, reach clamping and angle normalization as
+    RoboticArm.inverse_kinematics. The lengths may be arrays broadcasting
+    with the targets, one arm per element.
+    
+    Args:
+        ys (array_like): Target y coordinates in cm
+        zs (array_like): Target z coordinates in cm
+        l1 (float or array_like): First segment lengths in cm
+        l2 (float or array_like): Second segment lengths in cm
+        limits (workspace.JointLimits): Servo limits, or None
+        
+    Returns:
+        tuple: (theta1s, theta2s, reachable) where the angles are float
+            arrays in radians and reachable is a boolean array
+    """
+    # Ensure positive coordinates; at least 1-D so the limits can patch
+    # elements in place, reshaped back at the end
+    ys, zs, l1, l2 = np.broadcast_arrays(np.abs(np.asarray(ys, dtype=float)),
+                                         np.abs(np.asarray(zs, dtype=float)),
+                                         np.asarray(l1, dtype=float), np.asarray(l2, dtype=float))
+    shape = ys.shape
+    ys, zs, l1, l2 = np.atleast_1d(ys, zs, l1, l2)
+    target_ys, target_zs = ys, zs
+    
+    distance = np.hypot(ys, zs)
+    max_reach = l1 + l2
+    min_reach = np.abs(l1 - l2)
+    
+    too_far = distance > max_reach
+    too_close = distance < min_reach
+    reachable = ~(too_far | too_close)
+    
+    # Pull unreachable targets onto the reach limits along their direction
+    angle = np.arctan2(zs, ys)
+    radius = np.where(too_far, max_reach * 0.99,
+                      np.where(too_close, min_reach * 1.01, distance))
+    ys = np.where(reachable, ys, radius * np.cos(angle))
+    zs = np.where(reachable, zs, radius * np.sin(angle))
+    
+    # Law of cosines to get theta2 (negative for elbow-up)
+    cos_theta2 = (ys**2 + zs**2 - l1**2 - l2**2) / (2 * l1 * l2)
+    cos_theta2 = np.clip(cos_theta2, -1.0, 1.0)
+    theta2s = -np.arccos(cos_theta2)
+    
+    # Get theta1 using atan2
+    k1 = l1 + l2 * np.cos(theta2s)
+    k2 = l2 * np.sin(theta2s)
+    theta1s = np.arctan2(zs, ys) - np.arctan2(k2, k1)
+    
+    # Normalize angles the same way as the scalar path
+    theta1s = (theta1s + 2*np.pi) % (2*np.pi)
+    theta2s = theta2s + 2*np.pi
+    
+    # Replace poses outside the servo limits by the nearest feasible ones
+    if limits is not None:
+        outside = ~limits.contains(theta1s, theta2s)
+        if outside.any():
+            theta1s[outside], theta2s[outside] = limits.project(
+                target_ys[outside], target_zs[outside], l1[outside], l2[outside])
+            reachable = reachable & ~outside
+    
+    return theta1s.reshape(shape), theta2s.reshape(shape), reachable.reshape(shape)
+
 class RoboticArm:
-    def __init__(self, l1, l2):
+    def __init__(self, l1, l2, port=3000, tcp_sender=None, limits=None, transport='asyncio'):
         """
         Initialize the robotic arm with two segments.
         
+        The sender is created but not started; call
+        tcp_sender.start_server() to open the port.
+        
         Args:
             l1 (float): Length of the first segment in cm
             l2 (float): Length of the second segment in cm
+            port (int): Port number for the default sender
+            tcp_sender: Sender to use instead (e.g. the threaded TCPSender)
+            limits (workspace.JointLimits): Servo limits the IK must respect
+                (e.g. workspace.FIRMWARE_LIMITS), or None for the full
+                reach annulus
+            transport (str): Transport of the default sender, one of
+                TRANSPORTS (see transport.make_sender)
         """
         self.l1 = l1
         self.l2 = l2
+        self.limits = limits
         
         # Starting position (angles in radians)
         self.theta1 = np.pi/2  # 90 degrees
@@ -173,9 +993,21 @@ class RoboticArm:
         self.target_theta1 = None
         self.target_theta2 = None
         
-        # Create TCP sender
-        self.tcp_sender = TCPSender()
-        self.tcp_sender.start_server()
+        # Optional IKCache placed in front of inverse_kinematics
+        self.ik_cache = None
+        
+        # Optional TrajectoryStreamer; when set, moves are streamed as
+        # waypoints instead of a single final target
+        self.streamer = None
+        
+        # Optional recorder.SessionRecorder logging every final command
+        self.recorder = None
+        
+        # Create the sender (started explicitly by the caller)
+        if tcp_sender is None:
+            from transport import make_sender
+            tcp_sender = make_sender(transport, port)
+        self.tcp_sender = tcp_sender
         
     def forward_kinematics(self, theta1, theta2):
         """
@@ -216,6 +1048,8 @@ class RoboticArm:
             tuple: (theta1, theta2) joint angles in radians
             bool: Whether the target is reachable
         """
+        start = time.perf_counter() if metrics.enabled else None
+        
         # Ensure positive coordinates
         y = abs(y)
         z = abs(z)
@@ -223,6 +1057,38 @@ class RoboticArm:
         # Save target
         self.target = (y, z)
         
+        # Use the cache layer when one is attached
+        if self.ik_cache is not None:
+            theta1, theta2, self.reachable = self.ik_cache.lookup(y, z)
+        else:
+            theta1, theta2, self.reachable = self._solve_ik(y, z)
+        
+        if start is not None:
+            IK_SECONDS.observe(time.perf_counter() - start)
+        
+        # Store target angles for TCP sending
+        self.target_theta1 = theta1
+        self.target_theta2 = theta2
+        
+        return theta1, theta2, self.reachable
+
+    def _solve_ik(self, y, z):
+        """
+        Closed-form elbow-up IK for a single positive (y, z) target.
+        Does not modify the arm state.
+        
+        With joint limits, a solution outside them is replaced by the
+        nearest feasible pose and reported as unreachable.
+        
+        Args:
+            y (float): Target y coordinate in cm (non-negative)
+            z (float): Target z coordinate in cm (non-negative)
+            
+        Returns:
+            tuple: (theta1, theta2, reachable)
+        """
+        target_y, target_z = y, z
+        
         # Calculate distance from base to target
         distance = np.sqrt(y**2 + z**2)
         
@@ -231,7 +1097,7 @@ class RoboticArm:
         min_reach = abs(self.l1 - self.l2)
         
         if distance > max_reach or distance < min_reach:
-            self.reachable = False
+            reachable = False
             # If unreachable, aim in the direction of the target but at max reach
             if distance > max_reach:
                 angle = np.arctan2(z, y)
@@ -243,7 +1109,7 @@ class RoboticArm:
                 y = min_reach * np.cos(angle) * 1.01  # Slightly over min reach
                 z = min_reach * np.sin(angle) * 1.01
         else:
-            self.reachable = True
+            reachable = True
         
         # Law of cosines to get theta2
         cos_theta2 = (y**2 + z**2 - self.l1**2 - self.l2**2) / (2 * self.l1 * self.l2)
@@ -263,11 +1129,166 @@ class RoboticArm:
         #theta2 = (theta2 + 2*np.pi) % (2*np.pi)
         theta2 = (theta2 + 2*np.pi)
         
-        # Store target angles for TCP sending
+        if self.limits is not None and not self.limits.contains(theta1, theta2):
+            theta1, theta2 = self.limits.project(target_y, target_z, self.l1, self.l2)
+            return float(theta1), float(theta2), False
+        
+        return theta1, theta2, reachable
+
+    def forward_kinematics_batch(self, theta1s, theta2s):
+        """
+        Calculate joint and end positions for many angle pairs at once.
+        Pure function: the arm state is not modified.
+
+        Args:
+            theta1s (array_like): First joint angles in radians
+            theta2s (array_like): Second joint angles in radians
+
+        Returns:
+            tuple: (j2_pos, ee_pos) arrays of shape (..., 2) holding the
+                (y, z) coordinates of the second joint and end effector
+        """
+        return fk_2link(theta1s, theta2s, self.l1, self.l2)
+
+    def inverse_kinematics_batch(self, ys, zs):
+        """
+        Calculate joint angles for many target positions at once.
+        Uses the same elbow-up solution, reach clamping and angle
+        normalization as inverse_kinematics, without touching arm state.
+
+        Args:
+            ys (array_like): Target y coordinates in cm
+            zs (array_like): Target z coordinates in cm
+
+        Returns:
+            tuple: (theta1s, theta2s, reachable) where the angles are float
+                arrays in radians and reachable is a boolean array
+        """
+        return ik_2link(ys, zs, self.l1, self.l2, self.limits)
+
+    def jacobian(self, theta1=None, theta2=None):
+        """
+        Analytic Jacobian of the end effector position.
+        
+        Args:
+            theta1 (float): First joint angle, defaults to the current one
+            theta2 (float): Second joint angle, defaults to the current one
+            
+        Returns:
+            ndarray: 2x2 matrix d(y, z) / d(theta1, theta2)
+        """
+        theta1 = self.theta1 if theta1 is None else theta1
+        theta2 = self.theta2 if theta2 is None else theta2
+        return jacobian_2link(theta1, theta2, self.l1, self.l2)
+    
+    def joint_velocities(self, vy, vz, damping=0.5, threshold=0.15):
+        """
+        Joint velocities that move the end effector at (vy, vz) from the
+        current pose, damped near singularities (see dls_velocity).
+        
+        Args:
+            vy (float): End effector y velocity in cm/s
+            vz (float): End effector z velocity in cm/s
+            damping (float): Damping factor at the singularity
+            threshold (float): Manipulability fraction where damping starts
+            
+        Returns:
+            tuple: (w1, w2) joint velocities in rad/s
+        """
+        w1, w2 = dls_velocity(self.theta1, self.theta2, vy, vz, self.l1, self.l2,
+                              damping, threshold)
+        return float(w1), float(w2)
+    
+    def differential_ik(self, y, z, iterations=1, damping=0.5, threshold=0.15, max_error=2.0):
+        """
+        Track a (moving) target incrementally from the current angles.
+        
+        Unlike inverse_kinematics this never re-normalizes the angles, so
+        nearby targets always give nearby angles. With joint limits every
+        step is clamped into them. Intended to run once per
+        control tick; the arm state is not modified, apart from the target
+        and target angles used by send_target_angles.
+        
+        Args:
+            y (float): Target y coordinate in cm
+            z (float): Target z coordinate in cm
+            iterations (int): DLS steps to take this call
+            damping (float): Damping factor at the singularity
+            threshold (float): Manipulability fraction where damping starts
+            max_error (float): Longest error in cm corrected per step
+            
+        Returns:
+            tuple: (theta1, theta2) joint angles in radians
+            float: Remaining Cartesian error in cm before the last step
+        """
+        # Ensure positive coordinates
+        y = abs(y)
+        z = abs(z)
+        
+        theta1, theta2 = self.theta1, self.theta2
+        for _ in range(iterations):
+            theta1, theta2, error = dls_step(theta1, theta2, y, z, self.l1, self.l2,
+                                             damping, threshold, max_error)
+            if self.limits is not None:
+                theta1, theta2 = self.limits.clip(theta1, theta2)
+        theta1, theta2 = float(theta1), float(theta2)
+        
+        distance = np.hypot(y, z)
+        self.target = (y, z)
+        if self.limits is not None:
+            self.reachable = bool(self._solve_ik(y, z)[2])
+        else:
+            self.reachable = bool(abs(self.l1 - self.l2) <= distance <= self.l1 + self.l2)
         self.target_theta1 = theta1
         self.target_theta2 = theta2
+        return theta1, theta2, float(error)
+    
+    def differential_ik_batch(self, theta1s, theta2s, ys, zs, damping=0.5, threshold=0.15,
+                              max_error=2.0):
+        """
+        One differential IK step for many poses or arms of this geometry.
+        Pure function: the arm state is not modified.
         
-        return theta1, theta2, self.reachable
+        Args:
+            theta1s (array_like): Current first joint angles in radians
+            theta2s (array_like): Current second joint angles in radians
+            ys (array_like): Target y coordinates in cm
+            zs (array_like): Target z coordinates in cm
+            damping (float): Damping factor at the singularity
+            threshold (float): Manipulability fraction where damping starts
+            max_error (float): Longest error in cm corrected per step
+            
+        Returns:
+            tuple: (theta1s, theta2s, errors) arrays
+        """
+        return dls_step(np.asarray(theta1s, dtype=float), np.asarray(theta2s, dtype=float),
+                        np.abs(np.asarray(ys, dtype=float)), np.abs(np.asarray(zs, dtype=float)),
+                        self.l1, self.l2, damping, threshold, max_error)
+    
+    @property
+    def lengths(self):
+        """Segment lengths in cm, base first."""
+        return (self.l1, self.l2)
+    
+    @property
+    def max_reach(self):
+        """Outer workspace radius in cm."""
+        return self.l1 + self.l2
+    
+    @property
+    def min_reach(self):
+        """Inner workspace radius in cm."""
+        return abs(self.l1 - self.l2)
+    
+    @property
+    def angles(self):
+        """Current joint angles in radians, base first."""
+        return (self.theta1, self.theta2)
+    
+    @property
+    def target_angles(self):
+        """Final target joint angles in radians (None entries before any IK)."""
+        return (self.target_theta1, self.target_theta2)
     
     def get_arm_positions(self):
         """
@@ -292,73 +1313,485 @@ class RoboticArm:
         
     def send_target_angles(self):
         """
-        Send the final target angles via TCP.
+        Send the final target angles through the sender.
         Only called once animation is complete.
         """
-        if self.target_theta1 is not None and self.target_theta2 is not None:
-            self.tcp_sender.send_angles(self.target_theta1, self.target_theta2)
-            # Use absolute value for theta2 in the log message to match what's shown in GUI
-            print(f"Sending FINAL target angles: theta1={np.degrees(self.target_theta1):.1f}°, theta2={abs(np.degrees(self.target_theta2)):.1f}°")
+        angles = self.target_angles
+        if all(angle is not None for angle in angles):
+            self.tcp_sender.send_angles(*angles)
+            self.record_target()
+            command_log.info("Sending FINAL target angles: %s", format_joint_angles(angles))
+
+    def record_target(self):
+        """Append the final target command to the session recorder, if any."""
+        if self.recorder is None or self.target_theta1 is None:
+            return
+        y, z = self.target if self.target is not None else (float('nan'), float('nan'))
+        # Fleet links carry the arm id; a single arm records no client id
+        self.recorder.record(y, z, self.target_angles, self.reachable,
+                             getattr(self.tcp_sender, 'arm_id', ''))
+        
+class IKCache:
+    def __init__(self, arm, max_entries=1024, quantum=1e-3, grid_step=0.1,
+                 tolerance=1e-3, cache_dir=None):
+        """
+        Initialize the IK cache layer for an arm.
+        
+        Lookups try, in order, a bounded LRU of exact solutions for
+        quantized targets, then a precomputed dense grid over the reachable
+        quarter-annulus with bilinear interpolation, and finally fall back
+        to the closed-form solver. The grid is built once per (l1, l2,
+        grid_step) and saved to disk.
+        
+        Args:
+            arm (RoboticArm): Arm whose closed-form IK is being cached
+            max_entries (int): Maximum number of LRU entries
+            quantum (float): Target quantization step for LRU keys in cm
+            grid_step (float): Grid spacing in cm
+            tolerance (float): Maximum interpolation error in radians; grid
+                cells above it fall back to the exact solver
+            cache_dir (str): Directory for the grid file, or None for
+                ~/.robotic_arm
+        """
+        self.arm = arm
+        self.max_entries = max_entries
+        self.quantum = quantum
+        self.grid_step = grid_step
+        self.tolerance = tolerance
+        self.cache_dir = cache_dir or os.path.join(os.path.expanduser("~"), ".robotic_arm")
+        
+        self.memo = OrderedDict()
+        
+        # Hit/miss counters
+        self.lru_hits = 0
+        self.grid_hits = 0
+        self.misses = 0
+        
+        self.load_or_build_grid()
+    
+    @property
+    def grid_path(self):
+        """Path of the grid file for this arm geometry and joint limits."""
+        name = f"ik_grid_{self.arm.l1:g}_{self.arm.l2:g}_{self.grid_step:g}"
+        if self.arm.limits is not None:
+            name += "_" + "_".join(f"{limit:g}" for limit in np.degrees(self.arm.limits))
+        name += ".npz"
+        return os.path.join(self.cache_dir, name)
+    
+    def load_or_build_grid(self):
+        """Load the grid from disk, building and saving it if needed."""
+        try:
+            data = np.load(self.grid_path)
+            if (float(data['l1']) == self.arm.l1 and float(data['l2']) == self.arm.l2
+                    and float(data['step']) == self.grid_step
+                    and float(data['tolerance']) == self.tolerance
+                    and np.array_equal(data['limits'], self._limits_array())):
+                self._set_grid(data['theta1'], data['theta2'], data['valid'],
+                               float(data['max_error']))
+                return
+        except (OSError, KeyError, ValueError):
+            pass
+        
+        self.build_grid()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.savez(self.grid_path, theta1=self.theta1_grid, theta2=self.theta2_grid,
+                     valid=self.valid, max_error=self.max_error,
+                     l1=self.arm.l1, l2=self.arm.l2, step=self.grid_step,
+                     tolerance=self.tolerance, limits=self._limits_array())
+        except OSError as e:
+            log.warning("Could not save IK grid: %s", e)
+    
+    def _limits_array(self):
+        """The arm's joint limits as stored in the grid file (empty if none)."""
+        return np.array(self.arm.limits if self.arm.limits is not None else [], dtype=float)
+    
+    def build_grid(self):
+        """
+        Solve IK on the grid and measure the interpolation error.
+        
+        Every cell is checked against the exact solution at its centre and
+        edge midpoints (where bilinear error peaks). Cells that touch the
+        unreachable region or exceed the tolerance are marked invalid, and
+        max_error records the worst error over the remaining cells.
+        """
+        max_reach = self.arm.l1 + self.arm.l2
+        n = int(np.ceil(max_reach / self.grid_step)) + 1
+        
+        # Exact IK on a half-step grid: even indices are the grid nodes,
+        # odd indices are the cell centres and edge midpoints
+        fine = np.arange(2 * n - 1) * (self.grid_step / 2)
+        fy, fz = np.meshgrid(fine, fine, indexing='ij')
+        t1, t2, reachable = self.arm.inverse_kinematics_batch(fy, fz)
+        
+        theta1 = t1[::2, ::2]
+        theta2 = t2[::2, ::2]
+        
+        # Interpolate at the midpoints from the nodes
+        def midpoint_error(exact, nodes):
+            c00, c10 = nodes[:-1, :-1], nodes[1:, :-1]
+            c01, c11 = nodes[:-1, 1:], nodes[1:, 1:]
+            err = np.abs(exact[1::2, 1::2] - (c00 + c10 + c01 + c11) / 4)
+            err = np.maximum(err, np.abs(exact[1::2, 0:-1:2] - (c00 + c10) / 2))
+            err = np.maximum(err, np.abs(exact[1::2, 2::2] - (c01 + c11) / 2))
+            err = np.maximum(err, np.abs(exact[0:-1:2, 1::2] - (c00 + c01) / 2))
+            err = np.maximum(err, np.abs(exact[2::2, 1::2] - (c10 + c11) / 2))
+            return err
+        
+        error = np.maximum(midpoint_error(t1, theta1), midpoint_error(t2, theta2))
+        
+        # A cell is valid when every sample in it is reachable
+        r = reachable
+        cell_reachable = (r[0:-1:2, 0:-1:2] & r[2::2, 0:-1:2] & r[0:-1:2, 2::2]
+                          & r[2::2, 2::2] & r[1::2, 1::2] & r[1::2, 0:-1:2]
+                          & r[1::2, 2::2] & r[0:-1:2, 1::2] & r[2::2, 1::2])
+        valid = cell_reachable & (error <= self.tolerance)
+        max_error = float(error[valid].max()) if valid.any() else 0.0
+        
+        self._set_grid(theta1, theta2, valid, max_error)
+    
+    def _set_grid(self, theta1, theta2, valid, max_error):
+        """Install grid arrays and derived lookup constants."""
+        self.theta1_grid = theta1
+        self.theta2_grid = theta2
+        self.valid = valid
+        self.max_error = max_error
+        self.inv_step = 1.0 / self.grid_step
+        self.n_cells = valid.shape[0]
+        
+        # Plain nested lists index much faster than numpy for scalar lookups
+        self._t1_rows = theta1.tolist()
+        self._t2_rows = theta2.tolist()
+        self._valid_rows = valid.tolist()
+    
+    def lookup(self, y, z):
+        """
+        Get joint angles for a positive (y, z) target.
+        
+        Args:
+            y (float): Target y coordinate in cm
+            z (float): Target z coordinate in cm
+            
+        Returns:
+            tuple: (theta1, theta2, reachable)
+        """
+        # Exact solutions for recently used targets
+        key = (round(y / self.quantum), round(z / self.quantum))
+        result = self.memo.get(key)
+        if result is not None:
+            self.memo.move_to_end(key)
+            self.lru_hits += 1
+            return result
+        
+        # Interpolated solution from the grid
+        gy = y * self.inv_step
+        gz = z * self.inv_step
+        i = int(gy)
+        j = int(gz)
+        if i < self.n_cells and j < self.n_cells and self._valid_rows[i][j]:
+            fy = gy - i
+            fz = gz - j
+            w00 = (1 - fy) * (1 - fz)
+            w10 = fy * (1 - fz)
+            w01 = (1 - fy) * fz
+            w11 = fy * fz
+            r0 = self._t1_rows[i]
+            r1 = self._t1_rows[i + 1]
+            theta1 = w00 * r0[j] + w10 * r1[j] + w01 * r0[j + 1] + w11 * r1[j + 1]
+            r0 = self._t2_rows[i]
+            r1 = self._t2_rows[i + 1]
+            theta2 = w00 * r0[j] + w10 * r1[j] + w01 * r0[j + 1] + w11 * r1[j + 1]
+            self.grid_hits += 1
+            return theta1, theta2, True
+        
+        # Fall back to the exact solver on the quantized target
+        self.misses += 1
+        result = self.arm._solve_ik(key[0] * self.quantum, key[1] * self.quantum)
+        self.memo[key] = result
+        if len(self.memo) > self.max_entries:
+            self.memo.popitem(last=False)
+        return result
+    
+    def stats(self):
+        """
+        Get cache counters.
+        
+        Returns:
+            dict: Hit/miss counts, hit rate, LRU size and grid error bound
+        """
+        total = self.lru_hits + self.grid_hits + self.misses
+        return {
+            'lru_hits': self.lru_hits,
+            'grid_hits': self.grid_hits,
+            'misses': self.misses,
+            'hit_rate': (self.lru_hits + self.grid_hits) / total if total else 0.0,
+            'lru_size': len(self.memo),
+            'grid_max_error_rad': self.max_error,
+        }
+
+def sample_trajectory(trajectory, t):
+    """
+    Interpolate a planned trajectory.
+    
+    Args:
+        trajectory (ndarray): (N, 3) array of (t, theta1, theta2) rows, as
+            produced by planner.CartesianPlanner
+        t (float): Time in seconds from the start of the trajectory
+        
+    Returns:
+        tuple: (theta1, theta2) in radians
+    """
+    times = trajectory[:, 0]
+    return (float(np.interp(t, times, trajectory[:, 1])),
+            float(np.interp(t, times, trajectory[:, 2])))
+
+def sample_move(start, velocity, target, duration, t):
+    """
+    Evaluate a joint-space move at a given time.
+    
+    The path is a cubic Hermite curve per joint from the start pose and
+    velocity to the target at rest. With zero start velocity it eases in
+    and out along the smoothstep curve.
+    
+    Args:
+        start (ndarray): Joint angles at the start of the move in radians
+        velocity (ndarray): Joint velocities at the start in rad/s
+        target (ndarray): Joint angles at the end of the move in radians
+        duration (float): Move duration in seconds
+        t (float): Time in seconds from the start of the move
+        
+    Returns:
+        tuple: (angles, velocities) arrays with one entry per joint, in
+            radians and rad/s
+    """
+    T = duration
+    s = min(max(t / T, 0.0), 1.0) if T > 0 else 1.0
+    
+    ease = s * s * (3 - 2 * s)
+    d_ease = 6 * s * (1 - s)
+    h10 = s * (1 - s) * (1 - s)         # Hermite start-tangent basis
+    d_h10 = (1 - s) * (1 - 3 * s)
+    
+    delta = target - start
+    angles = start + delta * ease + h10 * T * velocity
+    if T > 0:
+        velocities = delta * d_ease / T + d_h10 * velocity
+    else:
+        velocities = np.zeros(len(angles))
+    return angles, velocities
+
+class TrajectoryStreamer:
+    def __init__(self, sender, rate=100.0, lead=0.05):
+        """
+        Stream interpolated joint waypoints to the arm during a move.
+        
+        Waypoints are sampled from the move's profile at a fixed rate and
+        sent ahead of time in batch frames, so the firmware can execute
+        them in sync on both joints instead of a single final target.
+        
+        Args:
+            sender: Sender with send_waypoints (AsyncTCPSender or ArmLink)
+            rate (float): Waypoint rate in Hz (e.g. 50-200)
+            lead (float): How far ahead of wall-clock time to send, in seconds
+        """
+        self.sender = sender
+        self.rate = rate
+        self.lead = lead
+        self.sample = None
+        self.duration = 0.0
+        self.start_time = 0.0
+        self.next_index = 0
+        self.count = 0
+        self.new_stream = False
+        self.waypoints_sent = 0
+        self.frames_sent = 0
+        
+    @property
+    def active(self):
+        """Whether a move still has waypoints to send."""
+        return self.sample is not None and self.next_index < self.count
+        
+    def start(self, sample, duration, now=None):
+        """
+        Begin streaming a new move, superseding the current one.
+        
+        Args:
+            sample (callable): sample(t) -> (theta1, theta2) for t in
+                seconds from the start of the move
+            duration (float): Move duration in seconds
+            now (float): time.monotonic() timestamp of the move start
+        """
+        self.sample = sample
+        self.duration = duration
+        self.start_time = time.monotonic() if now is None else now
+        self.next_index = 0
+        # Waypoints at k / rate, plus one exactly at the end of the move
+        self.count = int(np.ceil(duration * self.rate)) + 1
+        self.new_stream = True
+        self.update(self.start_time)
+        
+    def start_trajectory(self, trajectory, now=None):
+        """
+        Begin streaming a planned (N, 3) trajectory of (t, theta1, theta2).
+        
+        Args:
+            trajectory (ndarray): Trajectory from planner.CartesianPlanner
+            now (float): time.monotonic() timestamp of the move start
+        """
+        self.start(lambda t: sample_trajectory(trajectory, t), float(trajectory[-1, 0]), now)
+        
+    def update(self, now=None):
+        """
+        Send every waypoint due within the lead time.
+        
+        Args:
+            now (float): time.monotonic() timestamp, or None for the current time
+            
+        Returns:
+            bool: True while waypoints remain to be sent
+        """
+        if not self.active:
+            return False
+        if now is None:
+            now = time.monotonic()
+        horizon = now - self.start_time + self.lead
+        
+        waypoints = []
+        while self.next_index < self.count:
+            t = min(self.next_index / self.rate, self.duration)
+            if t > horizon:
+                break
+            waypoints.append((t,) + tuple(self.sample(t)))
+            self.next_index += 1
+        
+        if waypoints:
+            self.sender.send_waypoints(waypoints, new_stream=self.new_stream)
+            self.new_stream = False
+            self.waypoints_sent += len(waypoints)
+            self.frames_sent += -(-len(waypoints) // STREAM_MAX_BATCH)
+        return self.active
+        
+    def finish(self):
+        """Send all remaining waypoints of the current move at once."""
+        if self.active:
+            self.update(self.start_time + self.duration)
 
 class ArmVisualizer:
-    def __init__(self, arm, fig_size=(8, 8)):
+    def __init__(self, arm, fig_size=(8, 8), blit=False):
         """
         Initialize the arm visualizer.
         
         Args:
             arm (RoboticArm): The robotic arm to visualize
             fig_size (tuple): Figure size (width, height)
+            blit (bool): Cache the static background and redraw only the
+                moving artists instead of the whole figure
         """
+        import matplotlib.pyplot as plt
+        
         self.arm = arm
         self.fig, self.ax = plt.subplots(figsize=fig_size)
         self.setup_plot()
         
-        # For animation
-        self.animation_frames = 60
-        self.theta1_start = arm.theta1
-        self.theta2_start = arm.theta2
-        self.theta1_target = arm.theta1
-        self.theta2_target = arm.theta2
+        # Rendering state: cached background and last drawn arm/connection state
+        self.blit = blit
+        self.background = None
+        self.background_canvas = None
+        self.last_state = None
+        self.frame_times = deque(maxlen=1000)
+        self.frames_skipped = 0
+        self.dynamic_artists = self.segments + [self.target_point, self.status_text,
+                                                self.angles_text, self.connection_text]
+        for artist in self.dynamic_artists:
+            artist.set_animated(blit)
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+        
+        # For animation (one entry per joint)
+        self.angles_start = np.array(arm.angles, dtype=float)
+        self.angles_target = self.angles_start.copy()
+        
+        # Timer-driven animation state
+        self.animation_duration = 0.6   # Seconds per move
+        self.frame_interval = 20        # Timer period in ms
+        self.animation_start = 0.0
+        self.velocity_start = np.zeros(len(self.angles_start))  # Joint velocities (rad/s) at move start
+        self.timer = None
+        self.timer_canvas = None
+        self.last_tick = None
+        self.frames_rendered = 0
+        self.frames_dropped = 0
+        self.on_complete = None
+        
+        # Optional planner.CartesianPlanner; when set, moves follow straight
+        # lines timed by the servo limits instead of the fixed-time curve
+        self.planner = None
+        self.trajectory = None
+        self.streaming = False
+        self.live = False
+        
+        # Drag-to-target state (see enable_drag). Mouse events only store
+        # the latest target; the animation timer picks it up once per frame
+        self.dragging = False
+        self.drag_target = None
+        self.drag_last = None
+        self.drag_events = 0
+        self.drag_updates = 0
+        self.drag_commands = 0
+        self.drag_follow_time = 0.15    # Seconds for the display to catch up
+        self.drag_command_interval = 0.1
+        self.drag_unsent = False
+        self.last_drag_command = float('-inf')
+        self.on_drag = None             # Called with (y, z) for each applied target
         
     def setup_plot(self):
         """Set up the plot for visualization."""
         # Set limits based on arm length - only positive quadrant
-        max_length = self.arm.l1 + self.arm.l2
+        max_length = self.arm.max_reach
         self.ax.set_xlim(-1, max_length * 1.2)
         self.ax.set_ylim(-1, max_length * 1.2)
         
         # Labels and title
         self.ax.set_xlabel('Y (cm)')
         self.ax.set_ylabel('Z (cm)')
-        self.ax.set_title('2-Joint Robotic Arm Simulation (Positive Y-Z Only)')
+        self.ax.set_title(f'{len(self.arm.lengths)}-Joint Robotic Arm Simulation (Positive Y-Z Only)')
         
         # Grid and aspect ratio
         self.ax.grid(True)
         self.ax.set_aspect('equal')
         
-        # Create arm segments (lines will be updated later)
-        self.segment1, = self.ax.plot([], [], 'o-', lw=4, markersize=10, color='blue')
-        self.segment2, = self.ax.plot([], [], 'o-', lw=4, markersize=10, color='green')
+        # Create arm segments, one per link (lines will be updated later)
+        colors = ('blue', 'green', 'purple', 'orange')
+        self.segments = [self.ax.plot([], [], 'o-', lw=4, markersize=10, color=colors[i % len(colors)])[0]
+                         for i in range(len(self.arm.lengths))]
+        self.segment1, self.segment2 = self.segments[:2]
         
         # Create target point
         self.target_point, = self.ax.plot([], [], 'ro', markersize=10)
         
-        # Create reach circle (partial circle only in positive quadrant)
-        max_reach = self.arm.l1 + self.arm.l2
-        min_reach = abs(self.arm.l1 - self.arm.l2)
-        
-        # Create partial circles for the positive quadrant
-        theta = np.linspace(0, np.pi/2, 100)
-        outer_x = max_reach * np.cos(theta)
-        outer_y = max_reach * np.sin(theta)
-        inner_x = min_reach * np.cos(theta)
-        inner_y = min_reach * np.sin(theta)
-        
-        # Outer reach arc (dashed)
-        self.ax.plot(outer_x, outer_y, linestyle='--', color='gray', alpha=0.5)
-        
-        # Inner reach arc (dashed)
-        self.ax.plot(inner_x, inner_y, linestyle='--', color='gray', alpha=0.5)
+        limits = getattr(self.arm, 'limits', None)
+        if limits is not None and len(self.arm.lengths) == 2:
+            # Outline (and shade) the workspace the real arm reaches within
+            # its servo limits
+            outline = limits.boundary(self.arm.l1, self.arm.l2)
+            self.ax.fill(outline[:, 0], outline[:, 1], color='gray', alpha=0.1)
+            self.ax.plot(outline[:, 0], outline[:, 1], linestyle='--', color='gray', alpha=0.5)
+        else:
+            # Create reach circle (partial circle only in positive quadrant)
+            max_reach = self.arm.max_reach
+            min_reach = self.arm.min_reach
+            
+            # Create partial circles for the positive quadrant
+            theta = np.linspace(0, np.pi/2, 100)
+            outer_x = max_reach * np.cos(theta)
+            outer_y = max_reach * np.sin(theta)
+            inner_x = min_reach * np.cos(theta)
+            inner_y = min_reach * np.sin(theta)
+            
+            # Outer reach arc (dashed)
+            self.ax.plot(outer_x, outer_y, linestyle='--', color='gray', alpha=0.5)
+            
+            # Inner reach arc (dashed)
+            self.ax.plot(inner_x, inner_y, linestyle='--', color='gray', alpha=0.5)
         
         # Status text
         self.status_text = self.ax.text(0.02, 0.02, '', transform=self.ax.transAxes, 
@@ -373,15 +1806,37 @@ class ArmVisualizer:
                                           fontsize=10, horizontalalignment='right', color='blue')
         
     def update_plot(self):
-        """Update the plot with current arm position."""
-        j1_pos, j2_pos, ee_pos = self.arm.get_arm_positions()
+        """
+        Update the plot with current arm position.
         
-        # Update segment positions
-        self.segment1.set_data([j1_pos[0], j2_pos[0]], [j1_pos[1], j2_pos[1]])
-        self.segment2.set_data([j2_pos[0], ee_pos[0]], [j2_pos[1], ee_pos[1]])
+        Nothing is redrawn when the arm and connection state are unchanged
+        since the last frame, and only artists whose inputs changed are
+        updated.
+        """
+        connected = self.arm.tcp_sender.connected
+        angles = self.arm.angles
+        state = (angles, self.arm.target, self.arm.reachable, connected)
+        last = self.last_state
+        if state == last:
+            self.frames_skipped += 1
+            return
+        start = time.perf_counter()
+        
+        # Update segment positions and angles text
+        if last is None or angles != last[0]:
+            positions = self.arm.get_arm_positions()
+            for segment, a, b in zip(self.segments, positions[:-1], positions[1:]):
+                segment.set_data([a[0], b[0]], [a[1], b[1]])
+            
+            # Show absolute value for theta2, relative angles for later joints
+            degrees = np.degrees(angles)
+            lines = [f'Joint 1: {degrees[0]:.1f}°', f'Joint 2: {abs(degrees[1]):.1f}°']
+            lines += [f'Joint {i}: {(deg + 180) % 360 - 180:.1f}°'
+                      for i, deg in enumerate(degrees[2:], 3)]
+            self.angles_text.set_text('\n'.join(lines))
         
         # Update target if available
-        if self.arm.target:
+        if self.arm.target and (last is None or state[1:3] != last[1:3]):
             self.target_point.set_data([self.arm.target[0]], [self.arm.target[1]])
             
             # Update status text
@@ -392,91 +1847,407 @@ class ArmVisualizer:
                 self.status_text.set_text('Target reachable')
                 self.status_text.set_color('green')
         
-        # Update angles text - Show absolute value for theta2
-        theta1_deg = np.degrees(self.arm.theta1)
-        theta2_deg = abs(np.degrees(self.arm.theta2))  # Absolute value
-        self.angles_text.set_text(f'Joint 1: {theta1_deg:.1f}°\nJoint 2: {theta2_deg:.1f}°')
-        
         # Update connection status
-        if self.arm.tcp_sender.connected:
-            self.connection_text.set_text('TCP: Connected')
-            self.connection_text.set_color('green')
-        else:
-            self.connection_text.set_text('TCP: Waiting')
-            self.connection_text.set_color('blue')
+        if last is None or connected != last[3]:
+            label = getattr(self.arm.tcp_sender, 'label', 'TCP')
+            if connected:
+                self.connection_text.set_text(f'{label}: Connected')
+                self.connection_text.set_color('green')
+            else:
+                self.connection_text.set_text(f'{label}: Waiting')
+                self.connection_text.set_color('blue')
+        
+        self.last_state = state
+        self.render()
+        elapsed = time.perf_counter() - start
+        self.frame_times.append(elapsed)
+        FRAME_SECONDS.observe(elapsed)
+    
+    def render(self):
+        """Push the current artists to the screen (blitted or full redraw)."""
+        canvas = self.fig.canvas
+        if not (self.blit and canvas.supports_blit):
+            canvas.draw_idle()
+            return
+        
+        # A full draw refreshes the background through _on_draw
+        if self.background is None or self.background_canvas is not canvas:
+            canvas.draw()
+            return
+        
+        canvas.restore_region(self.background)
+        self._draw_dynamic()
+        canvas.blit(self.fig.bbox)
+    
+    def _on_draw(self, event):
+        """Cache the static background after every full draw."""
+        if not self.blit:
+            return
+        canvas = self.fig.canvas
+        self.background = canvas.copy_from_bbox(self.fig.bbox)
+        self.background_canvas = canvas
+        self._draw_dynamic()
+    
+    def _draw_dynamic(self):
+        """Draw the animated artists on top of the restored background."""
+        for artist in self.dynamic_artists:
+            self.fig.draw_artist(artist)
+    
+    def invalidate(self):
+        """Force the next update_plot to redraw even if nothing changed."""
+        self.last_state = None
+        self.background = None
+    
+    def frame_stats(self):
+        """
+        Get update_plot frame-time statistics.
         
-        self.fig.canvas.draw_idle()
+        In blit mode the times include rendering; otherwise they cover the
+        artist updates and the draw_idle request only.
+        
+        Returns:
+            dict: Frame count, skipped frames, drag event/update/command
+                counts and frame times in ms
+        """
+        stats = {'frames': len(self.frame_times), 'skipped': self.frames_skipped,
+                 'blit': self.blit, 'drag_events': self.drag_events,
+                 'drag_updates': self.drag_updates, 'drag_commands': self.drag_commands}
+        if self.frame_times:
+            times = np.array(self.frame_times) * 1000.0
+            stats.update({
+                'mean_ms': float(times.mean()),
+                'p50_ms': float(np.percentile(times, 50)),
+                'p95_ms': float(np.percentile(times, 95)),
+                'max_ms': float(times.max()),
+            })
+        return stats
     
-    def animate_to_target(self, y, z):
+    def animate_to_target(self, y, z, duration=None, on_complete=None, live=False, now=None):
         """
-        Use manual animation with frames.
+        Start a non-blocking animation towards a target.
+        
+        Frames are advanced by a canvas timer from wall-clock time, so slow
+        renders drop frames instead of slowing the motion. Calling this
+        while a move is in progress retargets from the current interpolated
+        pose and velocity. The final target angles are sent via TCP once
+        the last move completes.
         
         Args:
             y (float): Target y coordinate in cm
             z (float): Target z coordinate in cm
+            duration (float): Move duration in seconds (default animation_duration)
+            on_complete (callable): Called with no arguments when the move ends
+            live (bool): Follow a dragged target: skip the planner and the
+                streamer, and leave the timer to the caller
+            now (float): time.monotonic() timestamp of the move start
         """
         # Ensure positive coordinates
         y = abs(y)
         z = abs(z)
         
+        now = time.monotonic() if now is None else now
+        
+        # Start from the current pose, keeping its velocity when retargeting
+        if self.arm.is_animating:
+            angles, velocity = self.sample_animation(now)
+        else:
+            angles = np.array(self.arm.angles, dtype=float)
+            velocity = np.zeros(len(angles))
+        self.angles_start = angles
+        self.velocity_start = velocity
+        
         # Calculate target angles
-        self.theta1_start = self.arm.theta1
-        self.theta2_start = self.arm.theta2
-        self.theta1_target, self.theta2_target, _ = self.arm.inverse_kinematics(y, z)
+        *target, _ = self.arm.inverse_kinematics(y, z)
+        self.angles_target = np.array(target, dtype=float)
+        
+        # Follow a planned straight line when a planner is set and the line
+        # stays inside the workspace (planned moves start from rest)
+        if self.planner is not None and not live:
+            _, _, start = self.arm.forward_kinematics(*angles)
+            _, _, reached = self.arm.forward_kinematics(*self.angles_target)
+            try:
+                trajectory = self.planner.plan([start, reached], tuple(angles))
+            except ValueError as e:
+                log.info("Planner: %s, using joint-space move", e)
+            else:
+                self.play_trajectory(trajectory, on_complete, now)
+                return
+        self.trajectory = None
         
         # Normalize angle changes to take the shortest path
-        dtheta1 = (self.theta1_target - self.theta1_start + np.pi) % (2*np.pi) - np.pi
-        dtheta2 = (self.theta2_target - self.theta2_start + np.pi) % (2*np.pi) - np.pi
+        delta = (self.angles_target - self.angles_start + np.pi) % (2*np.pi) - np.pi
+        self.angles_target = self.angles_start + delta
         
-        self.theta1_target = self.theta1_start + dtheta1
-        self.theta2_target = self.theta2_start + dtheta2
+        self.animation_start = now
+        self.animation_duration = duration if duration is not None else self.animation_duration
+        self.on_complete = on_complete
         
         # Flag that animation has started
         self.arm.is_animating = True
-
-        # Manual animation
-        frames = 30
-        for frame in range(frames + 1):
-            t = frame / frames  # Normalized time [0, 1]
-            
-            # Use easing function for smoother motion
-            t = self.ease_in_out(t)
-            
-            theta1 = self.theta1_start + (self.theta1_target - self.theta1_start) * t
-            theta2 = self.theta2_start + (self.theta2_target - self.theta2_start) * t
-            
-            # Update arm angles (without sending TCP)
-            self.arm.set_angles(theta1, theta2)
+        
+        # Stream the move's profile (sampled relative to its start)
+        self.live = live
+        self.streaming = self.arm.streamer is not None and not live
+        if self.streaming:
+            start = self.animation_start
+            self.arm.streamer.start(lambda t: tuple(self.sample_animation(start + t)[0]),
+                                    self.animation_duration, now)
+        if not live:
+            self.start_timer()
+    
+    def play_trajectory(self, trajectory, on_complete=None, now=None):
+        """
+        Start a non-blocking animation along a planned trajectory.
+        
+        Args:
+            trajectory (ndarray): (N, 3) array of (t, theta1, theta2) rows
+            on_complete (callable): Called with no arguments when the move ends
+            now (float): time.monotonic() timestamp of the move start
+        """
+        now = time.monotonic() if now is None else now
+        self.trajectory = trajectory
+        self.angles_start = trajectory[0, 1:].copy()
+        self.angles_target = trajectory[-1, 1:].copy()
+        self.animation_start = now
+        self.animation_duration = float(trajectory[-1, 0])
+        self.on_complete = on_complete
+        self.arm.is_animating = True
+        self.live = False
+        self.streaming = self.arm.streamer is not None
+        if self.streaming:
+            self.arm.streamer.start_trajectory(trajectory, now)
+        self.start_timer()
+    
+    def sample_animation(self, now):
+        """
+        Evaluate the current move at a given time.
+        
+        Joint-space moves follow sample_move's Hermite curve. Planned moves
+        are interpolated from the trajectory.
+        
+        Args:
+            now (float): time.monotonic() timestamp
             
-            # Update plot
-            self.update_plot()
+        Returns:
+            tuple: (angles, velocities) arrays with one entry per joint, in
+                radians and rad/s
+        """
+        if self.trajectory is not None:
+            # Planned move: interpolate, differentiating numerically
+            t = now - self.animation_start
+            h = 0.005
+            angles = np.array(sample_trajectory(self.trajectory, t))
+            ahead = np.array(sample_trajectory(self.trajectory, t + h))
+            behind = np.array(sample_trajectory(self.trajectory, t - h))
+            return angles, (ahead - behind) / (2 * h)
+        
+        return sample_move(self.angles_start, self.velocity_start, self.angles_target,
+                           self.animation_duration, now - self.animation_start)
+    
+    def start_timer(self):
+        """Start the animation timer, creating it on the current canvas."""
+        canvas = self.fig.canvas
+        if self.timer is None or self.timer_canvas is not canvas:
+            if self.timer is not None:
+                self.timer.stop()
+            self.timer = canvas.new_timer(interval=self.frame_interval)
+            self.timer.add_callback(self._on_timer)
+            self.timer_canvas = canvas
+        self.last_tick = None
+        self.timer.start()
+    
+    def _on_timer(self):
+        """Timer callback; must not return a falsy value or matplotlib drops it."""
+        self.advance_animation()
+    
+    def advance_animation(self, now=None):
+        """
+        Render the frame for the current time (timer callback).
+        
+        Args:
+            now (float): time.monotonic() timestamp, or None for the current time
             
-            # Process GUI events
-            self.fig.canvas.draw()
-            self.fig.canvas.flush_events()
-            time.sleep(0.02)  # Short delay
+        Returns:
+            bool: True while the animation is still running
+        """
+        if now is None:
+            now = time.monotonic()
+        
+        self._poll_drag(now)
+        
+        if not self.arm.is_animating:
+            # Keep ticking while the button is held, for the next motion
+            if self.timer is not None and not self.dragging:
+                self.timer.stop()
+            return False
+        
+        # Count ticks skipped because the previous frame took too long
+        interval = self.frame_interval / 1000.0
+        if self.last_tick is not None:
+            self.frames_dropped += max(0, int((now - self.last_tick) / interval) - 1)
+        self.last_tick = now
+        
+        angles, _ = self.sample_animation(now)
+        finished = now - self.animation_start >= self.animation_duration
+        if self.streaming:
+            self.arm.streamer.update(now)
+        if finished:
+            angles = self.angles_target
+        
+        # Update arm angles (without sending TCP)
+        self.arm.set_angles(*angles)
+        self.update_plot()
+        self.frames_rendered += 1
+        
+        if finished:
+            # Animation complete, now send final target angles via TCP
+            # (or the rest of the stream when streaming)
+            if self.timer is not None and not self.dragging:
+                self.timer.stop()
+            self.arm.is_animating = False
+            if self.streaming:
+                self.arm.streamer.finish()
+                self.arm.record_target()
+            elif not self.live:
+                self.arm.send_target_angles()
+            elif self.drag_unsent and not self.dragging:
+                # Released: the final target goes out without waiting
+                self._send_drag_target(now)
+            MOVE_SECONDS.observe(now - self.animation_start)
+            if self.on_complete is not None:
+                self.on_complete()
+        return not finished
+    
+    def enable_drag(self, command_rate=10.0):
+        """
+        Let the target be dragged on the canvas with the left mouse button.
+        
+        Motion events are coalesced: the handlers only store the latest
+        position, and the animation timer solves and renders it once per
+        frame however fast the mouse reports. The arm gets the latest
+        target at most command_rate times a second while dragging, and
+        the final one on release.
+        
+        Args:
+            command_rate (float): Maximum commands per second while dragging
+        """
+        self.drag_command_interval = 1.0 / command_rate
+        canvas = self.fig.canvas
+        canvas.mpl_connect('button_press_event', self._on_press)
+        canvas.mpl_connect('motion_notify_event', self._on_motion)
+        canvas.mpl_connect('button_release_event', self._on_release)
+    
+    def _on_press(self, event):
+        """Start a drag at the clicked point."""
+        if event.button != 1 or event.inaxes is not self.ax:
+            return
+        self.dragging = True
+        self.drag_last = None
+        self._queue_drag(event)
+        self.start_timer()
+    
+    def _on_motion(self, event):
+        """Store the dragged point; the timer does the work."""
+        if self.dragging:
+            self._queue_drag(event)
+    
+    def _on_release(self, event):
+        """End the drag; the arm settles on the last point."""
+        if not self.dragging or event.button != 1:
+            return
+        self._queue_drag(event)
+        self.dragging = False
+    
+    def _queue_drag(self, event):
+        """Replace the pending drag target with an event's position."""
+        if event.inaxes is not self.ax or event.xdata is None:
+            return
+        self.drag_events += 1
+        if self.drag_target is not None:
+            DRAG_EVENTS_COALESCED.inc()
+        self.drag_target = (abs(event.xdata), abs(event.ydata))
+    
+    def _poll_drag(self, now):
+        """
+        Apply the newest dragged target, however many events came in, and
+        send it when the command interval allows.
+        
+        Args:
+            now (float): time.monotonic() timestamp
+        """
+        if self.drag_target is not None:
+            self._apply_drag(now)
+        if self.drag_unsent and now - self.last_drag_command >= self.drag_command_interval:
+            self._send_drag_target(now)
+    
+    def _apply_drag(self, now):
+        """
+        Retarget the display to the newest dragged point.
         
-        # Animation complete, now send final target angles via TCP
-        self.arm.is_animating = False
+        Args:
+            now (float): time.monotonic() timestamp
+        """
+        target, self.drag_target = self.drag_target, None
+        if target == self.drag_last:
+            return
+        self.drag_last = target
+        self.drag_updates += 1
+        self.animate_to_target(*target, duration=self.drag_follow_time,
+                               live=True, now=now)
+        self.drag_unsent = True
+        if self.on_drag is not None:
+            self.on_drag(*target)
+    
+    def _send_drag_target(self, now):
+        """
+        Send the current target angles to the arm.
+        
+        Args:
+            now (float): time.monotonic() timestamp
+        """
         self.arm.send_target_angles()
+        self._count_drag_command(now)
     
-    @staticmethod
-    def ease_in_out(t):
-        """Simple easing function for smoother animation."""
-        return t * t * (3 - 2 * t)
+    def _count_drag_command(self, now):
+        """
+        Book a drag command against the command rate.
+        
+        Args:
+            now (float): time.monotonic() timestamp of the send
+        """
+        self.drag_commands += 1
+        self.drag_unsent = False
+        # Keep to the command grid while sends are back to back, so frame
+        # quantization does not eat into the rate
+        interval = self.drag_command_interval
+        if now - self.last_drag_command < 2 * interval:
+            self.last_drag_command += interval
+        else:
+            self.last_drag_command = now
 
 class ArmGUI:
-    def __init__(self, root, arm):
+    def __init__(self, root, arm, blit=True, drag_rate=10.0, visualizer=None):
         """
         Initialize the GUI for the robotic arm.
         
         Args:
             root (tk.Tk): The root Tkinter window
             arm (RoboticArm): The robotic arm to control
+            blit (bool): Use blitted rendering in the visualizer
+            drag_rate (float): Maximum commands per second while dragging
+                the target on the plot
+            visualizer (ArmVisualizer): Visualizer to embed instead of a
+                new one (e.g. control.SharedArmVisualizer)
         """
+        import tkinter as tk
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        
         self.root = root
         self.arm = arm
-        self.visualizer = ArmVisualizer(arm)
+        self.visualizer = visualizer if visualizer is not None else ArmVisualizer(arm, blit=blit)
+        self.visualizer.enable_drag(drag_rate)
+        self.visualizer.on_drag = self.show_target
         
         # Set up the GUI
         self.root.title("Robotic Arm Controller with TCP")
@@ -506,15 +2277,22 @@ class ArmGUI:
         self.reset_button.grid(row=0, column=5, padx=10, pady=5)
         
         # Add port information
-        port_text = f"TCP server running on port {self.arm.tcp_sender.port}"
+        label = getattr(self.arm.tcp_sender, 'label', 'TCP')
+        port_text = f"{label} server running on port {self.arm.tcp_sender.port}"
         port_label = tk.Label(input_frame, text=port_text, font=("Arial", 8), fg="blue")
         port_label.grid(row=1, column=0, columnspan=3, padx=5, pady=0, sticky="w")
         
         # Add note about positive values
-        note_text = "Note: Negative values will be converted to positive"
+        note_text = "Note: Negative values will be converted to positive; drag on the plot to move live"
         note_label = tk.Label(input_frame, text=note_text, font=("Arial", 8), fg="gray")
         note_label.grid(row=1, column=3, columnspan=3, padx=5, pady=0, sticky="w")
         
+        # Estimated time to pose, when the sender models the firmware's timing
+        self.time_to_pose = getattr(self.arm.tcp_sender, 'estimated_time_to_pose', None)
+        self.eta_var = tk.StringVar(value="")
+        eta_label = tk.Label(input_frame, textvariable=self.eta_var, width=16, anchor="w")
+        eta_label.grid(row=0, column=6, padx=5, pady=5)
+        
         # Embed matplotlib figure
         self.canvas = FigureCanvasTkAgg(self.visualizer.fig, master=root)
         self.canvas.draw()
@@ -528,6 +2306,8 @@ class ArmGUI:
         
         # Start a periodic update to check TCP connection status
         self.update_connection_status()
+        if self.time_to_pose is not None:
+            self.update_time_to_pose()
     
     def update_connection_status(self):
         """Periodically update the connection status in the plot."""
@@ -535,13 +2315,25 @@ class ArmGUI:
         # Schedule next update
         self.root.after(1000, self.update_connection_status)
     
+    def update_time_to_pose(self):
+        """Periodically show when the arm should reach the latest pose."""
+        eta = self.time_to_pose()
+        if eta is None:
+            self.eta_var.set("")
+        elif eta > 0:
+            self.eta_var.set(f"Pose in {eta:.1f} s")
+        else:
+            self.eta_var.set("Pose reached")
+        self.root.after(100, self.update_time_to_pose)
+    
+    def show_target(self, y, z):
+        """Show a dragged target in the entry fields."""
+        self.y_var.set(round(y, 2))
+        self.z_var.set(round(z, 2))
+    
     def move_arm(self):
-        """Move the arm to the target position."""
+        """Move the arm to the target position (returns immediately)."""
         try:
-            # Disable buttons during animation
-            self.move_button.config(state=tk.DISABLED)
-            self.reset_button.config(state=tk.DISABLED)
-            
             # Get target coordinates (convert to positive)
             y = abs(self.y_var.get())
             z = abs(self.z_var.get())
@@ -550,57 +2342,268 @@ class ArmGUI:
             self.y_var.set(y)
             self.z_var.set(z)
             
-            # Use the manual animation method
+            # Start (or retarget) the timer-driven animation
             self.visualizer.animate_to_target(y, z)
             
-            # Re-enable buttons
-            self.move_button.config(state=tk.NORMAL)
-            self.reset_button.config(state=tk.NORMAL)
-            
         except Exception as e:
-            print(f"Error: {e}")
-            # Make sure buttons are re-enabled
-            self.move_button.config(state=tk.NORMAL)
-            self.reset_button.config(state=tk.NORMAL)
+            log.error("Move failed: %s", e)
     
     def reset_arm(self):
-        """Reset the arm to the default position."""
+        """Reset the arm to the default position (returns immediately)."""
         try:
-            # Disable buttons during animation
-            self.move_button.config(state=tk.DISABLED)
-            self.reset_button.config(state=tk.DISABLED)
-            
             # Reset to default position
             self.visualizer.animate_to_target(10.0, 10.0)
             
-            # Re-enable buttons
-            self.move_button.config(state=tk.NORMAL)
-            self.reset_button.config(state=tk.NORMAL)
-            
         except Exception as e:
-            print(f"Error: {e}")
-            # Make sure buttons are re-enabled
-            self.move_button.config(state=tk.NORMAL)
-            self.reset_button.config(state=tk.NORMAL)
+            log.error("Reset failed: %s", e)
 
-def main():
-    """Main function to run the application."""
+def run_headless(arm, stream=None):
+    """
+    Run the controller without a GUI.
+    
+    Reads "y z" targets (cm) one per line, solves IK and sends the angles
+    to the connected arm. Blank lines and lines starting with '#' are
+    ignored; "quit" ends the session.
+    
+    Args:
+        arm (RoboticArm): The robotic arm to control (server already started)
+        stream (file): Input stream of targets, defaults to stdin
+    """
+    stream = stream or sys.stdin
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line == 'quit':
+            break
+        try:
+            y, z = (float(v) for v in line.replace(',', ' ').split())
+        except ValueError:
+            log.error("Expected 'y z', got %r", line)
+            continue
+        *angles, reachable = arm.inverse_kinematics(y, z)
+        if not reachable:
+            log.warning("Target (%s, %s) out of reach, moving to nearest point", y, z)
+        arm.set_angles(*angles)
+        arm.send_target_angles()
+
+def parse_args(argv=None):
+    """
+    Parse and check the command line.
+    
+    Args:
+        argv (list): Arguments, or None for sys.argv
+        
+    Returns:
+        tuple: (args, links) where links is the list of --links lengths or None
+    """
+    parser = argparse.ArgumentParser(description="Robotic arm controller")
+    parser.add_argument('--headless', action='store_true',
+                        help="run without a GUI, reading 'y z' targets from stdin")
+    parser.add_argument('--port', type=int, default=3000, help="TCP server port")
+    parser.add_argument('--transport', choices=TRANSPORTS, default='asyncio',
+                        help="how commands reach the arm: TCP server (asyncio or threaded), "
+                             "UDP datagrams where the latest pose wins (firmware built with "
+                             "USE_UDP), or in-process loopback with no arm")
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='framed',
+                        help="wire format: versioned frames with 0.01° angles, or the bare "
+                             "int32 degrees older firmware expects")
+    parser.add_argument('--stream-rate', type=float, default=0.0, metavar='HZ',
+                        help="stream interpolated waypoints at this rate during moves "
+                             "(e.g. 50-200, 0 = send final target only)")
+    parser.add_argument('--cartesian', action='store_true',
+                        help="move in straight lines timed by the servo speed limits")
+    parser.add_argument('--drag-rate', type=float, default=10.0, metavar='HZ',
+                        help="maximum commands per second while dragging the target (default 10)")
+    parser.add_argument('--links', default=None, metavar='L1,L2[,L3...]',
+                        help="segment lengths in cm, base first; more than two adds wrist joints "
+                             "(default 12.5,14)")
+    parser.add_argument('--ideal-workspace', action='store_true',
+                        help="ignore the firmware's servo limits and use the full reach annulus")
+    parser.add_argument('--metrics-port', type=int, default=None, metavar='PORT',
+                        help="serve latency metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--metrics-dump', default=None, metavar='PATH',
+                        help="periodically write the metrics as JSON to PATH")
+    parser.add_argument('--metrics-interval', type=float, default=10.0, metavar='S',
+                        help="seconds between JSON metric dumps")
+    parser.add_argument('--job', default=None, metavar='FILE',
+                        help="no GUI: send every (y, z) target in a CSV or .npy file, paced by the arm's motion time")
+    parser.add_argument('--on-unreachable', choices=('clamp', 'skip', 'abort'), default='clamp',
+                        help="what --job does with unreachable targets")
+    parser.add_argument('--chunk-size', type=int, default=4096,
+                        help="targets read and solved at a time by --job")
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help="divide the modelled motion times of --job and --schedule by this "
+                             "(match emulator.py --speed)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="with --job: only report unreachable targets and the estimated duration")
+    parser.add_argument('--schedule', action='store_true',
+                        help="hold commands until the firmware can start them (modelled motion "
+                             "time) and show the estimated time to pose")
+    parser.add_argument('--record', default=None, metavar='DIR',
+                        help="record every command sent to the arm in this session directory")
+    parser.add_argument('--log-level', default='INFO',
+                        choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'), help="log level")
+    parser.add_argument('--log-sample', type=int, default=10, metavar='N',
+                        help="log one in N per-command messages (1 = all)")
+    parser.add_argument('--control-process', action='store_true',
+                        help="run the arm and its TCP server in a separate process, so "
+                             "rendering never delays commands")
+    parser.add_argument('--control-rate', type=float, default=100.0, metavar='HZ',
+                        help="control loop rate with --control-process (default 100)")
+    parser.add_argument('--control-policy', choices=('skip', 'catch-up'), default='skip',
+                        help="what the control loop does with ticks missed after an overrun: "
+                             "drop them, or run them back to back")
+    args = parser.parse_args(argv)
+    if args.stream_rate and args.transport in ('threaded', 'udp'):
+        parser.error("--stream-rate needs the asyncio or loopback transport")
+    if args.transport == 'udp' and args.protocol != 'framed':
+        parser.error("--transport udp needs the framed protocol")
+    if args.drag_rate <= 0:
+        parser.error("--drag-rate must be positive")
+    links = None
+    if args.links:
+        try:
+            links = [float(length) for length in args.links.split(',')]
+        except ValueError:
+            parser.error(f"--links: expected comma-separated lengths, got {args.links!r}")
+        if len(links) < 2:
+            parser.error("--links needs at least two lengths")
+        if len(links) > 2 and (args.stream_rate or args.cartesian or args.job):
+            parser.error("--stream-rate, --cartesian and --job need a two-link arm")
+    if args.control_process:
+        if args.headless or args.job or args.cartesian:
+            parser.error("--control-process runs the GUI with joint-space moves "
+                         "(no --headless, --job or --cartesian)")
+        if args.control_rate <= 0:
+            parser.error("--control-rate must be positive")
+    return args, links
+
+def start_metrics(args):
+    """
+    Enable, serve and dump metrics as the command line asks.
+    
+    Args:
+        args (argparse.Namespace): Parsed command line
+        
+    Returns:
+        tuple: (server, stop_dump), either None when not requested
+    """
+    metrics_server = stop_dump = None
+    if args.metrics_port is not None or args.metrics_dump:
+        metrics.enable()
+    if args.metrics_port is not None:
+        metrics_server = metrics.serve(args.metrics_port)
+        log.info("Serving metrics on http://127.0.0.1:%d/metrics", metrics_server.server_port)
+    if args.metrics_dump:
+        stop_dump = metrics.start_dump(args.metrics_dump, args.metrics_interval)
+    return metrics_server, stop_dump
+
+def build_arm(args, links=None, sender=None):
+    """
+    Create the arm described by the command line (not started).
+    
+    Args:
+        args (argparse.Namespace): Parsed command line
+        links (list): Link lengths from --links, or None for the default arm
+        sender: Sender to use, or None for the one --transport selects
+            (see transport.make_sender), behind a scheduler.MotionScheduler
+            with --schedule
+        
+    Returns:
+        RoboticArm: The arm (a chain.ChainArm for more than two links)
+    """
     # Create robotic arm with segment lengths in cm
     arm_length1 = 12.5  # First segment length (cm)
     arm_length2 = 14  # Second segment length (cm)
-    arm = RoboticArm(arm_length1, arm_length2)
+    if sender is None:
+        from transport import make_sender
+        sender = make_sender(args.transport, args.port, args.protocol)
+        if args.schedule:
+            from scheduler import MotionScheduler
+            sender = MotionScheduler(sender, time_scale=args.time_scale)
+    limits = None
+    if not args.ideal_workspace:
+        from workspace import FIRMWARE_LIMITS
+        limits = FIRMWARE_LIMITS
+    if links:
+        from chain import ChainArm
+        return ChainArm(links, port=args.port, tcp_sender=sender, limits=limits)
+    return RoboticArm(arm_length1, arm_length2, port=args.port, tcp_sender=sender,
+                      limits=limits)
+
+def main(argv=None):
+    """Main function to run the application."""
+    args, links = parse_args(argv)
     
-    # Create GUI
-    root = tk.Tk()
-    app = ArmGUI(root, arm)
+    if args.control_process:
+        # The control process sets up its own logging and metrics
+        from control import run_split
+        listener = metrics.setup_logging(getattr(logging, args.log_level), args.log_sample)
+        try:
+            run_split(args, links)
+        finally:
+            listener.stop()
+        return
+    
+    listener = metrics.setup_logging(getattr(logging, args.log_level), args.log_sample)
+    metrics_server, stop_dump = start_metrics(args)
+    
+    arm = build_arm(args, links)
+    if args.stream_rate:
+        arm.streamer = TrajectoryStreamer(arm.tcp_sender, rate=args.stream_rate)
+    if args.record:
+        from recorder import SessionRecorder
+        arm.recorder = SessionRecorder(args.record)
+    if not (args.job and args.dry_run):
+        arm.tcp_sender.start_server()
     
-    # Start the main loop
     try:
-        root.mainloop()
+        if args.job:
+            from jobs import BulkJob
+            job = BulkJob(arm, args.job, args.chunk_size, args.on_unreachable, args.time_scale)
+            try:
+                if args.dry_run:
+                    print(job.check())
+                else:
+                    print(job.run())
+            except ValueError as e:
+                log.error("Job failed: %s", e)
+            finally:
+                arm.tcp_sender.cleanup()
+            return
+        
+        if args.headless:
+            try:
+                run_headless(arm)
+            finally:
+                arm.tcp_sender.cleanup()
+            return
+        
+        import tkinter as tk
+        
+        # Create GUI
+        root = tk.Tk()
+        app = ArmGUI(root, arm, drag_rate=args.drag_rate)
+        if args.cartesian:
+            from planner import CartesianPlanner
+            app.visualizer.planner = CartesianPlanner(arm)
+        
+        # Start the main loop
+        try:
+            root.mainloop()
+        finally:
+            # Make sure to clean up the TCP sender
+            if arm.tcp_sender:
+                arm.tcp_sender.cleanup()
     finally:
-        # Make sure to clean up the TCP sender
-        if arm.tcp_sender:
-            arm.tcp_sender.cleanup()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if stop_dump is not None:
+            stop_dump()
+        if arm.recorder is not None:
+            arm.recorder.close()
+        listener.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
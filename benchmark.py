@@ -0,0 +1,872 @@
+"""
+Benchmarks for the robotic arm controller.
+
+Everything runs headless (rendering uses the Agg backend) against loopback
+sockets. Results can be saved as JSON and compared between commits.
+
+Run from the repository root, for example:
+
+    python benchmark.py                          # all benchmarks
+    python benchmark.py kinematics render        # a subset
+    python benchmark.py --json after.json --compare before.json
+"""
+import argparse
+import contextlib
+import json
+import logging
+import platform
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from app import (TCPSender, AsyncTCPSender, RoboticArm, FramePacker, pack_angles, pack_command,
+                 unpack_frame, FRAME_HEADER, FRAME_BATCH, FRAME_MAX_COMMANDS)
+from fleet import FleetTCPSender
+from transport import UDPSender, LoopbackSender, make_sender, UDP_HELLO, UDP_HELLO_MAGIC
+
+def summarize(samples):
+    """
+    Summarize latency samples.
+
+    Args:
+        samples (list): Durations in seconds
+
+    Returns:
+        dict: Sample count and mean/percentile/max values in ms
+    """
+    if not samples:
+        return {'n': 0}
+    ms = np.asarray(samples) * 1000.0
+    return {
+        'n': int(ms.size),
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+    }
+
+def time_calls(func, args_list):
+    """
+    Time individual calls.
+
+    Args:
+        func (callable): Function to call
+        args_list (list): Argument tuples, one call each
+
+    Returns:
+        list: Call durations in seconds
+    """
+    samples = []
+    perf_counter = time.perf_counter
+    for args in args_list:
+        start = perf_counter()
+        func(*args)
+        samples.append(perf_counter() - start)
+    return samples
+
+def random_targets(n, seed=0, reach=30.0):
+    """Random (y, z) targets covering and exceeding the workspace."""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, reach, n), rng.uniform(0, reach, n)
+
+def bench_kinematics(n_scalar=20000, n_bulk=1000000):
+    """
+    Measure scalar and bulk IK/FK and differential IK steps.
+
+    Args:
+        n_scalar (int): Number of timed scalar calls
+        n_bulk (int): Number of points per bulk call
+
+    Returns:
+        dict: Per-call latency summaries and bulk throughput
+    """
+    arm = RoboticArm(12.5, 14)
+    ys, zs = random_targets(n_scalar)
+    targets = list(zip(ys.tolist(), zs.tolist()))
+    ik = time_calls(arm.inverse_kinematics, targets)
+    theta1s, theta2s, _ = arm.inverse_kinematics_batch(ys, zs)
+    angles = list(zip(theta1s.tolist(), theta2s.tolist()))
+    fk = time_calls(arm.forward_kinematics, angles)
+
+    ys, zs = random_targets(n_bulk, seed=1)
+    bulk_ik = time_calls(arm.inverse_kinematics_batch, [(ys, zs)] * 5)
+    theta1s, theta2s, _ = arm.inverse_kinematics_batch(ys, zs)
+    bulk_fk = time_calls(arm.forward_kinematics_batch, [(theta1s, theta2s)] * 5)
+
+    # One differential IK step per call, warm-started from the exact solution
+    arm.set_angles(*angles[0])
+    dik = time_calls(arm.differential_ik, targets)
+    bulk_dik = time_calls(arm.differential_ik_batch, [(theta1s, theta2s, ys, zs)] * 5)
+
+    return {
+        'ik_scalar': summarize(ik),
+        'dik_scalar': summarize(dik),
+        'fk_scalar': summarize(fk),
+        'ik_bulk': dict(summarize(bulk_ik), points=n_bulk,
+                        points_per_s=n_bulk / float(np.median(bulk_ik))),
+        'fk_bulk': dict(summarize(bulk_fk), points=n_bulk,
+                        points_per_s=n_bulk / float(np.median(bulk_fk))),
+        'dik_bulk': dict(summarize(bulk_dik), points=n_bulk,
+                         points_per_s=n_bulk / float(np.median(bulk_dik))),
+    }
+
+def bench_planner(n=200):
+    """
+    Measure Cartesian planning time for random straight-line moves.
+
+    Args:
+        n (int): Number of planned moves
+
+    Returns:
+        dict: Planning latency summary and mean move duration
+    """
+    from planner import CartesianPlanner
+
+    arm = RoboticArm(12.5, 14)
+    planner = CartesianPlanner(arm)
+    ys, zs = random_targets(2 * n, seed=2, reach=16.0)
+    ys, zs = ys + 2.0, zs + 2.0
+    moves = [([(ys[i], zs[i]), (ys[n + i], zs[n + i])],) for i in range(n)]
+    plans = [planner.plan(*args) for args in moves[:20]]
+    times = time_calls(planner.plan, moves)
+    return {
+        'plan': summarize(times),
+        'move_duration_s': float(np.mean([plan[-1, 0] for plan in plans])),
+    }
+
+@contextlib.contextmanager
+def quiet_logs(level=logging.ERROR):
+    """
+    Raise the controller's log level while a benchmark runs.
+
+    Args:
+        level (int): Lowest level still logged
+    """
+    logger = logging.getLogger('robotic_arm')
+    previous = logger.level
+    logger.setLevel(level)
+    try:
+        yield
+    finally:
+        logger.setLevel(previous)
+
+def free_port():
+    """Get a free local TCP port."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def connect(port, timeout=5.0):
+    """Connect a loopback client standing in for the ESP32."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            client = socket.create_connection(("127.0.0.1", port), timeout=timeout)
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return client
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.01)
+
+def recv_exact(sock, size):
+    """Receive exactly size bytes."""
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return data
+
+def command_size(sender, joints=2):
+    """Bytes one send_angles() call puts on the wire."""
+    if sender.packer is None:
+        return 4 * joints
+    return FRAME_HEADER.size + FRAME_BATCH.size + 2 * joints
+
+def wait_connected(sender, timeout=5.0):
+    """Wait until the sender reports a connected client."""
+    deadline = time.monotonic() + timeout
+    while not sender.connected:
+        if time.monotonic() > deadline:
+            raise TimeoutError("client never connected")
+        time.sleep(0.001)
+
+class TransportClient:
+    def __init__(self, sender, timeout=5.0):
+        """
+        Stand-in for the ESP32 on any sender's transport.
+
+        TCP senders get a loopback connection, UDPSender a socket that says
+        hello every UDP_HELLO_MS like the firmware, and LoopbackSender an
+        in-process queue fed by its callback.
+
+        Args:
+            sender: Started sender to receive from
+            timeout (float): Connect timeout in seconds
+        """
+        self.sender = sender
+        self.sock = None
+        self.closed = threading.Event()
+        if isinstance(sender, LoopbackSender):
+            self.commands = queue.SimpleQueue()
+            sender.on_angles = self.commands.put
+        elif isinstance(sender, UDPSender):
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.connect(("127.0.0.1", sender.port))
+            self.hello = threading.Thread(target=self._say_hello, daemon=True)
+            self.hello.start()
+        else:
+            self.sock = connect(sender.port, timeout)
+            self.size = command_size(sender)
+
+    def _say_hello(self):
+        """Announce the client to a UDPSender until closed."""
+        while not self.closed.is_set():
+            try:
+                self.sock.send(UDP_HELLO.pack(UDP_HELLO_MAGIC, 0))
+            except OSError:
+                pass
+            self.closed.wait(0.5)
+
+    def receive(self, timeout=None):
+        """
+        Wait for one command.
+
+        Args:
+            timeout (float): Seconds to wait, None to block
+
+        Returns:
+            The command: the angles for loopback, the raw bytes otherwise
+
+        Raises:
+            TimeoutError: No command within timeout
+        """
+        if self.sock is None:
+            try:
+                return self.commands.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError("no command") from None
+        self.sock.settimeout(timeout)
+        if isinstance(self.sender, UDPSender):
+            return self.sock.recv(2048)
+        return recv_exact(self.sock, self.size)
+
+    def close(self):
+        """Disconnect from the sender."""
+        self.closed.set()
+        if self.sock is not None:
+            self.sock.close()
+        else:
+            self.sender.on_angles = None
+
+def bench_send_latency(transport, n=300, interval=0.005):
+    """
+    Measure send_angles() to client receive latency on loopback.
+
+    Args:
+        transport (str): Transport name, see transport.make_sender
+        n (int): Number of commands
+        interval (float): Pause between commands in seconds
+
+    Returns:
+        dict: Latency summary
+    """
+    sender = make_sender(transport, free_port())
+    sender.start_server()
+    client = TransportClient(sender)
+    samples = []
+    try:
+        wait_connected(sender)
+        for i in range(n):
+            theta1 = np.radians(i % 180)
+            start = time.perf_counter()
+            sender.send_angles(theta1, np.radians(90))
+            client.receive(5.0)
+            samples.append(time.perf_counter() - start)
+            time.sleep(interval)
+    finally:
+        client.close()
+        sender.cleanup()
+    return summarize(samples)
+
+def bench_reconnect(transport, rounds=10, period=0.02, timeout=3.0):
+    """
+    Measure how long a reconnecting client waits for its first command.
+
+    The previous client drops without warning and a new one connects
+    (for UDP: says hello from a new address) while commands keep being
+    issued every period seconds.
+
+    Args:
+        transport (str): 'asyncio', 'threaded' or 'udp'
+        rounds (int): Number of reconnects
+        period (float): Command period in seconds
+        timeout (float): Give up on a round after this many seconds
+
+    Returns:
+        dict: Latency summary plus the number of rounds that timed out
+    """
+    sender = make_sender(transport, free_port())
+    sender.start_server()
+    samples = []
+    timeouts = 0
+    client = TransportClient(sender)
+    try:
+        wait_connected(sender)
+        for _ in range(rounds):
+            client.close()
+            client = TransportClient(sender)
+            start = time.perf_counter()
+            while True:
+                sender.send_angles(np.radians(45), np.radians(90))
+                try:
+                    client.receive(period)
+                    samples.append(time.perf_counter() - start)
+                    break
+                except TimeoutError:
+                    if time.perf_counter() - start > timeout:
+                        timeouts += 1
+                        break
+    finally:
+        client.close()
+        sender.cleanup()
+    result = summarize(samples)
+    result['timeouts'] = timeouts
+    return result
+
+def bench_send_throughput(transport, seconds=1.0):
+    """
+    Hammer send_angles() and count what reaches a loopback client.
+
+    The TCP senders keep only the newest pose, so commands issued faster
+    than the socket drains are coalesced rather than queued; UDP and
+    loopback send every command.
+
+    Args:
+        transport (str): Transport name, see transport.make_sender
+        seconds (float): How long to send for
+
+    Returns:
+        dict: Commands issued and delivered per second
+    """
+    sender = make_sender(transport, free_port())
+    sender.start_server()
+    client = TransportClient(sender)
+    received = [0]
+
+    def drain():
+        try:
+            while True:
+                client.receive(0.5)
+                received[0] += 1
+        except (TimeoutError, ConnectionError, OSError):
+            pass
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    try:
+        wait_connected(sender)
+        issued = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            sender.send_angles(np.radians(issued % 180), np.radians(90))
+            issued += 1
+        elapsed = time.perf_counter() - start
+        time.sleep(0.2)
+    finally:
+        sender.cleanup()
+        client.close()
+    delivered = received[0]
+    return {
+        'issued_per_s': issued / elapsed,
+        'delivered_per_s': delivered / elapsed,
+        'coalesced_fraction': 1 - delivered / issued if issued else 0.0,
+    }
+
+def bench_transport():
+    """Compare end-to-end command latency and throughput across transports."""
+    results = {}
+    for transport, sender_cls in (('threaded', TCPSender), ('asyncio', AsyncTCPSender),
+                                  ('udp', UDPSender), ('loopback', LoopbackSender)):
+        # Keep per-command and reconnect logging out of the measurement
+        with quiet_logs():
+            result = results[sender_cls.__name__] = {'send_latency': bench_send_latency(transport)}
+            if transport != 'loopback':
+                result['reconnect'] = bench_reconnect(transport)
+            result['throughput'] = bench_send_throughput(transport)
+    return results
+
+def stream_commands(chunks, decode):
+    """
+    Push pre-packed data through a loopback TCP connection and decode it.
+
+    Args:
+        chunks (list): Byte strings, one sendall each
+        decode (callable): Takes the received bytes, returns the number of
+            commands decoded
+
+    Returns:
+        dict: Commands per second and seconds from first send to decoded
+    """
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+        client = connect(server.getsockname()[1])
+        conn, _ = server.accept()
+    total = sum(len(chunk) for chunk in chunks)
+    received = []
+
+    def drain():
+        buffer = bytearray()
+        while len(buffer) < total:
+            data = conn.recv(1 << 20)
+            if not data:
+                break
+            buffer += data
+        received.append(bytes(buffer))
+
+    reader = threading.Thread(target=drain, daemon=True)
+    try:
+        start = time.perf_counter()
+        reader.start()
+        for chunk in chunks:
+            client.sendall(chunk)
+        reader.join()
+        commands = decode(received[0])
+        elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+        conn.close()
+    return {'commands_per_s': commands / elapsed, 'seconds': elapsed}
+
+def bench_protocol(n=200000, n_stream=20000):
+    """
+    Compare the legacy int32 format with the framed protocol.
+
+    Measures packing cost and wire size per command, and end-to-end
+    throughput of n_stream two-joint commands over loopback TCP
+    (packing, one sendall per message and decoding on the far side).
+
+    Args:
+        n (int): Commands packed for the encode timings
+        n_stream (int): Commands pushed through the socket
+
+    Returns:
+        dict: Per-format encode time, bytes per command and throughput
+    """
+    rng = np.random.default_rng(0)
+    angles = np.column_stack((rng.uniform(0, np.pi, n), rng.uniform(np.pi, 2 * np.pi, n)))
+    poses = [tuple(pose) for pose in angles.tolist()]
+    packer = FramePacker()
+    batch = FRAME_MAX_COMMANDS
+
+    def encode(pack, items):
+        start = time.perf_counter()
+        for item in items:
+            pack(item)
+        return (time.perf_counter() - start) / n * 1e6
+
+    results = {
+        'legacy': {
+            'encode_us': encode(lambda pose: pack_angles(*pose), poses),
+            'bytes_per_command': 8,
+            'resolution_deg': 1.0,
+        },
+        'framed': {
+            'encode_us': encode(lambda pose: pack_command(packer, pose), poses),
+            'bytes_per_command': FRAME_HEADER.size + FRAME_BATCH.size + 4,
+            'resolution_deg': 0.01,
+        },
+        'framed_batch': {
+            'encode_us': encode(packer.pack, np.split(angles, n // batch)),
+            'bytes_per_command': (FRAME_HEADER.size + FRAME_BATCH.size + 4 * batch) / batch,
+            'resolution_deg': 0.01,
+        },
+    }
+
+    def decode_legacy(data):
+        return len(np.frombuffer(data, dtype='<i4').reshape(-1, 2))
+
+    def decode_framed(data):
+        offset = count = 0
+        while offset < len(data):
+            _, _, _, cdeg, offset = unpack_frame(data, offset)
+            count += len(cdeg)
+        return count
+
+    stream = poses[:n_stream]
+    results['legacy']['stream'] = stream_commands(
+        [pack_angles(*pose)[0] for pose in stream], decode_legacy)
+    results['framed']['stream'] = stream_commands(
+        [bytes(pack_command(packer, pose)[0]) for pose in stream], decode_framed)
+    results['framed_batch']['stream'] = stream_commands(
+        [bytes(packer.pack(angles[i:i + batch], replace=False)) for i in range(0, n_stream, batch)],
+        decode_framed)
+    return results
+
+def bench_render(frames=200):
+    """
+    Measure ArmVisualizer.update_plot frame time on the Agg backend.
+
+    Args:
+        frames (int): Number of frames with a moving arm
+
+    Returns:
+        dict: Frame-time summaries for full redraws and blitting
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from app import ArmVisualizer
+
+    results = {}
+    for blit in (False, True):
+        arm = RoboticArm(12.5, 14)
+        visualizer = ArmVisualizer(arm, blit=blit)
+        visualizer.fig.canvas.draw()
+        for i in range(frames):
+            arm.set_angles(np.pi / 2 - i * 0.005, -i * 0.01)
+            visualizer.update_plot()
+        # Unchanged state must be skipped
+        for _ in range(10):
+            visualizer.update_plot()
+        result = summarize(list(visualizer.frame_times))
+        result['skipped'] = visualizer.frames_skipped
+        results['blit' if blit else 'full'] = result
+        plt.close(visualizer.fig)
+    return results
+
+def bench_fleet(n_arms=32, rounds=100):
+    """
+    Measure broadcast fan-out latency to many arms.
+
+    One arm never reads its socket to check that a stalled client does
+    not delay the others.
+
+    Args:
+        n_arms (int): Number of connected loopback arms
+        rounds (int): Number of broadcasts
+
+    Returns:
+        dict: Latency until the last arm has received each broadcast
+    """
+    with quiet_logs():
+        fleet = FleetTCPSender(free_port(), handshake_timeout=1.0)
+        fleet.start_server()
+        size = command_size(fleet)
+        clients = []
+        try:
+            for i in range(n_arms):
+                client = connect(fleet.port)
+                client.sendall(f"arm-{i}\n".encode())
+                clients.append(client)
+            deadline = time.monotonic() + 5
+            while len(fleet.connected_arms()) < n_arms and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            samples = []
+            for i in range(rounds):
+                start = time.perf_counter()
+                fleet.broadcast(np.radians(i % 180), np.radians(90))
+                # clients[0] is the stalled arm
+                for client in clients[1:]:
+                    recv_exact(client, size)
+                samples.append(time.perf_counter() - start)
+        finally:
+            for client in clients:
+                client.close()
+            fleet.cleanup()
+    result = summarize(samples)
+    result['arms'] = n_arms
+    return result
+
+def bench_loop(seconds=1.0, stall_every=50, stall_periods=3):
+    """
+    Measure ControlLoop tick jitter and its overrun policies.
+
+    Every stall_every-th step overruns by stall_periods periods, standing
+    in for a GC pause or a slow send.
+
+    Args:
+        seconds (float): Run time per case
+        stall_every (int): Steps between stalls
+        stall_periods (int): Length of a stall in periods
+
+    Returns:
+        dict: ControlLoop.stats() per rate and policy
+    """
+    from control import ControlLoop
+
+    results = {}
+    for rate in (100, 500):
+        for policy in ('skip', 'catch-up'):
+            loop = ControlLoop(rate, policy)
+            period = loop.period
+
+            def step(t):
+                if loop.ticks % stall_every == stall_every // 2:
+                    time.sleep(stall_periods * period)
+
+            loop.run(step, ticks=int(seconds * rate))
+            results[f'{rate}hz_{policy}'] = loop.stats()
+    return results
+
+def bench_simulation(ticks=300, command_rate=0.5):
+    """
+    Measure FleetSimulation tick cost at growing fleet sizes.
+
+    Each 10 ms tick sends command_rate targets per arm per second to
+    random arms (IK included) and advances every arm.
+
+    Args:
+        ticks (int): Ticks per fleet size
+        command_rate (float): Targets per arm per second
+
+    Returns:
+        dict: Tick-time summary and real-time capacity per fleet size
+    """
+    from simulation import FleetSimulation
+
+    results = {}
+    for count in (1000, 10000, 100000):
+        sim = FleetSimulation(count)
+        rng = np.random.default_rng(0)
+        samples = []
+        for _ in range(ticks):
+            start = time.perf_counter()
+            n = rng.poisson(count * command_rate / 100)
+            if n:
+                arms = rng.choice(count, size=n, replace=False)
+                sim.set_targets(rng.uniform(0, 25, n), rng.uniform(0, 25, n), arms)
+            sim.step(10)
+            samples.append(time.perf_counter() - start)
+        result = summarize(samples)
+        result['arms_per_core'] = int(count * 0.010 / np.mean(samples))
+        result['commands_executed'] = sim.commands_executed
+        results[f'{count}_arms'] = result
+    return results
+
+def bench_scheduler(speed=10.0, n=80, max_gap=0.06):
+    """
+    Compare plain and scheduled sends to an emulated arm.
+
+    Targets are requested at random intervals, faster than the arm can
+    move. Without the scheduler the firmware silently overwrites most of
+    them; with it they are merged on the host, and its predicted arrival
+    time is checked against the emulator's timeline.
+
+    Args:
+        speed (float): Emulator clock acceleration
+        n (int): Targets requested per run
+        max_gap (float): Longest pause between requests in wall seconds
+
+    Returns:
+        dict: Per mode, what the arm received, overwrote and executed; for
+            the scheduler its counters and the prediction error summary
+            (in emulated time)
+    """
+    import asyncio
+    from emulator import make_emulators, run_emulators
+    from scheduler import MotionScheduler
+
+    results = {}
+    for mode in ('direct', 'scheduled'):
+        sender = AsyncTCPSender(free_port())
+        if mode == 'scheduled':
+            sender = MotionScheduler(sender, time_scale=speed)
+        sender.start_server()
+        emulator = make_emulators(1, port=sender.port, speed=speed, record_steps=False)[0]
+        thread = threading.Thread(target=lambda: asyncio.run(run_emulators([emulator], 600)),
+                                  daemon=True)
+        thread.start()
+        rng = np.random.default_rng(0)
+        predicted = {}
+        try:
+            wait_connected(sender)
+            for i in range(n):
+                # A distinct servo 0 angle per target identifies its move
+                theta1 = 10 + i
+                sender.send_angles(np.radians(theta1 + 0.2), np.radians(rng.integers(40, 130) + 0.2))
+                if mode == 'scheduled':
+                    predicted[theta1] = time.monotonic() + sender.estimated_time_to_pose()
+                time.sleep(rng.uniform(0, max_gap))
+            # Until the last target is reached
+            deadline = time.monotonic() + 30 / speed
+            while emulator.pose[0] != theta1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            sender.cleanup()
+            emulator.stop()
+        report = emulator.report()
+        result = results[mode] = {key: report[key] for key in
+                                  ('commands_received', 'commands_overwritten', 'commands_executed')}
+        if mode == 'scheduled':
+            errors = []
+            started = None
+            for entry in emulator.timeline:
+                if entry['kind'] == 'move_start':
+                    started = entry['angles'][0]
+                elif entry['kind'] == 'reached' and started in predicted:
+                    reached = emulator.clock.start + entry['t'] / speed
+                    errors.append(abs(reached - predicted[started]) * speed)
+            result.update(sender.stats())
+            result['prediction_error'] = summarize(errors)
+    return results
+
+def bench_control(n=100):
+    """
+    Measure how long the control process takes to pick up a new target
+    while the GUI process is idle and while it renders full frames.
+
+    Args:
+        n (int): Targets per case
+
+    Returns:
+        dict: Request-to-take latency summaries and loop counters
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import app
+    from control import ControlLink, ControlProcess, SharedArmVisualizer
+
+    args, links = app.parse_args(['--control-process', '--port', str(free_port()),
+                                  '--log-level', 'WARNING'])
+    process = ControlProcess(args, links)
+    process.start()
+    results = {}
+    try:
+        link = ControlLink(process.state, args.port)
+        arm = app.build_arm(args, links, link)
+        visualizer = SharedArmVisualizer(arm, blit=False)
+        status = link.refresh(arm)
+        while status is None or status['ticks'] == 0:
+            time.sleep(0.01)
+            status = link.refresh(arm)
+        # Post at random points of the control period
+        rng = np.random.default_rng(0)
+        for case in ('idle', 'rendering'):
+            samples = []
+            for i in range(n):
+                time.sleep(rng.uniform(0, 1.0 / args.control_rate))
+                request_id = link.request(10.0 + i % 10, 12.0, 0.05)
+                status = link.refresh(arm)
+                while status is None or status['request_id'] < request_id:
+                    if case == 'rendering':
+                        visualizer.invalidate()
+                        visualizer.fig.canvas.draw()
+                    else:
+                        time.sleep(0.001)
+                    status = link.refresh(arm)
+                samples.append(float(status['latency']))
+            results[case] = summarize(samples)
+        results['ticks'] = int(status['ticks'])
+        results['overruns'] = int(status['overruns'])
+        plt.close(visualizer.fig)
+    finally:
+        process.stop()
+    return results
+
+BENCHMARKS = {
+    'kinematics': bench_kinematics,
+    'planner': bench_planner,
+    'transport': bench_transport,
+    'protocol': bench_protocol,
+    'fleet': bench_fleet,
+    'render': bench_render,
+    'loop': bench_loop,
+    'simulation': bench_simulation,
+    'scheduler': bench_scheduler,
+    'control': bench_control,
+}
+
+def environment():
+    """Describe the machine and commit the results were taken on."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+    }
+
+def flatten(results, prefix=''):
+    """Flatten nested results into {'a.b.c': value} for numeric leaves."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(old, new):
+    """
+    Print latency/throughput metrics side by side with their ratio.
+
+    Args:
+        old (dict): Earlier results (as saved with --json)
+        new (dict): Current results
+    """
+    old_flat = flatten(old.get('results', {}))
+    new_flat = flatten(new['results'])
+    print(f"\nComparison with {old.get('environment', {}).get('commit')}:")
+    for name, value in new_flat.items():
+        if name not in old_flat or not name.endswith(('_ms', '_per_s')):
+            continue
+        before = old_flat[name]
+        ratio = value / before if before else float('inf')
+        print(f"  {name}: {before:.3f} -> {value:.3f} ({ratio:.2f}x)")
+
+def print_results(name, results, indent=0):
+    """Print a nested result dict."""
+    pad = ' ' * indent
+    print(f"{pad}{name}:")
+    for key, value in results.items():
+        if isinstance(value, dict):
+            print_results(key, value, indent + 2)
+        elif isinstance(value, float):
+            print(f"{pad}  {key}: {value:.3f}")
+        else:
+            print(f"{pad}  {key}: {value}")
+
+def main(argv=None):
+    """Run the selected benchmarks."""
+    parser = argparse.ArgumentParser(description="Robotic arm benchmarks")
+    parser.add_argument('names', nargs='*', metavar='name',
+                        help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('--json', metavar='FILE', help="save results as JSON")
+    parser.add_argument('--compare', metavar='FILE', help="compare with earlier JSON results")
+    args = parser.parse_args(argv)
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    output = {'environment': environment(), 'results': {}}
+    for name in args.names or BENCHMARKS:
+        output['results'][name] = BENCHMARKS[name]()
+        print_results(name, output['results'][name])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(output, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,541 @@
+"""
+Planar N-link chains (e.g. the 2-link arm plus a wrist).
+
+Joint angles are relative (each measured from the previous link), so
+forward kinematics is a cumulative sum of angles followed by a cumulative
+sum of link vectors, vectorized over any leading dimensions. IK for more
+than two links is numeric: damped-least-squares iterations with a bounded
+budget, warm-started from a cache of recent solutions or the current
+pose. A 2-link ChainArm keeps RoboticArm's closed-form solver.
+
+The transport sends one int32 per joint (see app.pack_angles); the
+firmware must be built with the same JOINT_COUNT. It sends |theta2|, so
+the numeric IK stays on the elbow-up branch (sin(theta2) <= 0) the
+firmware executes, and with limits it keeps every iteration inside the
+servo ranges: the base and elbow per JointLimits, later joints within
+WRIST_LIMIT of straight (the servo's 0-180 degrees around 90).
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from app import RoboticArm
+
+# Later joints are sent as 90 + angle and clamped to 0-180 by the servo
+WRIST_LIMIT = np.pi / 2
+
+def chain_positions(angles, lengths):
+    """
+    Joint positions of planar chains.
+
+    Args:
+        angles (array_like): (..., N) relative joint angles in radians
+        lengths (array_like): (N,) link lengths in cm
+
+    Returns:
+        ndarray: (..., N + 1, 2) positions from the base (always the
+            origin) to the end effector
+    """
+    absolute = np.cumsum(angles, axis=-1)
+    links = np.stack((lengths * np.cos(absolute), lengths * np.sin(absolute)), axis=-1)
+    base = np.zeros(links.shape[:-2] + (1, 2))
+    return np.concatenate((base, np.cumsum(links, axis=-2)), axis=-2)
+
+def chain_jacobian(angles, lengths):
+    """
+    End effector Jacobian of planar chains.
+
+    Joint i moves every link from i on, so its column is the (rotated)
+    sum of those links: a reversed cumulative sum.
+
+    Args:
+        angles (array_like): (..., N) relative joint angles in radians
+        lengths (array_like): (N,) link lengths in cm
+
+    Returns:
+        ndarray: (..., 2, N) matrices d(y, z) / d(angles)
+    """
+    absolute = np.cumsum(angles, axis=-1)
+    ys = lengths * np.cos(absolute)
+    zs = lengths * np.sin(absolute)
+    dy = -np.flip(np.cumsum(np.flip(zs, -1), axis=-1), -1)
+    dz = np.flip(np.cumsum(np.flip(ys, -1), axis=-1), -1)
+    return np.stack((dy, dz), axis=-2)
+
+def chain_reach(lengths):
+    """
+    Workspace radii of a planar chain.
+
+    Args:
+        lengths (array_like): Link lengths in cm
+
+    Returns:
+        tuple: (min_reach, max_reach) in cm
+    """
+    lengths = np.asarray(lengths, dtype=float)
+    total = float(lengths.sum())
+    return max(0.0, 2 * float(lengths.max()) - total), total
+
+def chain_dls_velocity(angles, vy, vz, lengths, damping=0.5, threshold=0.15):
+    """
+    Damped-least-squares joint velocities of planar chains.
+
+    Computes J^T (J J^T + lambda^2 I)^-1 v. Damping fades in as the
+    manipulability sqrt(det(J J^T)) drops below threshold times its peak
+    for the first two links, like dls_velocity. The 2x2 system is solved
+    in closed form so this vectorizes over any leading dimensions.
+
+    Args:
+        angles (ndarray): (..., N) relative joint angles in radians
+        vy (array_like): End effector y velocities (or displacements)
+        vz (array_like): End effector z velocities (or displacements)
+        lengths (ndarray): (N,) link lengths in cm
+        damping (float): Damping factor at singular poses in cm
+        threshold (float): Manipulability fraction where damping starts
+
+    Returns:
+        ndarray: (..., N) joint velocities (or displacements)
+    """
+    jacobian = chain_jacobian(angles, lengths)
+    dy, dz = jacobian[..., 0, :], jacobian[..., 1, :]
+    a = (dy * dy).sum(axis=-1)
+    b = (dy * dz).sum(axis=-1)
+    c = (dz * dz).sum(axis=-1)
+    w = np.sqrt(np.maximum(a * c - b * b, 0.0))
+    w0 = threshold * lengths[0] * lengths[1]
+    lam2 = np.where(w < w0, damping**2 * (1 - (w / w0)**2), 0.0)
+    a = a + lam2
+    c = c + lam2
+    det = a * c - b * b
+    fy = (c * vy - b * vz) / det
+    fz = (a * vz - b * vy) / det
+    return dy * fy[..., None] + dz * fz[..., None]
+
+def chain_dls_step(angles, target, lengths, damping=0.5, threshold=0.15, max_step=2.0):
+    """
+    One damped-least-squares IK iteration for planar chains.
+
+    Args:
+        angles (ndarray): (..., N) relative joint angles in radians
+        target (ndarray): (..., 2) target end effector positions in cm
+        lengths (ndarray): (N,) link lengths in cm
+        damping (float): Damping factor at singular poses in cm
+        threshold (float): Manipulability fraction where damping starts
+        max_step (float): Longest Cartesian error in cm corrected per step
+
+    Returns:
+        tuple: (updated angles, end effector error in cm before the step)
+    """
+    end = chain_positions(angles, lengths)[..., -1, :]
+    ey = target[..., 0] - end[..., 0]
+    ez = target[..., 1] - end[..., 1]
+    distance = np.hypot(ey, ez)
+    scale = np.minimum(1.0, max_step / np.maximum(distance, 1e-12))
+    step = chain_dls_velocity(angles, ey * scale, ez * scale, lengths, damping, threshold)
+    return angles + step, distance
+
+def project_chain(angles, limits=None):
+    """
+    Pull chain poses onto what the firmware executes.
+
+    The elbow stops on the straight (or folded) boundary instead of
+    crossing into the elbow-down branch, like app.dls_step. With limits,
+    the base goes to its nearest bound, the bend is clamped, and later
+    joints stay within WRIST_LIMIT.
+
+    Args:
+        angles (ndarray): (..., N) relative joint angles in radians
+        limits (workspace.JointLimits): Servo limits, or None
+
+    Returns:
+        ndarray: Projected angles (a new array)
+    """
+    angles = np.array(angles, dtype=float)
+    theta2 = angles[..., 1]
+    angles[..., 1] = np.where(np.sin(theta2) > 0, np.round(theta2 / np.pi) * np.pi, theta2)
+    if limits is None:
+        return angles
+    theta1 = angles[..., 0] % (2 * np.pi)
+    below = (limits.theta1_min - theta1) % (2 * np.pi)
+    above = (theta1 - limits.theta1_max) % (2 * np.pi)
+    outside = (theta1 < limits.theta1_min) | (theta1 > limits.theta1_max)
+    angles[..., 0] = np.where(outside, np.where(below < above, limits.theta1_min,
+                                                limits.theta1_max), theta1)
+    bend = np.clip(-angles[..., 1] % (2 * np.pi), limits.bend_min, limits.bend_max)
+    angles[..., 1] = -bend
+    wrist = (angles[..., 2:] + np.pi) % (2 * np.pi) - np.pi
+    angles[..., 2:] = np.clip(wrist, -WRIST_LIMIT, WRIST_LIMIT)
+    return angles
+
+class ChainArm(RoboticArm):
+    def __init__(self, lengths, port=3000, tcp_sender=None, max_iterations=100,
+                 tolerance=1e-3, damping=0.5, max_step=2.0, cache_entries=1024, quantum=1e-2,
+                 limits=None):
+        """
+        Initialize an arm with any number (>= 2) of links.
+
+        Args:
+            lengths (sequence): Link lengths in cm, base first
+            port (int): Port number for the default AsyncTCPSender
+            tcp_sender: Sender to use instead
+            max_iterations (int): Iteration budget per numeric IK solve
+            tolerance (float): Position error in cm counted as solved
+            damping (float): Damping factor at singular poses in cm
+            max_step (float): Longest Cartesian error in cm corrected per
+                iteration
+            cache_entries (int): Warm-start cache size (0 disables it)
+            quantum (float): Cache key resolution in cm
+            limits (workspace.JointLimits): Servo limits for the first two
+                joints (later joints then stay within WRIST_LIMIT), or None
+        """
+        lengths = np.asarray(lengths, dtype=float)
+        if lengths.ndim != 1 or len(lengths) < 2:
+            raise ValueError("a chain needs at least two link lengths")
+        super().__init__(lengths[0], lengths[1], port, tcp_sender, limits)
+        self.link_lengths = lengths
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+        self.damping = damping
+        self.max_step = max_step
+        self.cache_entries = cache_entries
+        self.quantum = quantum
+        self.cache = OrderedDict()
+        self.iterations = 0
+
+        # Later joints start straight; the first two as in RoboticArm
+        self.joint_angles = np.zeros(len(lengths))
+        self.joint_angles[0] = self.theta1
+        self.target_joint_angles = None
+        # Elbow-up fallback seed, bent evenly away from the singular
+        # straight pose
+        self.seed = np.full(len(lengths), -np.pi / (2 * len(lengths)))
+        self.seed[0] = np.pi / 2
+        self.seed = project_chain(self.seed, limits)
+
+    @property
+    def lengths(self):
+        """Segment lengths in cm, base first."""
+        return tuple(self.link_lengths)
+
+    @property
+    def max_reach(self):
+        """Outer workspace radius in cm."""
+        return chain_reach(self.link_lengths)[1]
+
+    @property
+    def min_reach(self):
+        """Inner workspace radius in cm."""
+        return chain_reach(self.link_lengths)[0]
+
+    @property
+    def angles(self):
+        """Current joint angles in radians, base first."""
+        return tuple(self.joint_angles)
+
+    @property
+    def target_angles(self):
+        """Final target joint angles in radians (None entries before any IK)."""
+        if self.target_joint_angles is None:
+            return (None,) * len(self.link_lengths)
+        return tuple(self.target_joint_angles)
+
+    def set_angles(self, *angles):
+        """
+        Set the joint angles without sending via TCP.
+
+        Args:
+            *angles (float): One angle per joint in radians
+        """
+        self.joint_angles = np.array(angles, dtype=float)
+        self.theta1, self.theta2 = self.joint_angles[:2]
+
+    def forward_kinematics(self, *angles):
+        """
+        Calculate joint and end positions for one set of joint angles.
+
+        Args:
+            *angles (float): One angle per joint in radians
+
+        Returns:
+            tuple: (y, z) positions from the base to the end effector
+        """
+        return tuple(map(tuple, chain_positions(np.asarray(angles, dtype=float), self.link_lengths)))
+
+    def forward_kinematics_batch(self, *angles):
+        """
+        Calculate joint and end positions for many poses at once.
+
+        Args:
+            *angles (array_like): One array of angles per joint
+
+        Returns:
+            tuple: One (..., 2) position array per joint after the base,
+                the end effector last
+        """
+        positions = chain_positions(np.stack(np.broadcast_arrays(*angles), axis=-1), self.link_lengths)
+        return tuple(positions[..., i, :] for i in range(1, positions.shape[-2]))
+
+    def get_arm_positions(self):
+        """
+        Get current positions of the joints and end effector.
+
+        Returns:
+            tuple: (y, z) positions from the base to the end effector
+        """
+        return self.forward_kinematics(*self.joint_angles)
+
+    def clamp_target(self, y, z):
+        """
+        Pull a target onto the reachable annulus like the closed-form IK.
+
+        Returns:
+            tuple: (y, z, reachable)
+        """
+        min_reach, max_reach = chain_reach(self.link_lengths)
+        distance = np.hypot(y, z)
+        if min_reach <= distance <= max_reach:
+            return y, z, True
+        radius = max_reach * 0.99 if distance > max_reach else max(min_reach * 1.01, 1e-6)
+        angle = np.arctan2(z, y)
+        return radius * np.cos(angle), radius * np.sin(angle), False
+
+    def _iterate(self, q, target, budget):
+        """
+        Damped-least-squares iterations from q, each projected onto the
+        poses the firmware executes (project_chain).
+
+        Returns:
+            tuple: (angles, error in cm, iterations used)
+        """
+        q = project_chain(q, self.limits)
+        for i in range(budget):
+            step, distance = chain_dls_step(q, target, self.link_lengths, self.damping,
+                                            max_step=self.max_step)
+            if distance <= self.tolerance:
+                return q, distance, i
+            q = project_chain(step, self.limits)
+        distance = np.hypot(*(target - chain_positions(q, self.link_lengths)[-1]))
+        return q, distance, budget
+
+    def _solve_chain(self, y, z):
+        """
+        Numeric IK with a warm start and a bounded iteration budget.
+
+        Seeds are tried in order until one converges: the cached solution
+        for this target cell, the current pose, then the bent fallback
+        seed. All attempts share max_iterations.
+
+        Returns:
+            tuple: (angles, error in cm)
+        """
+        key = (round(y / self.quantum), round(z / self.quantum))
+        seeds = []
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            seeds.append(self.cache[key])
+        seeds += [self.joint_angles, self.seed]
+
+        target = np.array([y, z])
+        budget = self.max_iterations
+        best, best_error = seeds[0], np.inf
+        self.iterations = 0
+        for seed in seeds:
+            q, error, used = self._iterate(np.array(seed, dtype=float), target, budget)
+            budget -= used
+            self.iterations += used
+            if error < best_error:
+                best, best_error = q, error
+            if error <= self.tolerance or budget <= 0:
+                break
+
+        # Same ranges as the closed form: theta1 in [0, 2*pi), later
+        # joints relative in (-pi, pi]
+        best = (best + np.pi) % (2 * np.pi) - np.pi
+        best[0] %= 2 * np.pi
+        if self.cache_entries and best_error <= self.tolerance:
+            self.cache[key] = best
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.cache_entries:
+                self.cache.popitem(last=False)
+        return best, best_error
+
+    def inverse_kinematics(self, y, z):
+        """
+        Calculate joint angles for a target end effector position.
+
+        Two links use the closed-form solver; longer chains the numeric
+        one. Unreachable targets are pulled onto the workspace edge. A
+        target the numeric IK cannot reach within tolerance (e.g. outside
+        the servo limits) is reported unreachable, with the closest
+        executable pose it found.
+
+        Args:
+            y (float): Target y coordinate in cm
+            z (float): Target z coordinate in cm
+
+        Returns:
+            tuple: One angle per joint in radians, then whether the
+                target is reachable
+        """
+        if len(self.link_lengths) == 2:
+            theta1, theta2, reachable = super().inverse_kinematics(y, z)
+            self.target_joint_angles = np.array([theta1, theta2])
+            return theta1, theta2, reachable
+
+        # Ensure positive coordinates
+        y = abs(y)
+        z = abs(z)
+        self.target = (y, z)
+
+        y_solve, z_solve, in_reach = self.clamp_target(y, z)
+        angles, error = self._solve_chain(y_solve, z_solve)
+        self.reachable = bool(in_reach and error <= self.tolerance)
+        self.target_joint_angles = angles
+        self.target_theta1, self.target_theta2 = angles[:2]
+        return (*angles, self.reachable)
+
+    def inverse_kinematics_batch(self, ys, zs, iterations=None):
+        """
+        Solve many targets at once with vectorized numeric IK.
+
+        Every target starts from the fallback seed and all of them iterate
+        together for a fixed budget. Pure function: the arm state is not
+        modified.
+
+        Args:
+            ys (array_like): Target y coordinates in cm
+            zs (array_like): Target z coordinates in cm
+            iterations (int): Iterations to run (default max_iterations)
+
+        Returns:
+            tuple: One angle array per joint, then a boolean reachable
+                array
+        """
+        if len(self.link_lengths) == 2:
+            return super().inverse_kinematics_batch(ys, zs)
+
+        ys, zs = np.broadcast_arrays(np.abs(np.asarray(ys, dtype=float)),
+                                     np.abs(np.asarray(zs, dtype=float)))
+        min_reach, max_reach = chain_reach(self.link_lengths)
+        distance = np.hypot(ys, zs)
+        in_reach = (distance >= min_reach) & (distance <= max_reach)
+        radius = np.clip(distance, max(min_reach * 1.01, 1e-6), max_reach * 0.99)
+        angle = np.arctan2(zs, ys)
+        target = np.stack((np.where(in_reach, ys, radius * np.cos(angle)),
+                           np.where(in_reach, zs, radius * np.sin(angle))), axis=-1)
+
+        lengths = self.link_lengths
+        q = np.broadcast_to(self.seed, ys.shape + (len(lengths),)).copy()
+        for _ in range(iterations or self.max_iterations):
+            q, _ = chain_dls_step(q, target, lengths, self.damping, max_step=self.max_step)
+            q = project_chain(q, self.limits)
+
+        error = np.hypot(*np.moveaxis(target - chain_positions(q, lengths)[..., -1, :], -1, 0))
+        q = (q + np.pi) % (2 * np.pi) - np.pi
+        q[..., 0] %= 2 * np.pi
+        reachable = in_reach & (error <= self.tolerance)
+        return (*np.moveaxis(q, -1, 0), reachable)
+
+    def jacobian(self, *angles):
+        """
+        Analytic Jacobian of the end effector position.
+
+        Args:
+            *angles (float): One angle per joint in radians, defaults to
+                the current ones
+
+        Returns:
+            ndarray: 2xN matrix d(y, z) / d(angles)
+        """
+        if len(self.link_lengths) == 2:
+            return super().jacobian(*angles)
+        angles = np.array(angles, dtype=float) if angles else self.joint_angles
+        return chain_jacobian(angles, self.link_lengths)
+
+    def joint_velocities(self, vy, vz, damping=0.5, threshold=0.15):
+        """
+        Joint velocities that move the end effector at (vy, vz) from the
+        current pose, damped near singularities (see chain_dls_velocity).
+
+        Args:
+            vy (float): End effector y velocity in cm/s
+            vz (float): End effector z velocity in cm/s
+            damping (float): Damping factor at the singularity
+            threshold (float): Manipulability fraction where damping starts
+
+        Returns:
+            tuple: One joint velocity per joint in rad/s
+        """
+        if len(self.link_lengths) == 2:
+            return super().joint_velocities(vy, vz, damping, threshold)
+        velocities = chain_dls_velocity(self.joint_angles, vy, vz, self.link_lengths,
+                                        damping, threshold)
+        return tuple(float(w) for w in velocities)
+
+    def differential_ik(self, y, z, iterations=1, damping=0.5, threshold=0.15, max_error=2.0):
+        """
+        Track a (moving) target incrementally from the current angles.
+
+        Like RoboticArm.differential_ik, but every step moves all the
+        joints and is projected onto the poses the firmware executes
+        (project_chain). The target is reported reachable when it lies in
+        the workspace annulus.
+
+        Args:
+            y (float): Target y coordinate in cm
+            z (float): Target z coordinate in cm
+            iterations (int): DLS steps to take this call
+            damping (float): Damping factor at the singularity
+            threshold (float): Manipulability fraction where damping starts
+            max_error (float): Longest error in cm corrected per step
+
+        Returns:
+            tuple: One angle per joint in radians, then the remaining
+                Cartesian error in cm before the last step
+        """
+        if len(self.link_lengths) == 2:
+            theta1, theta2, error = super().differential_ik(y, z, iterations, damping,
+                                                            threshold, max_error)
+            self.target_joint_angles = np.array([theta1, theta2])
+            return theta1, theta2, error
+
+        # Ensure positive coordinates
+        y = abs(y)
+        z = abs(z)
+
+        target = np.array([y, z])
+        q = self.joint_angles
+        for _ in range(iterations):
+            q, error = chain_dls_step(q, target, self.link_lengths, damping, threshold, max_error)
+            q = project_chain(q, self.limits)
+
+        self.target = (y, z)
+        self.reachable = bool(self.clamp_target(y, z)[2])
+        self.target_joint_angles = q
+        self.target_theta1, self.target_theta2 = q[:2]
+        return (*(float(angle) for angle in q), float(error))
+
+    def differential_ik_batch(self, *arrays, damping=0.5, threshold=0.15, max_error=2.0):
+        """
+        One differential IK step for many poses or arms of this geometry.
+        Pure function: the arm state is not modified.
+
+        Args:
+            *arrays (array_like): One array of current angles per joint in
+                radians, then the target y and z coordinates in cm
+            damping (float): Damping factor at the singularity
+            threshold (float): Manipulability fraction where damping starts
+            max_error (float): Longest error in cm corrected per step
+
+        Returns:
+            tuple: One angle array per joint, then the errors array
+        """
+        if len(self.link_lengths) == 2:
+            return super().differential_ik_batch(*arrays, damping=damping, threshold=threshold,
+                                                 max_error=max_error)
+        *angles, ys, zs = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in arrays))
+        target = np.stack((np.abs(ys), np.abs(zs)), axis=-1)
+        q, errors = chain_dls_step(np.stack(angles, axis=-1), target, self.link_lengths,
+                                   damping, threshold, max_error)
+        q = project_chain(q, self.limits)
+        return (*np.moveaxis(q, -1, 0), errors)
@@ -0,0 +1,683 @@
+"""
+Control process: run the arm and its transport apart from the GUI.
+
+In one process, matplotlib rendering, Tk events, IK and the senders share
+a GIL, so a slow redraw holds back the next command. With
+--control-process, the RoboticArm and its sender run in a child process
+on a fixed-rate loop. The two sides share one small shared-memory block,
+holding two latest-value records with a seqlock each:
+
+- status: current and target joints, connection and loop counters. The
+  control process writes it every tick.
+- request: the newest target the GUI wants. The GUI writes it, and the
+  control loop takes it on its next tick.
+
+Each record has one writer. That writer makes the sequence number odd,
+copies the record in, then makes it even again. Readers copy the record
+and retry when the sequence was odd or changed meanwhile. Nothing is
+pickled or queued per frame. A request the control loop has not taken
+yet is simply overwritten, the same as the senders' latest-value slots.
+
+The seqlock relies on the writes reaching the other process in order. x86
+guarantees that, and the interpreter steps between the writes make it
+hold in practice on weakly ordered CPUs as well.
+"""
+import multiprocessing
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import metrics
+from app import (ArmVisualizer, TrajectoryStreamer, build_arm, sample_move, start_metrics,
+                 log, MOVE_SECONDS)
+
+CACHE_LINE = 64
+
+TICK_JITTER_SECONDS = metrics.histogram('arm_tick_jitter_seconds',
+                                        "Control tick start time minus its deadline")
+TICK_OVERRUNS = metrics.counter('arm_tick_overruns_total',
+                                "Control ticks that ended after the next deadline")
+TICKS_SKIPPED = metrics.counter('arm_ticks_skipped_total', "Control ticks dropped after overruns")
+
+POLICIES = ('skip', 'catch-up')
+
+class ControlLoop:
+    def __init__(self, rate=100.0, policy='skip', max_catch_up=10, spin=0.0005,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        Fixed-rate scheduler on monotonic deadlines.
+
+        Tick k is due at start + k / rate and its step gets that scheduled
+        time, not the time it actually ran. Moves sampled from it therefore
+        follow the same timeline whatever the scheduling noise, and the
+        tick rate does not drift. Waiting sleeps until shortly before the
+        deadline and spins the rest, since sleep() alone overshoots by a
+        few hundred microseconds.
+
+        When a tick ends after the next deadline (an overrun), the policy
+        decides what happens to the ticks that are already due:
+
+        - 'skip' drops all but the latest, so the loop resumes on time
+        - 'catch-up' runs them back to back, up to max_catch_up, so no
+          tick of the timeline is lost
+
+        Args:
+            rate (float): Ticks per second (e.g. 100-500)
+            policy (str): 'skip' or 'catch-up'
+            max_catch_up (int): Most overdue ticks run by 'catch-up'; older
+                ones are skipped
+            spin (float): Seconds before each deadline to busy-wait
+                instead of sleeping
+            clock (callable): Monotonic time source in seconds
+            sleep (callable): Sleep function taking seconds
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy {policy!r}, expected one of {POLICIES}")
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.spin = spin
+        self.clock = clock
+        self.sleep = sleep
+        self.start_time = None
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.jitter = deque(maxlen=10000)
+
+    def wait_until(self, deadline):
+        """
+        Block until a deadline.
+
+        Args:
+            deadline (float): Time on the loop's clock
+        """
+        remaining = deadline - self.clock()
+        if remaining > self.spin:
+            self.sleep(remaining - self.spin)
+        while self.clock() < deadline:
+            pass
+
+    def run(self, step, stop=None, ticks=None, start=None):
+        """
+        Call step once per tick until stopped.
+
+        Args:
+            step (callable): step(t) with the tick's scheduled time
+            stop: Object with is_set() (e.g. threading.Event) ending the
+                loop when set, or None
+            ticks (int): Stop after this many steps, or None
+            start (float): Time of tick 0, default now
+        """
+        self.start_time = self.clock() if start is None else start
+        index = 0
+        while (stop is None or not stop.is_set()) and (ticks is None or self.ticks < ticks):
+            deadline = self.start_time + index * self.period
+            self.wait_until(deadline)
+            lateness = self.clock() - deadline
+            self.jitter.append(lateness)
+            TICK_JITTER_SECONDS.observe(lateness)
+            step(deadline)
+            self.ticks += 1
+            index += 1
+
+            # Ticks whose deadlines have passed while this one ran
+            due = int((self.clock() - self.start_time) / self.period) - index + 1
+            if due > 0:
+                self.overruns += 1
+                TICK_OVERRUNS.inc()
+                keep = 1 if self.policy == 'skip' else min(due, self.max_catch_up)
+                if due > keep:
+                    self.skipped += due - keep
+                    TICKS_SKIPPED.inc(due - keep)
+                    index += due - keep
+
+    def stats(self):
+        """
+        Get tick statistics.
+
+        Returns:
+            dict: Tick, overrun and skipped counts, the steps actually run
+                per second and the jitter (start minus deadline) in ms
+        """
+        stats = {'ticks': self.ticks, 'overruns': self.overruns, 'skipped': self.skipped,
+                 'policy': self.policy, 'rate': self.rate}
+        if self.start_time is not None and self.ticks:
+            stats['achieved_rate'] = self.ticks / max(self.clock() - self.start_time, self.period)
+        if self.jitter:
+            jitter = np.array(self.jitter) * 1000.0
+            stats.update({
+                'jitter_mean_ms': float(jitter.mean()),
+                'jitter_p50_ms': float(np.percentile(jitter, 50)),
+                'jitter_p95_ms': float(np.percentile(jitter, 95)),
+                'jitter_p99_ms': float(np.percentile(jitter, 99)),
+                'jitter_max_ms': float(jitter.max()),
+            })
+        return stats
+
+def block_dtype(joints):
+    """
+    Layout of the shared block for an arm with a given number of joints.
+
+    Args:
+        joints (int): Joint count
+
+    Returns:
+        numpy.dtype: Structured dtype with 'status' and 'request' records,
+            each starting on its own cache line
+    """
+    status = np.dtype([
+        ('seq', 'u8'),
+        ('time', 'f8'),             # time.monotonic() of the last tick
+        ('ticks', 'u8'),
+        ('overruns', 'u8'),         # Ticks that ended after the next deadline
+        ('skipped', 'u8'),          # Ticks dropped after overruns
+        ('jitter', 'f8'),           # Seconds the last tick started late
+        ('request_id', 'u8'),       # Last request taken
+        ('move_id', 'u8'),          # Last request whose move completed
+        ('latency', 'f8'),          # Seconds from posting to taking the last request
+        ('pose_at', 'f8'),          # time.monotonic() the latest pose is reached, 0 if not modelled
+        ('connected', '?'),
+        ('animating', '?'),
+        ('reachable', '?'),
+        ('has_target', '?'),
+        ('target', 'f8', (2,)),
+        ('angles', 'f8', (joints,)),
+        ('target_angles', 'f8', (joints,)),
+    ], align=True)
+    request = np.dtype([
+        ('seq', 'u8'),
+        ('id', 'u8'),
+        ('commit', 'u8'),           # Bumped to send the current target now
+        ('posted', 'f8'),
+        ('y', 'f8'),
+        ('z', 'f8'),
+        ('duration', 'f8'),
+        ('live', '?'),
+    ], align=True)
+    offset = -(-status.itemsize // CACHE_LINE) * CACHE_LINE
+    return np.dtype({'names': ['status', 'request'], 'formats': [status, request],
+                     'offsets': [0, offset],
+                     'itemsize': offset + -(-request.itemsize // CACHE_LINE) * CACHE_LINE})
+
+class Seqlock:
+    def __init__(self, view):
+        """
+        Single-writer, many-reader access to one record in shared memory.
+
+        Args:
+            view (ndarray): 0-d structured view with a 'seq' field
+        """
+        self.view = view
+        self.seq = view['seq']
+        # The writer fills a private copy, then publishes it in one copy
+        self.local = view.copy()
+
+    def write(self, **fields):
+        """
+        Publish new field values (fields not given keep their last value).
+
+        Args:
+            **fields: Record fields to set
+        """
+        local = self.local
+        for name, value in fields.items():
+            local[name] = value
+        seq = int(self.seq)
+        self.seq[...] = seq + 1
+        local['seq'] = seq + 1
+        self.view[...] = local
+        self.seq[...] = seq + 2
+
+    def read(self, retries=1000):
+        """
+        Take a consistent snapshot of the record.
+
+        Args:
+            retries (int): Attempts before giving up on a busy writer
+
+        Returns:
+            ndarray: 0-d copy of the record, or None if every attempt
+                overlapped a write
+        """
+        for _ in range(retries):
+            before = int(self.seq)
+            if before & 1:
+                continue
+            snapshot = self.view.copy()
+            if int(self.seq) == before:
+                return snapshot
+        return None
+
+class SharedArmState:
+    def __init__(self, joints, name=None):
+        """
+        Create, or attach to, the shared block for one arm.
+
+        Args:
+            joints (int): Joint count
+            name (str): Name of an existing block to attach to, or None
+                to create a new one
+        """
+        dtype = block_dtype(joints)
+        self.joints = joints
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=dtype.itemsize)
+        block = np.ndarray((), dtype=dtype, buffer=self.shm.buf)
+        if self.owner:
+            block[...] = np.zeros((), dtype)
+        self.block = block
+        self.status = Seqlock(block['status'])
+        self.request = Seqlock(block['request'])
+
+    @property
+    def name(self):
+        """Name other processes attach with."""
+        return self.shm.name
+
+    def close(self):
+        """Detach from the block (and remove it, if this side created it)."""
+        self.status = self.request = self.block = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class ArmController:
+    def __init__(self, arm, state, loop=None, duration=0.6):
+        """
+        Control loop for an arm, driven by a SharedArmState.
+
+        Each tick takes the newest request, advances the move the same way
+        ArmVisualizer animates it (sample_move curves, retargeting from the
+        current pose and velocity), sends the target or streams waypoints
+        and publishes the state. Moves are sampled at the ticks' scheduled
+        times, so their timeline and the waypoint rate do not depend on
+        scheduling noise.
+
+        Args:
+            arm (RoboticArm): Arm with a started sender
+            state (SharedArmState): Shared block to serve
+            loop (ControlLoop): Scheduler, default 100 Hz skipping missed ticks
+            duration (float): Default move duration in seconds
+        """
+        self.arm = arm
+        self.state = state
+        self.loop = loop if loop is not None else ControlLoop()
+        self.duration = duration
+
+        # Current move
+        self.angles_start = np.array(arm.angles, dtype=float)
+        self.velocity_start = np.zeros(len(self.angles_start))
+        self.angles_target = self.angles_start.copy()
+        self.move_start = 0.0
+        self.move_duration = 0.0
+        self.live = False
+        self.streaming = False
+
+        # Requests taken
+        self.request_id = 0
+        self.commit = 0
+        self.move_id = 0
+        self.latency = 0.0
+
+        # Published for the GUI when the sender is a scheduler.MotionScheduler
+        self.time_to_pose = getattr(arm.tcp_sender, 'estimated_time_to_pose', None)
+
+    def sample(self, now):
+        """
+        Evaluate the current move.
+
+        Args:
+            now (float): time.monotonic() timestamp
+
+        Returns:
+            tuple: (angles, velocities) arrays, see sample_move
+        """
+        return sample_move(self.angles_start, self.velocity_start, self.angles_target,
+                           self.move_duration, now - self.move_start)
+
+    def move_to(self, y, z, duration, live, now):
+        """
+        Start (or retarget) a move.
+
+        Args:
+            y (float): Target y coordinate in cm
+            z (float): Target z coordinate in cm
+            duration (float): Move duration in seconds
+            live (bool): Dragged target: no streaming, and the target is
+                only sent on commit
+            now (float): time.monotonic() timestamp of the move start
+        """
+        if self.arm.is_animating:
+            angles, velocity = self.sample(now)
+        else:
+            angles = np.array(self.arm.angles, dtype=float)
+            velocity = np.zeros(len(angles))
+        *target, _ = self.arm.inverse_kinematics(y, z)
+        delta = (np.array(target, dtype=float) - angles + np.pi) % (2*np.pi) - np.pi
+
+        self.angles_start = angles
+        self.velocity_start = velocity
+        self.angles_target = angles + delta
+        self.move_start = now
+        self.move_duration = duration
+        self.live = live
+        self.arm.is_animating = True
+
+        self.streaming = self.arm.streamer is not None and not live
+        if self.streaming:
+            start, w0, end = self.angles_start, self.velocity_start, self.angles_target
+            self.arm.streamer.start(lambda t: tuple(sample_move(start, w0, end, duration, t)[0]),
+                                    duration, now)
+
+    def step(self, now):
+        """
+        Run one tick.
+
+        Args:
+            now (float): time.monotonic() timestamp
+        """
+        arm = self.arm
+        request = self.state.request.read()
+        if request is not None and request['id'] > self.request_id:
+            self.request_id = int(request['id'])
+            self.latency = self.loop.clock() - float(request['posted'])
+            duration = float(request['duration'])
+            self.move_to(float(request['y']), float(request['z']),
+                         duration if duration > 0 else self.duration, bool(request['live']), now)
+        if request is not None and request['commit'] > self.commit:
+            self.commit = int(request['commit'])
+            arm.send_target_angles()
+
+        if arm.is_animating:
+            angles, _ = self.sample(now)
+            finished = now - self.move_start >= self.move_duration
+            if self.streaming:
+                arm.streamer.update(now)
+            if finished:
+                angles = self.angles_target
+            arm.set_angles(*angles)
+            if finished:
+                arm.is_animating = False
+                self.move_id = self.request_id
+                if self.streaming:
+                    arm.streamer.finish()
+                    arm.record_target()
+                elif not self.live:
+                    arm.send_target_angles()
+                MOVE_SECONDS.observe(now - self.move_start)
+
+        loop = self.loop
+        target_angles = arm.target_angles
+        pose_at = 0.0
+        if self.time_to_pose is not None:
+            pose_at = time.monotonic() + self.time_to_pose()
+        self.state.status.write(
+            time=now, ticks=loop.ticks + 1, overruns=loop.overruns, skipped=loop.skipped,
+            jitter=loop.jitter[-1] if loop.jitter else 0.0, request_id=self.request_id,
+            move_id=self.move_id, latency=self.latency, pose_at=pose_at,
+            connected=arm.tcp_sender.connected,
+            animating=arm.is_animating, reachable=arm.reachable,
+            has_target=arm.target is not None, target=arm.target or (0.0, 0.0),
+            angles=arm.angles,
+            target_angles=target_angles if target_angles[0] is not None else arm.angles)
+
+    def run(self, stop):
+        """
+        Tick until stopped.
+
+        Args:
+            stop (multiprocessing.Event): Set to end the loop
+        """
+        self.loop.run(self.step, stop)
+
+def control_main(args, links, name, stop):
+    """
+    Entry point of the control process.
+
+    Args:
+        args (argparse.Namespace): app.py command line
+        links (list): Link lengths from --links, or None
+        name (str): Name of the SharedArmState block
+        stop (multiprocessing.Event): Set by the GUI process to shut down
+    """
+    import logging
+    listener = metrics.setup_logging(getattr(logging, args.log_level), args.log_sample)
+    metrics_server, stop_dump = start_metrics(args)
+    arm = build_arm(args, links)
+    if args.stream_rate:
+        arm.streamer = TrajectoryStreamer(arm.tcp_sender, rate=args.stream_rate)
+    if args.record:
+        from recorder import SessionRecorder
+        arm.recorder = SessionRecorder(args.record)
+    state = SharedArmState(len(arm.lengths), name)
+    arm.tcp_sender.start_server()
+    loop = ControlLoop(args.control_rate, args.control_policy)
+    log.info("Control loop running at %g Hz (%s)", args.control_rate, args.control_policy)
+    try:
+        ArmController(arm, state, loop).run(stop)
+    finally:
+        log.info("Control loop: %s", loop.stats())
+        arm.tcp_sender.cleanup()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if stop_dump is not None:
+            stop_dump()
+        if arm.recorder is not None:
+            arm.recorder.close()
+        state.close()
+        listener.stop()
+
+class ControlProcess:
+    def __init__(self, args, links):
+        """
+        Control process for the arm described by the command line.
+
+        Args:
+            args (argparse.Namespace): app.py command line
+            links (list): Link lengths from --links, or None
+        """
+        self.state = SharedArmState(len(links) if links else 2)
+        # Spawned, not forked: the child must not inherit Tk or matplotlib
+        context = multiprocessing.get_context('spawn')
+        self.stop_event = context.Event()
+        self.process = context.Process(target=control_main, name='arm-control', daemon=True,
+                                       args=(args, links, self.state.name, self.stop_event))
+
+    def start(self):
+        """Start the control process."""
+        self.process.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Stop the control process and remove the shared block.
+
+        Args:
+            timeout (float): Seconds to wait before terminating it
+        """
+        self.stop_event.set()
+        if self.process.pid is not None:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                log.warning("Control process did not stop, terminating it")
+                self.process.terminate()
+                self.process.join()
+        self.state.close()
+
+class ControlLink:
+    def __init__(self, state, port):
+        """
+        GUI end of a SharedArmState.
+
+        Stands in for the sender of the GUI's RoboticArm, which is then a
+        geometry model only: IK and sends happen in the control process,
+        and refresh() copies the published state into the model.
+
+        Args:
+            state (SharedArmState): Shared block of the control process
+            port (int): Port the control process serves, for display
+        """
+        self.state = state
+        self.port = port
+        self.connected = False
+        self.request_id = 0
+        self.commit_id = 0
+        self.last_status = None
+
+    def request(self, y, z, duration=0.0, live=False):
+        """
+        Post a new target, replacing any the control loop has not taken.
+
+        Args:
+            y (float): Target y coordinate in cm
+            z (float): Target z coordinate in cm
+            duration (float): Move duration in seconds, 0 for the default
+            live (bool): Dragged target, sent on commit() only
+
+        Returns:
+            int: Request id, compared with the published move_id
+        """
+        self.request_id += 1
+        self.state.request.write(id=self.request_id, posted=time.monotonic(), y=y, z=z,
+                                 duration=duration, live=live)
+        return self.request_id
+
+    def commit(self):
+        """Have the control loop send its current target on its next tick."""
+        self.commit_id += 1
+        self.state.request.write(commit=self.commit_id)
+
+    def refresh(self, arm):
+        """
+        Copy the published state into the GUI's arm model.
+
+        Args:
+            arm (RoboticArm): Model to update
+
+        Returns:
+            ndarray: The status snapshot, or None if it could not be read
+        """
+        status = self.state.status.read()
+        if status is None:
+            return None
+        arm.set_angles(*status['angles'].tolist())
+        arm.target = tuple(status['target'].tolist()) if status['has_target'] else None
+        arm.reachable = bool(status['reachable'])
+        arm.is_animating = bool(status['animating'])
+        self.connected = bool(status['connected'])
+        self.last_status = status
+        return status
+
+    def estimated_time_to_pose(self):
+        """
+        Returns:
+            float: Seconds until the control process expects the latest
+                pose to be reached, or None without --schedule
+        """
+        status = self.last_status
+        if status is None or not status['pose_at']:
+            return None
+        return max(0.0, float(status['pose_at']) - time.monotonic())
+
+    def start_server(self):
+        """The control process owns the server."""
+
+    def cleanup(self):
+        """The control process owns the sockets; stop it with ControlProcess.stop()."""
+
+class SharedArmVisualizer(ArmVisualizer):
+    def __init__(self, arm, **kwargs):
+        """
+        ArmVisualizer for an arm run by a control process.
+
+        Moves are posted to the control process instead of animated here.
+        The timer runs continuously at the frame rate and shows whatever
+        state was last published, so rendering never waits for control
+        and control never waits for rendering.
+
+        Args:
+            arm (RoboticArm): Model whose tcp_sender is a ControlLink
+            **kwargs: Options passed to ArmVisualizer
+        """
+        super().__init__(arm, **kwargs)
+        self.link = arm.tcp_sender
+        self.pending_complete = None
+
+    def animate_to_target(self, y, z, duration=None, on_complete=None, live=False, now=None):
+        """
+        Post a target to the control process (returns immediately).
+
+        Args:
+            y (float): Target y coordinate in cm
+            z (float): Target z coordinate in cm
+            duration (float): Move duration in seconds (default: the
+                control process's)
+            on_complete (callable): Called with no arguments once the
+                control process reports the move done
+            live (bool): Dragged target, see ArmVisualizer.animate_to_target
+            now (float): Unused, the control process times the move
+        """
+        move_id = self.link.request(abs(y), abs(z), duration or 0.0, live)
+        self.pending_complete = (move_id, on_complete) if on_complete is not None else None
+
+    def _send_drag_target(self, now):
+        """Have the control process send the dragged target."""
+        self.link.commit()
+        self._count_drag_command(now)
+
+    def advance_animation(self, now=None):
+        """
+        Render the latest published state (timer callback).
+
+        Args:
+            now (float): time.monotonic() timestamp, or None for the current time
+
+        Returns:
+            bool: True while the control process reports a move in progress
+        """
+        if now is None:
+            now = time.monotonic()
+        self._poll_drag(now)
+
+        interval = self.frame_interval / 1000.0
+        if self.last_tick is not None:
+            self.frames_dropped += max(0, int((now - self.last_tick) / interval) - 1)
+        self.last_tick = now
+
+        status = self.link.refresh(self.arm)
+        self.update_plot()
+        self.frames_rendered += 1
+
+        if self.pending_complete is not None and status is not None:
+            move_id, on_complete = self.pending_complete
+            if status['move_id'] >= move_id:
+                self.pending_complete = None
+                on_complete()
+        return self.arm.is_animating
+
+def run_split(args, links):
+    """
+    Run the GUI with the arm in a separate control process.
+
+    Args:
+        args (argparse.Namespace): app.py command line
+        links (list): Link lengths from --links, or None
+    """
+    import tkinter as tk
+    from app import ArmGUI
+
+    process = ControlProcess(args, links)
+    process.start()
+    try:
+        link = ControlLink(process.state, args.port)
+        arm = build_arm(args, links, link)
+        root = tk.Tk()
+        visualizer = SharedArmVisualizer(arm, blit=True)
+        ArmGUI(root, arm, drag_rate=args.drag_rate, visualizer=visualizer)
+        visualizer.start_timer()
+        root.mainloop()
+    finally:
+        process.stop()
@@ -0,0 +1,500 @@
+"""
+ESP32 emulator: a Python stand-in for firmware/main.c.
+
+Connects to the host like the real arm and reproduces the firmware's
+timing model (timing.py), so the end-to-end path can be load- and latency-tested
+without hardware:
+
+- tcp_conn_task: reads legacy targets (one int32 per joint) and framed
+  command batches into a 32-deep command queue (a legacy target, or a
+  frame flagged REPLACE, first drops the commands not yet started), and
+  waypoint batch frames into a FIFO
+- servo_control_task: go_smooth at 10 ms per degree on servo 0, 1000 ms
+  pause, theta2 wrapped (>180 -> 360 - x) and clamped to 135, go_smooth
+  on servo 1, 500 ms pause (then the wrist servo and another 500 ms for
+  firmware built with JOINT_COUNT 3); polls every 50 ms when idle
+- streamed waypoints run at their timestamps after a 60 ms jitter buffer
+- with transport='udp' (firmware built with USE_UDP 1), udp_conn_task:
+  a hello datagram every 500 ms, and one command frame per datagram,
+  dropped if its sequence number is older than one already applied
+
+Time is emulated: with speed=10 a 1 s firmware pause takes 0.1 s of wall
+time, and every timeline entry is in emulated seconds.
+
+Run from the repository root, for example:
+
+    python emulator.py --count 4 --speed 10 --timeline timeline.json
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+from app import (STREAM_MAGIC, STREAM_FLAG_NEW, STREAM_HEADER, STREAM_WAYPOINT, STREAM_MAX_BATCH,
+                 FRAME_MAGIC, FRAME_VERSION, FRAME_FLAG_REPLACE, FRAME_HEADER, FRAME_BATCH,
+                 FRAME_MAX_COMMANDS)
+from timing import (IDLE_POLL_MS, SERVO0_PAUSE_MS, SERVO1_PAUSE_MS, STEP_MS, STREAM_BUFFER_MS,
+                    STREAM_LATE_MS, servo1_angle, servo_position)
+from transport import UDP_HELLO, UDP_HELLO_MAGIC, UDP_HELLO_MS
+
+RECONNECT_MS = 1000
+STREAM_QUEUE_LEN = 128
+COMMAND_QUEUE_LEN = FRAME_MAX_COMMANDS
+
+class EmulatorClock:
+    def __init__(self, speed=1.0, clock=time.monotonic):
+        """
+        Emulated time running speed times faster than wall-clock time.
+
+        Args:
+            speed (float): Acceleration factor (1.0 = real time)
+            clock (callable): Host time source in seconds; sleep_until
+                waits on the event loop, so it must follow loop.time()
+        """
+        self.speed = speed
+        self.clock = clock
+        self.start = clock()
+
+    def now(self):
+        """Current emulated time in seconds."""
+        return (self.clock() - self.start) * self.speed
+
+    async def sleep_until(self, t):
+        """Sleep until emulated time t (returns at once if already past)."""
+        delay = (t - self.now()) / self.speed
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class DatagramReceiver(asyncio.DatagramProtocol):
+    def __init__(self, emulator):
+        """
+        Hand datagrams from the host to an emulated arm.
+
+        Args:
+            emulator (ESP32Emulator): Arm that applies them
+        """
+        self.emulator = emulator
+
+    def datagram_received(self, data, address):
+        """Apply a command datagram."""
+        self.emulator.recv_datagram(data)
+
+class ESP32Emulator:
+    def __init__(self, host="127.0.0.1", port=3000, clock=None, name=None,
+                 handshake=False, record_steps=True, joints=2, transport='tcp'):
+        """
+        Initialize one emulated arm.
+
+        Args:
+            host (str): Host running the TCP server
+            port (int): Server port
+            clock (EmulatorClock): Shared clock (defaults to real time)
+            name (str): Arm name used in reports and the optional handshake
+            handshake (bool): Send the name as an id line after connecting
+                (for FleetTCPSender with handshake_timeout)
+            record_steps (bool): Record every 1-degree servo step in the
+                timeline, not just move start/end
+            joints (int): Angles per legacy command (the firmware's
+                JOINT_COUNT, 3 with a wrist servo)
+            transport (str): 'tcp', or 'udp' for firmware built with USE_UDP
+        """
+        if transport not in ('tcp', 'udp'):
+            raise ValueError(f"unknown transport: {transport!r}")
+        self.host = host
+        self.port = port
+        self.clock = clock or EmulatorClock()
+        self.name = name or f"emu@{port}"
+        self.handshake = handshake
+        self.record_steps = record_steps
+        self.joints = joints
+        self.transport = transport
+        self.running = False
+
+        # Firmware state
+        self.commands = deque()             # Command queue: (angles, received)
+        self.expected_seq = None            # Next framed sequence number
+        self.stream = deque()               # Waypoint queue
+        self.stream_event = asyncio.Event()
+        self.last_angle = [-1] * joints     # go_smooth's memory
+        self.pose = [90] * joints           # Physical servo positions
+
+        # Statistics and timeline (emulated seconds)
+        self.timeline = []
+        self.commands_received = 0
+        self.commands_overwritten = 0
+        self.commands_dropped = 0
+        self.commands_lost = 0
+        self.frames_skipped = 0
+        self.frames_stale = 0
+        self.frame_latencies = []
+        self.commands_executed = 0
+        self.waypoints_received = 0
+        self.waypoints_executed = 0
+        self.waypoints_skipped = 0
+        self.waypoints_dropped = 0
+        self.connections = 0
+        self.move_latencies = []
+
+    def record(self, kind, **fields):
+        """Append a timeline entry at the current emulated time."""
+        entry = {'t': round(self.clock.now(), 4), 'kind': kind}
+        entry.update(fields)
+        self.timeline.append(entry)
+
+    async def run(self, duration=None):
+        """
+        Run the TCP and servo tasks.
+
+        Args:
+            duration (float): Stop after this many emulated seconds, or
+                None to run until stop() is called
+        """
+        self.running = True
+        conn_task = self.udp_conn_task() if self.transport == 'udp' else self.tcp_conn_task()
+        tasks = [asyncio.ensure_future(conn_task),
+                 asyncio.ensure_future(self.servo_control_task())]
+        try:
+            if duration is None:
+                await asyncio.gather(*tasks)
+            else:
+                await self.clock.sleep_until(self.clock.now() + duration)
+        finally:
+            self.running = False
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        """Ask the tasks to stop."""
+        self.running = False
+
+    async def tcp_conn_task(self):
+        """Connect to the host and receive commands, reconnecting on errors."""
+        while self.running:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError:
+                await self.clock.sleep_until(self.clock.now() + RECONNECT_MS / 1000)
+                continue
+            self.connections += 1
+            self.expected_seq = None
+            self.record('connected')
+            if self.handshake:
+                writer.write(f"{self.name}\n".encode())
+            try:
+                while self.running:
+                    head = await reader.readexactly(4)
+                    magic = int.from_bytes(head, 'little')
+                    if magic == FRAME_MAGIC:
+                        await self.recv_frame(reader)
+                    elif magic == STREAM_MAGIC:
+                        await self.recv_waypoints(reader)
+                    else:
+                        rest = await reader.readexactly(4 * (self.joints - 1))
+                        self.recv_command(np.frombuffer(head + rest, dtype='<i4'))
+            except (asyncio.IncompleteReadError, ConnectionError, OSError):
+                self.record('disconnected')
+            finally:
+                writer.close()
+            await self.clock.sleep_until(self.clock.now() + RECONNECT_MS / 1000)
+
+    async def udp_conn_task(self):
+        """Say hello to the host every UDP_HELLO_MS and apply command datagrams."""
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: DatagramReceiver(self), remote_addr=(self.host, self.port))
+        self.connections += 1
+        self.record('connected')
+        try:
+            while self.running:
+                expected = self.expected_seq if self.expected_seq is not None else 0
+                transport.sendto(UDP_HELLO.pack(UDP_HELLO_MAGIC, expected))
+                await self.clock.sleep_until(self.clock.now() + UDP_HELLO_MS / 1000)
+        finally:
+            transport.close()
+
+    def recv_datagram(self, data):
+        """Apply one command frame received as a datagram."""
+        if len(data) < FRAME_HEADER.size:
+            self.frames_skipped += 1
+            return
+        magic, length, version, flags = FRAME_HEADER.unpack_from(data)
+        if magic != FRAME_MAGIC or length != len(data) - FRAME_HEADER.size:
+            self.frames_skipped += 1
+            return
+        self.apply_frame(version, flags, data[FRAME_HEADER.size:], drop_stale=True)
+
+    def recv_command(self, angles, replace=True):
+        """Queue a target, first dropping any not yet started if replace."""
+        self.commands_received += 1
+        if replace:
+            for old, _ in self.commands:
+                self.commands_overwritten += 1
+                self.record('overwritten', angles=list(old))
+            self.commands.clear()
+        command = tuple(int(angle) for angle in angles)
+        if len(self.commands) >= COMMAND_QUEUE_LEN:
+            self.commands_dropped += 1
+            return
+        self.commands.append((command, self.clock.now()))
+        self.record('command', angles=list(command))
+
+    async def recv_frame(self, reader):
+        """Read the rest of a command frame and queue its commands."""
+        header = await reader.readexactly(FRAME_HEADER.size - 4)
+        length, version, flags = int.from_bytes(header[:2], 'little'), header[2], header[3]
+        body = await reader.readexactly(length)
+        self.apply_frame(version, flags, body)
+
+    def apply_frame(self, version, flags, body, drop_stale=False):
+        """
+        Queue the commands of a frame body (the bytes after FRAME_HEADER).
+
+        Args:
+            version (int): Frame version from the header
+            flags (int): Frame flags from the header
+            body (bytes): Batch header and joint angles
+            drop_stale (bool): Ignore a frame older than one already
+                applied (UDP)
+        """
+        length = len(body)
+        if version != FRAME_VERSION or length < FRAME_BATCH.size:
+            self.frames_skipped += 1
+            return
+        seq, t_us, count, joints = FRAME_BATCH.unpack_from(body)
+        if (joints != self.joints or count > FRAME_MAX_COMMANDS
+                or length != FRAME_BATCH.size + 2 * count * joints):
+            self.frames_skipped += 1
+            return
+        if drop_stale and self.expected_seq is not None and (seq - self.expected_seq) & 0x80000000:
+            self.frames_stale += 1
+            return
+        if self.expected_seq is not None and seq != self.expected_seq:
+            self.commands_lost += (seq - self.expected_seq) & 0xFFFFFFFF
+        self.expected_seq = (seq + count) & 0xFFFFFFFF
+        # Sender timestamps come from time.monotonic(), so on the same host
+        # they give the one-way delay
+        self.frame_latencies.append(((int(time.monotonic() * 1e6) - t_us) & 0xFFFFFFFF) / 1e6)
+
+        cdeg = np.frombuffer(body, dtype='<i2', count=count * joints,
+                             offset=FRAME_BATCH.size).astype(int).reshape(count, joints)
+        # Restore the legacy 0-360 range and round to whole degrees
+        degrees = (np.where(cdeg < 0, cdeg + 36000, cdeg) + 50) // 100
+        for i, angles in enumerate(degrees):
+            self.recv_command(angles, replace=bool(flags & FRAME_FLAG_REPLACE) and i == 0)
+
+    async def recv_waypoints(self, reader):
+        """Read the rest of a batch frame and queue its waypoints."""
+        header = await reader.readexactly(STREAM_HEADER.size - 4)
+        count, flags = int.from_bytes(header[:2], 'little'), int.from_bytes(header[2:], 'little')
+        if count > STREAM_MAX_BATCH:
+            raise ConnectionError(f"waypoint batch too large: {count}")
+        if count == 0:
+            # The firmware ignores empty batches, flags included
+            return
+        body = await reader.readexactly(count * STREAM_WAYPOINT.size)
+        new_stream = bool(flags & STREAM_FLAG_NEW)
+        if new_stream:
+            self.stream.clear()
+        for i in range(count):
+            t_ms, a0, a1 = STREAM_WAYPOINT.unpack_from(body, i * STREAM_WAYPOINT.size)
+            if len(self.stream) >= STREAM_QUEUE_LEN:
+                self.waypoints_dropped += 1
+                continue
+            self.stream.append((t_ms, a0, a1, new_stream and i == 0))
+        self.waypoints_received += count
+        self.record('waypoints', count=count, new_stream=new_stream)
+        self.stream_event.set()
+
+    async def go_smooth(self, servo, angle, t):
+        """
+        Emulate go_smooth: one degree every 10 ms from the last angle.
+
+        Args:
+            servo (int): Servo index
+            angle (int): Target angle in degrees
+            t (float): Emulated start time
+
+        Returns:
+            float: Emulated time when the move ends
+        """
+        last = self.last_angle[servo]
+        if last == -1 or last == angle:
+            steps = [angle]
+        else:
+            step = 1 if angle > last else -1
+            steps = range(last, angle + step, step)
+        for pos in steps:
+            self.pose[servo] = servo_position(pos)
+            t += STEP_MS / 1000
+            await self.clock.sleep_until(t)
+            if self.record_steps:
+                self.record('pose', pose=list(self.pose))
+        self.last_angle[servo] = angle
+        return t
+
+    async def run_waypoint(self, waypoint, base):
+        """Emulate run_waypoint; returns the (possibly reset) stream time base."""
+        t_ms, a0, a1, new_stream = waypoint
+        if new_stream:
+            base = self.clock.now() + STREAM_BUFFER_MS / 1000
+        due = base + t_ms / 1000
+        late = self.clock.now() - due
+        if late < 0:
+            await self.clock.sleep_until(due)
+        elif late > STREAM_LATE_MS / 1000 and self.stream:
+            self.waypoints_skipped += 1
+            return base
+        for servo, cdeg in ((0, a0), (1, a1)):
+            angle = (cdeg + 50) // 100
+            if servo == 1:
+                angle = servo1_angle(angle)
+            angle = servo_position(angle)
+            self.pose[servo] = angle
+            self.last_angle[servo] = angle
+        self.waypoints_executed += 1
+        self.record('pose', pose=list(self.pose), source='stream')
+        return base
+
+    async def servo_control_task(self):
+        """Emulate servo_control_task."""
+        base = 0.0
+        while self.running:
+            if self.stream:
+                base = await self.run_waypoint(self.stream.popleft(), base)
+            elif self.commands:
+                (a0, a1, *wrist), received = self.commands.popleft()
+                self.record('move_start', angles=[a0, a1, *wrist])
+                t = await self.go_smooth(0, a0, self.clock.now())
+                t += SERVO0_PAUSE_MS / 1000
+                await self.clock.sleep_until(t)
+                t = await self.go_smooth(1, servo1_angle(a1), t)
+                if wrist:
+                    t += SERVO1_PAUSE_MS / 1000
+                    await self.clock.sleep_until(t)
+                    t = await self.go_smooth(2, wrist[0], t)
+                self.record('reached', pose=list(self.pose))
+                self.commands_executed += 1
+                self.move_latencies.append(t - received)
+                t += SERVO1_PAUSE_MS / 1000
+                await self.clock.sleep_until(t)
+            else:
+                # xQueuePeek on the stream queue with a 50 ms timeout
+                self.stream_event.clear()
+                try:
+                    await asyncio.wait_for(self.stream_event.wait(),
+                                           IDLE_POLL_MS / 1000 / self.clock.speed)
+                except asyncio.TimeoutError:
+                    pass
+
+    def report(self):
+        """
+        Summarize what the emulated arm received and did.
+
+        Returns:
+            dict: Counters, final pose and receipt-to-reached latencies
+                (emulated seconds)
+        """
+        latencies = np.asarray(self.move_latencies)
+        report = {
+            'name': self.name,
+            'connections': self.connections,
+            'commands_received': self.commands_received,
+            'commands_overwritten': self.commands_overwritten,
+            'commands_dropped': self.commands_dropped,
+            'commands_lost': self.commands_lost,
+            'frames_skipped': self.frames_skipped,
+            'frames_stale': self.frames_stale,
+            'commands_executed': self.commands_executed,
+            'waypoints_received': self.waypoints_received,
+            'waypoints_executed': self.waypoints_executed,
+            'waypoints_skipped': self.waypoints_skipped,
+            'waypoints_dropped': self.waypoints_dropped,
+            'final_pose': list(self.pose),
+        }
+        if self.frame_latencies:
+            frame_latencies = np.asarray(self.frame_latencies)
+            report['frame_delay_ms'] = {
+                'p50': float(np.percentile(frame_latencies, 50)) * 1000,
+                'max': float(frame_latencies.max()) * 1000,
+            }
+        if latencies.size:
+            report['move_latency_s'] = {
+                'mean': float(latencies.mean()),
+                'p50': float(np.percentile(latencies, 50)),
+                'p95': float(np.percentile(latencies, 95)),
+                'max': float(latencies.max()),
+            }
+        return report
+
+def make_emulators(count=1, host="127.0.0.1", port=3000, speed=1.0, handshake=False,
+                   record_steps=True, joints=2, transport='tcp'):
+    """
+    Create several emulated arms sharing one clock.
+
+    Args:
+        count (int): Number of arms
+        host (str): Host running the TCP server
+        port (int): Server port
+        speed (float): Clock acceleration factor
+        handshake (bool): Send an id line after connecting
+        record_steps (bool): Record every servo step in the timelines
+        joints (int): Angles per legacy command
+        transport (str): 'tcp' or 'udp'
+
+    Returns:
+        list: ESP32Emulator instances named emu-0 .. emu-N
+    """
+    clock = EmulatorClock(speed)
+    return [ESP32Emulator(host, port, clock, name=f"emu-{i}", handshake=handshake,
+                          record_steps=record_steps, joints=joints, transport=transport)
+            for i in range(count)]
+
+async def run_emulators(emulators, duration=None):
+    """
+    Run emulated arms concurrently on the current event loop.
+
+    Args:
+        emulators (list): ESP32Emulator instances
+        duration (float): Emulated seconds to run, None for until cancelled
+    """
+    await asyncio.gather(*(emu.run(duration) for emu in emulators))
+
+def main(argv=None):
+    """Run emulated arms from the command line."""
+    parser = argparse.ArgumentParser(description="ESP32 robotic arm emulator")
+    parser.add_argument('--host', default="127.0.0.1", help="host running the TCP server")
+    parser.add_argument('--port', type=int, default=3000, help="server port")
+    parser.add_argument('--count', type=int, default=1, help="number of emulated arms")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="clock acceleration (1 = real time)")
+    parser.add_argument('--duration', type=float, default=None,
+                        help="emulated seconds to run (default: until Ctrl+C)")
+    parser.add_argument('--handshake', action='store_true',
+                        help="send the arm name as an id line after connecting")
+    parser.add_argument('--joints', type=int, default=2, choices=(2, 3),
+                        help="angles per command (3 = firmware built with a wrist servo)")
+    parser.add_argument('--transport', choices=('tcp', 'udp'), default='tcp',
+                        help="host link (udp = firmware built with USE_UDP, app.py --transport udp)")
+    parser.add_argument('--timeline', metavar='FILE',
+                        help="write reports and timelines to this JSON file")
+    args = parser.parse_args(argv)
+
+    emulators = make_emulators(args.count, args.host, args.port, args.speed, args.handshake,
+                               joints=args.joints, transport=args.transport)
+    try:
+        asyncio.run(run_emulators(emulators, args.duration))
+    except KeyboardInterrupt:
+        pass
+
+    for emu in emulators:
+        print(json.dumps(emu.report()))
+    if args.timeline:
+        with open(args.timeline, 'w') as f:
+            json.dump([{'report': emu.report(), 'timeline': emu.timeline} for emu in emulators], f)
+
+if __name__ == "__main__":
+    main()
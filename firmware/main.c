@@ -1,4 +1,5 @@
 #include <stdio.h>
+#include <string.h>
 #include "esp_err.h"
 #include "esp_log.h"
 #include "esp_wifi.h"
@@ -21,6 +22,18 @@
 
 int servo0Pin = 14;
 int servo1Pin = 27;
+int servo2Pin = 26;
+
+// Joints per legacy command: 2 for the base arm, 3 with a wrist servo
+#ifndef JOINT_COUNT
+    #define JOINT_COUNT 2
+#endif
+
+// Host link: 0 = TCP client (default), 1 = UDP, where only the newest pose
+// matters and stale datagrams are dropped (app.py --transport udp)
+#ifndef USE_UDP
+    #define USE_UDP 0
+#endif
 
 int angle[2] = {90, 90};
 
@@ -45,25 +58,231 @@ int angle[2] = {90, 90};
 #define my_delay(time) vTaskDelay((time) / portTICK_PERIOD_MS)
 #define TAG "ROBOTIC_ARM"
 QueueHandle_t queue;
-int32_t message[2];
+int32_t message[JOINT_COUNT];
+
+// Streaming waypoints: batch frame = header + count waypoints (little endian)
+#define STREAM_MAGIC        0x314A5254  // "TRJ1", never a valid legacy angle
+#define STREAM_FLAG_NEW     0x0001      // first batch of a new move
+#define STREAM_MAX_BATCH    32
+#define STREAM_QUEUE_LEN    128
+#define STREAM_BUFFER_MS    60          // jitter buffer before the first waypoint
+#define STREAM_LATE_MS      20          // skip waypoints this late if newer ones wait
+
+typedef struct __attribute__((packed)) {
+    uint32_t magic;
+    uint16_t count;
+    uint16_t flags;
+} stream_header_t;
+
+typedef struct __attribute__((packed)) {
+    uint32_t t_ms;          // time from the start of the move
+    uint16_t angle_cdeg[2]; // joint angles in 0.01 degrees
+} waypoint_t;
+
+typedef struct {
+    waypoint_t wp;
+    bool new_stream;
+} stream_item_t;
+
+QueueHandle_t stream_queue;
+
+// Framed commands: header + batch header + count x JOINT_COUNT int16 joint
+// angles in 0.01 degrees (little endian). The length prefix lets frames of
+// another version or size be skipped without losing sync.
+#define FRAME_MAGIC         0x324D5241  // "ARM2", never a valid legacy angle
+#define FRAME_VERSION       1
+#define FRAME_FLAG_REPLACE  0x01        // drop queued commands before these
+#define FRAME_MAX_COMMANDS  32
+#define COMMAND_QUEUE_LEN   FRAME_MAX_COMMANDS
+
+typedef struct __attribute__((packed)) {
+    uint32_t magic;
+    uint16_t length;        // bytes after this header
+    uint8_t version;
+    uint8_t flags;
+} frame_header_t;
+
+typedef struct __attribute__((packed)) {
+    uint32_t seq;           // sequence number of the first command
+    uint32_t t_us;          // sender timestamp
+    uint8_t count;
+    uint8_t joints;
+} batch_header_t;
+
+#define FRAME_MAX_BODY (sizeof(batch_header_t) + FRAME_MAX_COMMANDS * JOINT_COUNT * sizeof(int16_t))
+
+// Next expected sequence number, to log commands lost on the way
+uint32_t expected_seq;
+bool seq_valid = false;
+
+// UDP: the arm announces itself with a hello (magic + next expected seq)
+// and the host answers with one command frame per datagram
+#define UDP_HELLO_MAGIC     0x484D5241  // "ARMH"
+#define UDP_HELLO_MS        500
+
+typedef struct __attribute__((packed)) {
+    uint32_t magic;
+    uint32_t expected_seq;
+} udp_hello_t;
+
+int servo1_angle(int angle){
+    if(angle>180){
+        angle = 360 - angle;
+    }
+    if (angle > 135) angle = 135;
+    return angle;
+}
+
+void run_waypoint(stream_item_t *item, int64_t *base_us){
+    if (item->new_stream){
+        *base_us = esp_timer_get_time() + STREAM_BUFFER_MS * 1000;
+    }
+    int64_t wait_us = *base_us + (int64_t)item->wp.t_ms * 1000 - esp_timer_get_time();
+    if (wait_us > 0){
+        vTaskDelay(pdMS_TO_TICKS(wait_us / 1000));
+    }else if (wait_us < -STREAM_LATE_MS * 1000 && uxQueueMessagesWaiting(stream_queue) > 0){
+        // Fell behind: drop this waypoint and catch up with the next one
+        return;
+    }
+    // Both joints move on the same tick
+    servo_track(axe_0, (item->wp.angle_cdeg[0] + 50) / 100);
+    servo_track(axe_1, servo1_angle((item->wp.angle_cdeg[1] + 50) / 100));
+}
 
 void servo_control_task(){
+    stream_item_t item;
+    int64_t stream_base_us = 0;
     while (1) {
-        if(xQueueReceive(queue, &(message), 0)){
+        if(xQueueReceive(stream_queue, &item, 0)){
+            run_waypoint(&item, &stream_base_us);
+        }else if(xQueueReceive(queue, &(message), 0)){
             ESP_LOGI(TAG, "Moving servo 0 to %d",(int) message[0]);
             go_smooth(axe_0, message[0]);
             my_delay(1000);
-            if(message[1]>180){
-                message[1] = 360 - message[1];
-            }            
-            if (message[1] > 135) message[1] = 135;
+            message[1] = servo1_angle(message[1]);
             ESP_LOGI(TAG, "Moving servo 1 to %d",(int) message[1]);
             go_smooth(axe_1, message[1]);
             my_delay(500);
+#if JOINT_COUNT > 2
+            // Wrist angle is relative to the forearm, 90 = straight
+            ESP_LOGI(TAG, "Moving servo 2 to %d",(int) message[2]);
+            go_smooth(axe_2, message[2]);
+            my_delay(500);
+#endif
         }else{
-            my_delay(50);  
+            // Wake up as soon as a waypoint arrives, poll legacy commands as before
+            if(xQueuePeek(stream_queue, &item, pdMS_TO_TICKS(50)) != pdTRUE){
+                continue;
+            }
+        }
+    }
+}
+
+int recv_all(int sock, void *buffer, size_t len){
+    uint8_t *p = buffer;
+    size_t got = 0;
+    while (got < len){
+        int n = recv(sock, p + got, len - got, 0);
+        if (n <= 0) return n;
+        got += n;
+    }
+    return got;
+}
+
+int recv_discard(int sock, size_t len){
+    uint8_t scratch[64];
+    while (len > 0){
+        size_t n = len < sizeof(scratch) ? len : sizeof(scratch);
+        if (recv_all(sock, scratch, n) <= 0) return -1;
+        len -= n;
+    }
+    return 0;
+}
+
+// Queue the commands of a frame body (the bytes after frame_header_t).
+// With drop_stale, a frame older than one already applied is ignored, as
+// UDP may deliver datagrams late or out of order.
+void apply_frame(const frame_header_t *header, const uint8_t *body, bool drop_stale){
+    batch_header_t batch;
+    if (header->length < sizeof(batch)){
+        ESP_LOGW(TAG, "Skipping frame: %d bytes", (int)header->length);
+        return;
+    }
+    memcpy(&batch, body, sizeof(batch));
+    if (batch.joints != JOINT_COUNT || batch.count > FRAME_MAX_COMMANDS
+            || header->length != sizeof(batch) + batch.count * batch.joints * sizeof(int16_t)){
+        ESP_LOGW(TAG, "Skipping frame: %d commands of %d joints", (int)batch.count, (int)batch.joints);
+        return;
+    }
+    if (drop_stale && seq_valid && (int32_t)(batch.seq - expected_seq) < 0){
+        ESP_LOGW(TAG, "Dropping stale seq %u (expected %u)", (unsigned)batch.seq, (unsigned)expected_seq);
+        return;
+    }
+    if (seq_valid && batch.seq != expected_seq){
+        ESP_LOGW(TAG, "Lost %d commands before seq %u", (int)(batch.seq - expected_seq), (unsigned)batch.seq);
+    }
+    expected_seq = batch.seq + batch.count;
+    seq_valid = true;
+
+    if (header->flags & FRAME_FLAG_REPLACE){
+        xQueueReset(queue);
+    }
+    for (int i = 0; i < batch.count; i++){
+        int32_t command[JOINT_COUNT];
+        for (int j = 0; j < JOINT_COUNT; j++){
+            int16_t cdeg;
+            memcpy(&cdeg, body + sizeof(batch) + (i * JOINT_COUNT + j) * sizeof(cdeg), sizeof(cdeg));
+            // Angles are wrapped to (-180, 180]; restore the legacy 0-360 range
+            int32_t value = cdeg < 0 ? cdeg + 36000 : cdeg;
+            command[j] = (value + 50) / 100;
         }
+        if (xQueueSend(queue, command, pdMS_TO_TICKS(100)) != pdTRUE){
+            ESP_LOGW(TAG, "Command queue full, dropping seq %u", (unsigned)(batch.seq + i));
+        }
+    }
+    ESP_LOGI(TAG, "Received %d commands from seq %u", (int)batch.count, (unsigned)batch.seq);
+}
+
+int recv_frame(int sock){
+    frame_header_t header;
+    uint8_t body[FRAME_MAX_BODY];
+    // The magic has already been read
+    if (recv_all(sock, &header.length, sizeof(header) - sizeof(header.magic)) <= 0) return -1;
+    if (header.version != FRAME_VERSION || header.length > sizeof(body)){
+        ESP_LOGW(TAG, "Skipping frame: version %d, %d bytes", (int)header.version, (int)header.length);
+        return recv_discard(sock, header.length) < 0 ? -1 : 1;
     }
+    if (recv_all(sock, body, header.length) <= 0) return -1;
+    apply_frame(&header, body, false);
+    return 1;
+}
+
+int recv_waypoints(int sock){
+    stream_header_t header;
+    waypoint_t batch[STREAM_MAX_BATCH];
+    // The magic has already been read
+    if (recv_all(sock, &header.count, sizeof(header) - sizeof(header.magic)) <= 0) return -1;
+    if (header.count > STREAM_MAX_BATCH){
+        ESP_LOGE(TAG, "Waypoint batch too large: %d", (int)header.count);
+        return -1;
+    }
+    // An empty batch has no body; recv_all would report it as a closed socket
+    if (header.count == 0) return 1;
+    if (recv_all(sock, batch, header.count * sizeof(waypoint_t)) <= 0) return -1;
+    if (header.flags & STREAM_FLAG_NEW){
+        // A new move supersedes whatever is left of the previous one
+        xQueueReset(stream_queue);
+    }
+    for (int i = 0; i < header.count; i++){
+        stream_item_t item = {
+            .wp = batch[i],
+            .new_stream = (i == 0) && (header.flags & STREAM_FLAG_NEW),
+        };
+        if (xQueueSend(stream_queue, &item, pdMS_TO_TICKS(100)) != pdTRUE){
+            ESP_LOGW(TAG, "Waypoint queue full, dropping waypoint");
+        }
+    }
+    return header.count;
 }
 
 void tcp_conn_task(){
@@ -94,20 +313,32 @@ void tcp_conn_task(){
                 }
                 else{
                     ESP_LOGI("TCP SOCKET", "Successfully connected");
+                    seq_valid = false;
                 }
                 my_delay(1000);
             }
-            // receiving data 
-            ESP_LOGI("TCP SOCKET", "Waiting for data to recv");
-            int32_t rx_buffer[2];
-            int len = recv(my_sock, rx_buffer, sizeof(rx_buffer), 0);
-            if (len < 0) {
-                ESP_LOGE("TCP SOCKET", "Error occurred while sending data: errno %s", strerror(errno));
+            // receiving data: a command frame, a waypoint batch or a legacy
+            // JOINT_COUNT-angle target
+            int32_t rx_buffer[JOINT_COUNT];
+            int len = recv_all(my_sock, &rx_buffer[0], sizeof(rx_buffer[0]));
+            if (len > 0 && (uint32_t)rx_buffer[0] == FRAME_MAGIC) {
+                len = recv_frame(my_sock);
+            } else if (len > 0 && (uint32_t)rx_buffer[0] == STREAM_MAGIC) {
+                len = recv_waypoints(my_sock);
+            } else if (len > 0) {
+                len = recv_all(my_sock, &rx_buffer[1], sizeof(rx_buffer) - sizeof(rx_buffer[0]));
+                if (len > 0) {
+                    // A new target replaces any not yet started
+                    xQueueReset(queue);
+                    xQueueSend(queue, rx_buffer, 0);
+                    ESP_LOGI("TCP SOCKET", "Successfully received data angle_0: %d, angle_1: %d",(int)rx_buffer[0], (int)rx_buffer[1]);
+                }
+            }
+            if (len <= 0) {
+                ESP_LOGE("TCP SOCKET", "Error occurred while receiving data: errno %s", strerror(errno));
+                close(my_sock);
                 my_delay(1000);
                 break;
-            } else {
-                xQueueOverwrite(queue, rx_buffer);
-                ESP_LOGI("TCP SOCKET", "Successfully received data angle_0: %d, angle_1: %d",(int)rx_buffer[0], (int)rx_buffer[1]);
             }
         }
     }
@@ -115,15 +346,69 @@ void tcp_conn_task(){
     vTaskDelete(NULL);
 }
 
+void udp_conn_task(){
+    struct sockaddr_in dest_addr = {0};
+    dest_addr.sin_family = AF_INET;
+    dest_addr.sin_port = htons(PORT);
+    dest_addr.sin_addr.s_addr = inet_addr(IP_server);
+
+    int my_sock = socket(AF_INET, SOCK_DGRAM, IPPROTO_IP);
+    if (my_sock < 0) {
+        ESP_LOGE("UDP SOCKET", "Unable to create socket: errno %s", strerror(errno));
+        vTaskDelete(NULL);
+        return;
+    }
+    // Wake up at least once per hello period
+    struct timeval timeout = {.tv_sec = 0, .tv_usec = UDP_HELLO_MS * 1000};
+    setsockopt(my_sock, SOL_SOCKET, SO_RCVTIMEO, &timeout, sizeof(timeout));
+    ESP_LOGI("UDP SOCKET", "Socket created, sending hellos to %s:%d", IP_server, PORT);
+
+    uint8_t datagram[sizeof(frame_header_t) + FRAME_MAX_BODY];
+    int64_t next_hello_us = 0;
+    while (true){
+        int64_t now_us = esp_timer_get_time();
+        if (now_us >= next_hello_us){
+            // Tells the host where to send, and which seq to carry on from
+            udp_hello_t hello = {
+                .magic = UDP_HELLO_MAGIC,
+                .expected_seq = seq_valid ? expected_seq : 0,
+            };
+            sendto(my_sock, &hello, sizeof(hello), 0, (struct sockaddr*)&dest_addr, sizeof(dest_addr));
+            next_hello_us = now_us + UDP_HELLO_MS * 1000;
+        }
+        int len = recv(my_sock, datagram, sizeof(datagram), 0);
+        if (len < (int)sizeof(frame_header_t)){
+            // Timeout, error or runt: nothing to apply
+            continue;
+        }
+        frame_header_t header;
+        memcpy(&header, datagram, sizeof(header));
+        if (header.magic != FRAME_MAGIC || header.version != FRAME_VERSION
+                || header.length != len - sizeof(header)){
+            ESP_LOGW(TAG, "Skipping datagram: %d bytes", len);
+            continue;
+        }
+        apply_frame(&header, datagram + sizeof(header), true);
+    }
+}
+
 void app_main(void){ 
     attach_servo(axe_0,servo0Pin);
     attach_servo(axe_1,servo1Pin);
-    queue = xQueueCreate(1, sizeof(message));
-    if(queue == 0){
+#if JOINT_COUNT > 2
+    attach_servo(axe_2,servo2Pin);
+#endif
+    queue = xQueueCreate(COMMAND_QUEUE_LEN, sizeof(message));
+    stream_queue = xQueueCreate(STREAM_QUEUE_LEN, sizeof(stream_item_t));
+    if(queue == 0 || stream_queue == 0){
     	ESP_LOGE("QUEUE", "QUEUE CREATION FAILED");
     	return ;
     }
     wifi_connection(WIFI_SSID, WIFI_PASSWORD);
+#if USE_UDP
+    xTaskCreate(udp_conn_task, "UDP_client", 4096, NULL, 5, NULL);
+#else
     xTaskCreate(tcp_conn_task, "TCP_client", 4096, NULL, 5, NULL);
+#endif
     xTaskCreate(servo_control_task, "Servo_ctrl", 4096, NULL, 2, NULL);
 }
@@ -9,6 +9,8 @@
 #define TAG "servo"
 #define TIMER_NUM 0
 
+static int last_angle[MAX_SERVOS] = {-1, -1, -1};
+
 inline int usToTicks(int usec){
     return (usec * 8192)/20000; // Adjusted for 13-bit resolution (2^13 = 8192)
 }
@@ -70,10 +72,9 @@ inline void servo_write(int servo,int angle){
 }
 
 void go_smooth(int servo, int angle){
-    static int last_angle[2] = {-1, -1};
     int last;
-    if(servo < 0 || servo > 1){
-        ESP_LOGE(TAG, "Ya kho using only two servo's");
+    if(servo < 0 || servo >= MAX_SERVOS){
+        ESP_LOGE(TAG, "Ya kho using only %d servo's", MAX_SERVOS);
         return;
     }
     last = last_angle[servo];
@@ -96,3 +97,16 @@ void go_smooth(int servo, int angle){
     }
     last_angle[servo] = angle;
 }
+
+void servo_track(int servo, int angle){
+    if(servo < 0 || servo >= MAX_SERVOS){
+        ESP_LOGE(TAG, "Ya kho using only %d servo's", MAX_SERVOS);
+        return;
+    }
+    if (angle < 0) angle = 0;
+    if (angle > 180) angle = 180;
+    if (angle != last_angle[servo]){
+        servo_angle(servo, angle);
+    }
+    last_angle[servo] = angle;
+}
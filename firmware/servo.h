@@ -12,9 +12,12 @@
 #define LEDC_DUTY_RES           (13) // Set duty resolution to 13 bits
 #define LEDC_FREQUENCY          (50) // Frequency in Hertz. Set frequency at 50 Hz
 
-typedef enum {axe_0, axe_1} servo_index;
+#define MAX_SERVOS              (3)  // base, elbow and an optional wrist
+
+typedef enum {axe_0, axe_1, axe_2} servo_index;
 
 void attach_servo(int servo, int pin);
 void servo_angle(int servo, int angle);
 void go_smooth(int servo, int angle);
+void servo_track(int servo, int angle);
 #endif
\ No newline at end of file
@@ -0,0 +1,311 @@
+"""
+Multi-arm support: one TCP server serving many ESP32 arms.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+import metrics
+from app import (AsyncTCPSender, RoboticArm, make_packer, queue_batch, queue_frames, log,
+                 COMMANDS_COALESCED, CONNECTIONS)
+
+class ArmLink:
+    def __init__(self, fleet, arm_id):
+        """
+        Per-arm command slot on a FleetTCPSender.
+
+        Has the sender surface RoboticArm and ArmVisualizer expect
+        (send_angles, connected, port, start_server, cleanup), so a
+        RoboticArm can use it as its tcp_sender.
+
+        Args:
+            fleet (FleetTCPSender): Server that owns the connection
+            arm_id (str): Arm identity
+        """
+        self.fleet = fleet
+        self.arm_id = arm_id
+        self.port = fleet.port
+        self.writer = None
+        self.address = None
+
+        # Latest-value slot, same fields as AsyncTCPSender
+        self.pending = None
+        self.pending_since = None
+        self.last_angles = None
+        self.wakeup = asyncio.Event()
+        self.frames = deque()
+        # Own packer, so every arm sees its own sequence numbers
+        self.packer = make_packer(fleet.protocol)
+
+    @property
+    def connected(self):
+        """Whether this arm currently has a live connection."""
+        return self.writer is not None
+
+    def send_angles(self, *angles):
+        """
+        Set the angles to send to this arm, replacing any not yet sent.
+
+        Args:
+            *angles (float): Joint angles in radians (theta1, theta2, ...)
+        """
+        self.fleet.send_to(self.arm_id, *angles)
+
+    def send_batch(self, commands, replace=False):
+        """
+        Queue poses this arm runs in order (framed protocol only).
+
+        Args:
+            commands (array_like): (count, joints) joint angles in radians
+            replace (bool): Drop poses the arm has queued but not run
+        """
+        self.fleet.send_batch_to(self.arm_id, commands, replace)
+
+    def send_waypoints(self, waypoints, new_stream=False):
+        """
+        Queue a batch of time-stamped waypoints for this arm.
+
+        Args:
+            waypoints (list): (t, theta1, theta2) tuples, see pack_waypoints
+            new_stream (bool): First batch of a new move
+        """
+        self.fleet.send_waypoints_to(self.arm_id, waypoints, new_stream)
+
+    def start_server(self):
+        """The fleet owns the server; start it with fleet.start_server()."""
+
+    def cleanup(self):
+        """The fleet owns the sockets; clean up with fleet.cleanup()."""
+
+class FleetTCPSender(AsyncTCPSender):
+    def __init__(self, port=3000, l1=12.5, l2=14, handshake_timeout=0.0, **kwargs):
+        """
+        Initialize a TCP server for many concurrent arms.
+
+        All connections share one asyncio loop thread. Each arm has its own
+        latest-value slot and writer task, so a slow or stalled client only
+        ever delays its own (overwritten) commands.
+
+        Arms are identified by the client's IP address. With a handshake
+        timeout, a client may instead send its id as the first line
+        (e.g. b"arm-3\n") within that many seconds of connecting.
+
+        Args:
+            port (int): Port number to use for TCP communication
+            l1 (float): Default first segment length for fleet arms in cm
+            l2 (float): Default second segment length for fleet arms in cm
+            handshake_timeout (float): Seconds to wait for an id line, 0 to
+                use address-based identity only
+            **kwargs: Keepalive and protocol options passed to
+                AsyncTCPSender
+        """
+        super().__init__(port, **kwargs)
+        self.l1 = l1
+        self.l2 = l2
+        self.handshake_timeout = handshake_timeout
+        self.links = {}
+        self.arms = {}
+        self.lock = threading.Lock()
+
+    def link(self, arm_id):
+        """
+        Get (or create) the command slot for an arm.
+
+        Args:
+            arm_id (str): Arm identity
+
+        Returns:
+            ArmLink: The arm's slot
+        """
+        with self.lock:
+            link = self.links.get(arm_id)
+            if link is None:
+                link = self.links[arm_id] = ArmLink(self, arm_id)
+            return link
+
+    def arm(self, arm_id, l1=None, l2=None):
+        """
+        Get (or create) the RoboticArm state for an arm.
+
+        Args:
+            arm_id (str): Arm identity
+            l1 (float): First segment length, defaults to the fleet's
+            l2 (float): Second segment length, defaults to the fleet's
+
+        Returns:
+            RoboticArm: Arm whose tcp_sender is its ArmLink
+        """
+        with self.lock:
+            arm = self.arms.get(arm_id)
+        if arm is None:
+            arm = RoboticArm(l1 or self.l1, l2 or self.l2, tcp_sender=self.link(arm_id))
+            with self.lock:
+                arm = self.arms.setdefault(arm_id, arm)
+        return arm
+
+    def connected_arms(self):
+        """
+        List the arms currently connected.
+
+        Returns:
+            list: Ids of arms with a live connection
+        """
+        with self.lock:
+            return [arm_id for arm_id, link in self.links.items() if link.connected]
+
+    async def _identify(self, reader, writer):
+        """Work out the arm id for a new connection."""
+        address = writer.get_extra_info('peername')
+        arm_id = address[0] if address else 'unknown'
+        if self.handshake_timeout > 0:
+            try:
+                line = await asyncio.wait_for(reader.readline(), self.handshake_timeout)
+                name = line.strip().decode('ascii', 'replace')
+                if name:
+                    arm_id = name
+            except asyncio.TimeoutError:
+                pass
+        return arm_id
+
+    async def _handle_client(self, reader, writer):
+        """Serve one arm connection until it drops or is replaced."""
+        client_address = writer.get_extra_info('peername')
+        self._configure_socket(writer.get_extra_info('socket'))
+        arm_id = await self._identify(reader, writer)
+        link = self.link(arm_id)
+
+        # A reconnecting arm replaces its own previous connection only
+        if link.writer is not None:
+            link.writer.close()
+        link.writer = writer
+        link.address = client_address
+        self.connected = True
+        CONNECTIONS.inc()
+        log.info("Connection established from: %s as %s", client_address, arm_id)
+
+        # Bring a reconnecting arm to its latest pose straight away
+        link.frames.clear()
+        if link.pending is None:
+            link.pending = link.last_angles
+
+        sender = asyncio.ensure_future(self._send_loop(writer, link))
+        try:
+            while await reader.read(256):
+                pass
+        except (ConnectionError, OSError) as e:
+            log.warning("Connection error (%s): %s", arm_id, e)
+        except asyncio.CancelledError:
+            # Shutting down
+            pass
+        finally:
+            sender.cancel()
+            writer.close()
+            if link.writer is writer:
+                link.writer = None
+                self.connected = bool(self.connected_arms())
+                log.info("Connection closed: %s (%s)", client_address, arm_id)
+
+    def send_to(self, arm_id, *angles):
+        """
+        Set the angles to send to one arm.
+
+        Args:
+            arm_id (str): Arm identity (the slot is created if needed)
+            *angles (float): Joint angles in radians (theta1, theta2, ...)
+        """
+        link = self.link(arm_id)
+        if link.pending is not None:
+            COMMANDS_COALESCED.inc()
+        link.pending_since = time.perf_counter() if metrics.enabled else None
+        link.pending = angles
+        link.last_angles = link.pending
+        if self.loop is not None and self.running:
+            self.loop.call_soon_threadsafe(link.wakeup.set)
+
+    def send_batch_to(self, arm_id, commands, replace=False):
+        """
+        Queue poses one arm runs in order (framed protocol only).
+
+        Args:
+            arm_id (str): Arm identity
+            commands (array_like): (count, joints) joint angles in radians
+            replace (bool): Drop poses the arm has queued but not run
+        """
+        link = self.link(arm_id)
+        queue_batch(link, commands, replace)
+        if self.loop is not None and self.running:
+            self.loop.call_soon_threadsafe(link.wakeup.set)
+
+    def send_waypoints_to(self, arm_id, waypoints, new_stream=False):
+        """
+        Queue a batch of time-stamped waypoints for one arm.
+
+        Args:
+            arm_id (str): Arm identity
+            waypoints (list): (t, theta1, theta2) tuples, see pack_waypoints
+            new_stream (bool): First batch of a new move
+        """
+        link = self.link(arm_id)
+        queue_frames(link, waypoints, new_stream)
+        if self.loop is not None and self.running:
+            self.loop.call_soon_threadsafe(link.wakeup.set)
+
+    def broadcast(self, *angles):
+        """
+        Set the same angles for every known arm.
+
+        Args:
+            *angles (float): Joint angles in radians (theta1, theta2, ...)
+        """
+        with self.lock:
+            links = list(self.links.values())
+        queued_at = time.perf_counter() if metrics.enabled else None
+        for link in links:
+            if link.pending is not None:
+                COMMANDS_COALESCED.inc()
+            link.pending_since = queued_at
+            link.pending = angles
+            link.last_angles = link.pending
+        if self.loop is not None and self.running:
+            # One loop wakeup for the whole fleet
+            self.loop.call_soon_threadsafe(lambda: [link.wakeup.set() for link in links])
+
+    def send_angles(self, *angles):
+        """
+        Send angles to every arm (same as broadcast).
+
+        Args:
+            *angles (float): Joint angles in radians (theta1, theta2, ...)
+        """
+        self.broadcast(*angles)
+
+    def send_batch(self, commands, replace=False):
+        """
+        Queue the same poses for every known arm (framed protocol only).
+
+        Args:
+            commands (array_like): (count, joints) joint angles in radians
+            replace (bool): Drop poses the arms have queued but not run
+        """
+        with self.lock:
+            links = list(self.links.values())
+        for link in links:
+            queue_batch(link, commands, replace)
+        if self.loop is not None and self.running:
+            self.loop.call_soon_threadsafe(lambda: [link.wakeup.set() for link in links])
+
+    def send_waypoints(self, waypoints, new_stream=False):
+        """
+        Queue the same waypoint batch for every known arm.
+
+        Args:
+            waypoints (list): (t, theta1, theta2) tuples, see pack_waypoints
+            new_stream (bool): First batch of a new move
+        """
+        with self.lock:
+            links = list(self.links.values())
+        for link in links:
+            queue_frames(link, waypoints, new_stream)
+        if self.loop is not None and self.running:
+            self.loop.call_soon_threadsafe(lambda: [link.wakeup.set() for link in links])
@@ -0,0 +1,222 @@
+"""
+Bulk jobs: stream target lists from CSV or .npy files to the arm.
+
+Targets are read in fixed-size chunks (.npy files are memory-mapped), so
+memory use does not grow with the job. Each chunk goes through the
+vectorized IK. A first pass over the file reports unreachable targets
+before anything is sent; they are then clamped to the nearest reachable
+point (like the GUI), skipped, or abort the job.
+
+A new single command makes the firmware drop any it has not started, and
+it never acknowledges, so commands are paced by the modelled motion
+time of the previous one (timing.move_times) instead of as fast as the
+socket allows.
+
+Run from the repository root, for example:
+
+    python app.py --job picks.csv --on-unreachable skip
+"""
+import itertools
+import logging
+import time
+
+import numpy as np
+
+from scheduler import firmware_degrees_batch
+from timing import move_times
+
+log = logging.getLogger('robotic_arm.jobs')
+
+def read_targets(path, chunk_size=4096):
+    """
+    Read (y, z) targets in chunks.
+
+    CSV files have y and z in the first two columns; a header line, blank
+    lines and '#' comments are skipped. .npy files must hold an (N, 2) or
+    wider array and are memory-mapped.
+
+    Args:
+        path (str): CSV or .npy file
+        chunk_size (int): Targets per chunk
+
+    Yields:
+        ndarray: (n, 2) float chunk, n <= chunk_size
+    """
+    if path.endswith('.npy'):
+        data = np.load(path, mmap_mode='r')
+        if data.ndim != 2 or data.shape[1] < 2:
+            raise ValueError(f"{path}: expected an (N, 2) array, got shape {data.shape}")
+        for start in range(0, len(data), chunk_size):
+            yield np.array(data[start:start + chunk_size, :2], dtype=float)
+        return
+
+    with open(path) as f:
+        lines = (line for line in f if line.strip() and not line.lstrip().startswith('#'))
+        first = True
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if not chunk:
+                return
+            if first:
+                first = False
+                try:
+                    float(chunk[0].split(',')[0])
+                except ValueError:
+                    # Header line
+                    chunk = chunk[1:]
+                    if not chunk:
+                        continue
+            yield np.loadtxt(chunk, delimiter=',', usecols=(0, 1), ndmin=2)
+
+class BulkJob:
+    def __init__(self, arm, path, chunk_size=4096, on_unreachable='clamp',
+                 time_scale=1.0, margin=0.05):
+        """
+        Initialize a job.
+
+        Args:
+            arm (RoboticArm): Arm to solve and send with (server started)
+            path (str): CSV or .npy target file
+            chunk_size (int): Targets read and solved at a time
+            on_unreachable (str): 'clamp', 'skip' or 'abort'
+            time_scale (float): Divide modelled motion times by this, e.g.
+                to match emulator.py --speed
+            margin (float): Extra seconds added to every modelled move
+        """
+        if on_unreachable not in ('clamp', 'skip', 'abort'):
+            raise ValueError(f"unknown unreachable policy: {on_unreachable!r}")
+        self.arm = arm
+        self.path = path
+        self.chunk_size = chunk_size
+        self.on_unreachable = on_unreachable
+        self.time_scale = time_scale
+        self.margin = margin
+        self.sent = 0
+        self.skipped = 0
+
+    def chunks(self):
+        """
+        Solve the job chunk by chunk.
+
+        Yields:
+            tuple: (offset, targets, theta1s, theta2s, reachable) where
+                offset is the index of the chunk's first target
+        """
+        offset = 0
+        for targets in read_targets(self.path, self.chunk_size):
+            theta1s, theta2s, reachable = self.arm.inverse_kinematics_batch(targets[:, 0], targets[:, 1])
+            yield offset, targets, theta1s, theta2s, reachable
+            offset += len(targets)
+
+    def check(self, max_listed=20):
+        """
+        Scan the whole job for unreachable targets without sending anything.
+
+        Args:
+            max_listed (int): Unreachable targets to list individually
+
+        Returns:
+            dict: Target count, unreachable count, the first unreachable
+                (index, y, z) entries and the modelled job duration in s
+        """
+        total = unreachable = 0
+        listed = []
+        duration = 0.0
+        last = None
+        for offset, targets, theta1s, theta2s, reachable in self.chunks():
+            total += len(targets)
+            bad = np.flatnonzero(~reachable)
+            unreachable += len(bad)
+            for i in bad[:max(0, max_listed - len(listed))]:
+                listed.append((offset + int(i), float(targets[i, 0]), float(targets[i, 1])))
+            if self.on_unreachable == 'skip':
+                theta1s, theta2s = theta1s[reachable], theta2s[reachable]
+            angles = self.wire_angles(theta1s, theta2s)
+            if len(angles):
+                duration += float(self.move_times(angles, last).sum())
+                last = angles[-1]
+        return {'targets': total, 'unreachable': unreachable,
+                'first_unreachable': listed, 'estimated_s': duration}
+
+    def wire_angles(self, theta1s, theta2s):
+        """Whole-degree angles the firmware runs, for the sender's protocol."""
+        legacy = getattr(self.arm.tcp_sender, 'packer', None) is None
+        return firmware_degrees_batch(np.stack((theta1s, theta2s), axis=1), legacy)
+
+    def move_times(self, angles, last):
+        """Paced seconds per command: modelled motion time plus margin."""
+        return move_times(angles, last) / self.time_scale + self.margin
+
+    def wait_connected(self, sleep=time.sleep):
+        """Block until the arm is connected."""
+        sender = self.arm.tcp_sender
+        if not sender.connected:
+            log.info("Waiting for the arm to connect...")
+        while not sender.connected:
+            sleep(0.1)
+
+    def run(self, clock=time.monotonic, sleep=time.sleep):
+        """
+        Send the whole job, pacing each command by the previous move time.
+
+        If the connection drops, sending pauses until the arm reconnects
+        (the sender then re-sends the last command) and resumes after that
+        command's move time. Returns once the last move should be done.
+
+        Args:
+            clock (callable): Monotonic time source
+            sleep (callable): Sleep function
+
+        Returns:
+            dict: Commands sent, targets skipped, wall time and the total
+                modelled motion time in seconds
+        """
+        check = self.check()
+        log.info("Job %s: %d targets, %d unreachable, about %.0f s",
+                 self.path, check['targets'], check['unreachable'], check['estimated_s'])
+        for index, y, z in check['first_unreachable']:
+            log.warning("Target %d (%.2f, %.2f) is out of reach", index, y, z)
+        if check['unreachable'] and self.on_unreachable == 'abort':
+            raise ValueError(f"{check['unreachable']} unreachable targets, job not started")
+
+        self.sent = self.skipped = 0
+        self.wait_connected(sleep)
+        start = clock()
+        due = start
+        last = None
+        last_time = 0.0
+        modelled = 0.0
+        for offset, targets, theta1s, theta2s, reachable in self.chunks():
+            if self.on_unreachable == 'skip':
+                self.skipped += int((~reachable).sum())
+                targets = targets[reachable]
+                theta1s, theta2s = theta1s[reachable], theta2s[reachable]
+                reachable = reachable[reachable]
+            angles = self.wire_angles(theta1s, theta2s)
+            times = self.move_times(angles, last)
+            for i in range(len(targets)):
+                if not self.arm.tcp_sender.connected:
+                    self.wait_connected(sleep)
+                    due = clock() + last_time
+                now = clock()
+                if due > now:
+                    sleep(due - now)
+                arm = self.arm
+                arm.target = (abs(float(targets[i, 0])), abs(float(targets[i, 1])))
+                arm.reachable = bool(reachable[i])
+                arm.target_theta1, arm.target_theta2 = float(theta1s[i]), float(theta2s[i])
+                arm.set_angles(arm.target_theta1, arm.target_theta2)
+                arm.send_target_angles()
+                self.sent += 1
+                last_time = float(times[i])
+                modelled += last_time
+                due = max(due, now) + last_time
+            if len(angles):
+                last = angles[-1]
+            log.info("Job %s: %d/%d sent", self.path, self.sent + self.skipped, check['targets'])
+        # Let the last move finish before the caller closes the connection
+        now = clock()
+        if due > now:
+            sleep(due - now)
+        return {'sent': self.sent, 'skipped': self.skipped,
+                'seconds': clock() - start, 'modelled_s': modelled}
@@ -0,0 +1,413 @@
+"""
+Instrumentation for the command path.
+
+A small metrics registry (counters and fixed-bucket latency histograms), a
+local HTTP scrape endpoint serving it as Prometheus-style text or JSON, a
+periodic JSON dump, and sampled logging that writes from a background
+thread.
+
+Recording is off until enable() is called. While disabled, observe() and
+inc() return immediately and instrumented code skips its timer reads by
+checking metrics.enabled first.
+"""
+import bisect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+enabled = False
+
+# Log-spaced upper bounds in seconds: 10 us .. ~10 s
+LATENCY_BUCKETS = tuple(1e-5 * 2 ** i for i in range(21))
+
+def enable():
+    """Start recording metrics."""
+    global enabled
+    enabled = True
+
+def disable():
+    """Stop recording metrics (recorded values are kept)."""
+    global enabled
+    enabled = False
+
+class Counter:
+    def __init__(self, name, help_text):
+        """
+        Monotonic counter.
+
+        Args:
+            name (str): Metric name
+            help_text (str): One-line description
+        """
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """
+        Add to the counter if recording is enabled.
+
+        Args:
+            amount (int): Increment
+        """
+        if not enabled:
+            return
+        with self.lock:
+            self.value += amount
+
+    def reset(self):
+        """Set the counter back to zero."""
+        with self.lock:
+            self.value = 0
+
+    def snapshot(self):
+        """
+        Read the current count.
+
+        Returns:
+            int: Current value
+        """
+        return self.value
+
+    def render(self):
+        """
+        Render the counter for a Prometheus scrape.
+
+        Returns:
+            list: Text exposition lines
+        """
+        return [f"# HELP {self.name} {self.help_text}",
+                f"# TYPE {self.name} counter",
+                f"{self.name} {self.value}"]
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        """
+        Fixed-bucket histogram of durations in seconds.
+
+        Observing is a bisect and a few additions, so it is cheap enough
+        for per-command and per-frame use. Percentiles are estimated from
+        the buckets.
+
+        Args:
+            name (str): Metric name
+            help_text (str): One-line description
+            buckets (tuple): Increasing bucket upper bounds
+        """
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop all observations."""
+        with self.lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
+            self.max = 0.0
+
+    def observe(self, value):
+        """
+        Record one value if recording is enabled.
+
+        Args:
+            value (float): Duration in seconds
+        """
+        if not enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, q):
+        """
+        Estimate a percentile by interpolating inside its bucket.
+
+        Args:
+            q (float): Percentile in 0..100
+
+        Returns:
+            float: Estimated value in seconds (0 with no observations)
+        """
+        with self.lock:
+            counts, count, top = list(self.counts), self.count, self.max
+        if count == 0:
+            return 0.0
+        rank = q / 100.0 * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                low = self.buckets[i - 1] if i > 0 else 0.0
+                high = self.buckets[i] if i < len(self.buckets) else top
+                return min(low + (high - low) * (rank - seen) / n, top)
+            seen += n
+        return top
+
+    def snapshot(self):
+        """
+        Summarize the recorded durations.
+
+        Returns:
+            dict: Count, sum and mean/p50/p95/p99/max in ms
+        """
+        count = self.count
+        return {
+            'count': count,
+            'sum_s': self.sum,
+            'mean_ms': self.sum / count * 1000.0 if count else 0.0,
+            'p50_ms': self.percentile(50) * 1000.0,
+            'p95_ms': self.percentile(95) * 1000.0,
+            'p99_ms': self.percentile(99) * 1000.0,
+            'max_ms': self.max * 1000.0,
+        }
+
+    def render(self):
+        """
+        Render the histogram for a Prometheus scrape.
+
+        Returns:
+            list: Text exposition lines (cumulative buckets)
+        """
+        with self.lock:
+            counts, count, total = list(self.counts), self.count, self.sum
+        lines = [f"# HELP {self.name} {self.help_text}",
+                 f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f'{self.name}_bucket{{le="{bound:.6g}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total:.9g}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        """Named collection of metrics."""
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name, help_text):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help_text)
+            return metric
+
+    def counter(self, name, help_text):
+        """
+        Get (or create) a counter.
+
+        Args:
+            name (str): Metric name
+            help_text (str): One-line description
+
+        Returns:
+            Counter: The counter
+        """
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name, help_text):
+        """
+        Get (or create) a latency histogram.
+
+        Args:
+            name (str): Metric name
+            help_text (str): One-line description
+
+        Returns:
+            Histogram: The histogram
+        """
+        return self._get(Histogram, name, help_text)
+
+    def reset(self):
+        """Reset every metric."""
+        for metric in list(self.metrics.values()):
+            metric.reset()
+
+    def snapshot(self):
+        """
+        Summarize every metric.
+
+        Returns:
+            dict: Metric name -> counter value or histogram summary
+        """
+        return {name: metric.snapshot() for name, metric in sorted(self.metrics.items())}
+
+    def render(self):
+        """
+        Render every metric for a Prometheus scrape.
+
+        Returns:
+            str: All metrics in Prometheus text exposition format
+        """
+        lines = []
+        for _, metric in sorted(self.metrics.items()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path in ('/', '/metrics'):
+            body = self.registry.render().encode()
+            content_type = 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body = json.dumps(self.registry.snapshot(), indent=2).encode()
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are not worth a log line each
+        pass
+
+def serve(port=9100, host='127.0.0.1', registry=REGISTRY):
+    """
+    Serve the metrics over HTTP from a background thread.
+
+    GET /metrics returns the text format, GET /metrics.json a summary
+    with estimated percentiles.
+
+    Args:
+        port (int): Port to listen on (0 picks a free one)
+        host (str): Interface to bind, local only by default
+        registry (Registry): Metrics to serve
+
+    Returns:
+        ThreadingHTTPServer: The server; call shutdown() to stop it
+    """
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+def dump(path, registry=REGISTRY):
+    """
+    Write a JSON snapshot of the metrics, replacing the file atomically.
+
+    Args:
+        path (str): Output file
+        registry (Registry): Metrics to dump
+    """
+    data = {'time': time.time(), 'metrics': registry.snapshot()}
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+def start_dump(path, interval=10.0, registry=REGISTRY):
+    """
+    Dump the metrics to a JSON file every interval seconds.
+
+    Args:
+        path (str): Output file
+        interval (float): Seconds between dumps
+        registry (Registry): Metrics to dump
+
+    Returns:
+        callable: Stops dumping after writing a final snapshot
+    """
+    stopped = threading.Event()
+
+    def run():
+        while not stopped.wait(interval):
+            try:
+                dump(path, registry)
+            except OSError as e:
+                logging.getLogger('robotic_arm').warning("Could not dump metrics: %s", e)
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+
+    def stop():
+        stopped.set()
+        thread.join()
+        dump(path, registry)
+    return stop
+
+class SampleFilter(logging.Filter):
+    def __init__(self, every=10):
+        """
+        Let through one record in every N from each call site.
+
+        Warnings and errors always pass.
+
+        Args:
+            every (int): Sampling interval (1 = log everything)
+        """
+        super().__init__()
+        self.every = max(1, int(every))
+        self.seen = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.every == 1:
+            return True
+        key = (record.pathname, record.lineno)
+        n = self.seen.get(key, 0)
+        self.seen[key] = n + 1
+        return n % self.every == 0
+
+def setup_logging(level=logging.INFO, sample_every=10, stream=None):
+    """
+    Route the 'robotic_arm' loggers through a background writer thread.
+
+    Records are queued by the calling thread and formatted and written by
+    a QueueListener, so console I/O never blocks the GUI, the event loop or
+    the sender. Per-command messages (the 'robotic_arm.commands' logger)
+    are sampled.
+
+    Args:
+        level (int): Log level for the 'robotic_arm' loggers
+        sample_every (int): Log one per-command message in this many
+        stream (file): Output stream, defaults to stdout
+
+    Returns:
+        logging.handlers.QueueListener: Started listener; stop() flushes it
+    """
+    records = queue.SimpleQueue()
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    listener = logging.handlers.QueueListener(records, output)
+    listener.start()
+
+    root = logging.getLogger('robotic_arm')
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(level)
+    root.propagate = False
+
+    commands = logging.getLogger('robotic_arm.commands')
+    for old in list(commands.filters):
+        commands.removeFilter(old)
+    commands.addFilter(SampleFilter(sample_every))
+    return listener
@@ -0,0 +1,205 @@
+"""
+Cartesian trajectory planning for the robotic arm.
+
+Plans straight-line (optionally corner-blended) end-effector paths through
+Cartesian waypoints, solves them with vectorized IK and time-parameterizes
+them as fast as per-joint servo velocity/acceleration limits allow.
+
+The result is a trajectory array of shape (N, 3) with columns
+(t, theta1, theta2): time in seconds from the start of the move and joint
+angles in radians, sampled at a fixed rate. ArmVisualizer.play_trajectory
+and TrajectoryStreamer.start_trajectory both consume it.
+"""
+import numpy as np
+
+# The firmware's go_smooth moves one degree every 10 ms
+SERVO_MAX_VELOCITY = np.radians([100.0, 100.0])
+SERVO_MAX_ACCELERATION = np.radians([1000.0, 1000.0])
+
+class CartesianPlanner:
+    def __init__(self, arm, max_velocity=SERVO_MAX_VELOCITY,
+                 max_acceleration=SERVO_MAX_ACCELERATION, rate=100.0,
+                 resolution=0.05, blend_radius=0.0):
+        """
+        Initialize the planner.
+
+        Args:
+            arm (RoboticArm): Arm whose IK is used
+            max_velocity (array_like): Per-joint velocity limits in rad/s
+            max_acceleration (array_like): Per-joint acceleration limits in rad/s^2
+            rate (float): Output sample rate in Hz
+            resolution (float): Spacing of the dense path samples in cm
+            blend_radius (float): Round off interior corners with this radius
+                in cm so the arm does not have to stop at them (0 = stop)
+        """
+        self.arm = arm
+        self.max_velocity = np.broadcast_to(np.asarray(max_velocity, dtype=float), (2,))
+        self.max_acceleration = np.broadcast_to(np.asarray(max_acceleration, dtype=float), (2,))
+        self.rate = rate
+        self.resolution = resolution
+        self.blend_radius = blend_radius
+
+    def path(self, points):
+        """
+        Build the dense Cartesian path through the waypoints.
+
+        Args:
+            points (array_like): (K, 2) waypoints (y, z) in cm, K >= 2
+
+        Returns:
+            ndarray: (M, 2) path samples including both ends
+        """
+        points = np.asarray(points, dtype=float)
+        if points.ndim != 2 or points.shape[1] != 2 or len(points) < 2:
+            raise ValueError("expected at least two (y, z) waypoints")
+
+        # Pieces are (start, control, end); control is None for straight lines
+        pieces = []
+        start = points[0]
+        for i in range(1, len(points) - 1):
+            corner = points[i]
+            d_in = corner - start
+            d_out = points[i + 1] - corner
+            len_in = np.hypot(*d_in)
+            len_out = np.hypot(*d_out)
+            r = min(self.blend_radius, len_in / 2, len_out / 2)
+            if r <= 0 or len_in == 0 or len_out == 0:
+                pieces.append((start, None, corner))
+                start = corner
+                continue
+            # Quadratic Bezier from r before the corner to r after it
+            enter = corner - d_in / len_in * r
+            leave = corner + d_out / len_out * r
+            pieces.append((start, None, enter))
+            pieces.append((enter, corner, leave))
+            start = leave
+        pieces.append((start, None, points[-1]))
+
+        samples = []
+        for a, control, b in pieces:
+            if control is None:
+                length = np.hypot(*(b - a))
+            else:
+                length = np.hypot(*(control - a)) + np.hypot(*(b - control))
+            n = max(2, int(np.ceil(length / self.resolution)))
+            u = np.linspace(0.0, 1.0, n, endpoint=False)[:, None]
+            if control is None:
+                samples.append(a + (b - a) * u)
+            else:
+                samples.append((1 - u)**2 * a + 2 * (1 - u) * u * control + u**2 * b)
+        samples.append(points[-1][None, :])
+        return np.concatenate(samples)
+
+    def joint_path(self, path, start_angles=None):
+        """
+        Solve IK along a dense path.
+
+        Args:
+            path (ndarray): (M, 2) Cartesian samples
+            start_angles (tuple): Current (theta1, theta2); the joint path is
+                shifted by whole turns to start next to them
+
+        Returns:
+            ndarray: (M, 2) continuous joint angles in radians
+        """
+        # Snap points a rounding error outside the outer limit (such as the
+        # fully extended home pose) back onto it
+        max_reach = self.arm.l1 + self.arm.l2
+        r = np.hypot(path[:, 0], path[:, 1])
+        over = (r > max_reach) & (r <= max_reach * (1 + 1e-9))
+        path = path.copy()
+        path[over] *= (max_reach / r[over] * (1 - 1e-12))[:, None]
+
+        theta1, theta2, reachable = self.arm.inverse_kinematics_batch(path[:, 0], path[:, 1])
+        if not reachable.all():
+            y, z = path[np.argmin(reachable)]
+            raise ValueError(f"path point ({y:.2f}, {z:.2f}) is out of reach")
+        # Avoid jumps where the IK normalization wraps
+        q = np.unwrap(np.stack((theta1, theta2), axis=1), axis=0)
+        if start_angles is not None:
+            turns = np.round((np.asarray(start_angles, dtype=float) - q[0]) / (2 * np.pi))
+            q += turns * 2 * np.pi
+        return q
+
+    def time_parameterize(self, q):
+        """
+        Assign the fastest node times allowed by the joint limits.
+
+        Each path segment is traversed with constant path acceleration; a
+        forward and a backward pass bound the path speed by the velocity
+        and acceleration limits of every joint, starting and ending at rest.
+
+        Args:
+            q (ndarray): (M, 2) joint path
+
+        Returns:
+            ndarray: (M,) node times in seconds
+        """
+        dq = np.abs(np.diff(q, axis=0))
+        if len(dq) == 0 or not dq.any():
+            return np.zeros(len(q))
+
+        # Limits on the path speed u (segments per second) and its derivative
+        with np.errstate(divide='ignore'):
+            u_max = np.min(self.max_velocity / dq, axis=1)
+            a_max = np.min(self.max_acceleration / dq, axis=1)
+
+        u = np.empty(len(q))
+        u[1:-1] = np.minimum(u_max[:-1], u_max[1:])
+        u[0] = u[-1] = 0.0
+        for k in range(len(dq)):
+            u[k + 1] = min(u[k + 1], np.sqrt(u[k]**2 + 2 * a_max[k]))
+        for k in range(len(dq) - 1, -1, -1):
+            u[k] = min(u[k], np.sqrt(u[k + 1]**2 + 2 * a_max[k]))
+
+        # Segments that do not move any joint take no time
+        speed = u[:-1] + u[1:]
+        with np.errstate(divide='ignore'):
+            dt = np.where(speed > 0, 2.0 / speed, 0.0)
+        return np.concatenate(([0.0], np.cumsum(dt)))
+
+    def resample(self, times, q):
+        """
+        Sample the joint path at the output rate.
+
+        Args:
+            times (ndarray): (M,) node times
+            q (ndarray): (M, 2) joint path
+
+        Returns:
+            ndarray: (N, 3) trajectory (t, theta1, theta2)
+        """
+        duration = times[-1]
+        t = np.arange(0.0, duration, 1.0 / self.rate)
+        t = np.append(t, duration) if len(t) == 0 or t[-1] < duration else t
+        return np.stack((t, np.interp(t, times, q[:, 0]), np.interp(t, times, q[:, 1])), axis=1)
+
+    def plan(self, points, start_angles=None):
+        """
+        Plan a trajectory through Cartesian waypoints.
+
+        Args:
+            points (array_like): (K, 2) waypoints (y, z) in cm
+            start_angles (tuple): Current joint angles to start next to
+
+        Returns:
+            ndarray: (N, 3) trajectory (t, theta1, theta2)
+
+        Raises:
+            ValueError: If part of the path is out of reach
+        """
+        q = self.joint_path(self.path(points), start_angles)
+        return self.resample(self.time_parameterize(q), q)
+
+    def plan_move(self, target):
+        """
+        Plan a straight-line move from the arm's current pose.
+
+        Args:
+            target (tuple): (y, z) target in cm
+
+        Returns:
+            ndarray: (N, 3) trajectory (t, theta1, theta2)
+        """
+        _, _, start = self.arm.get_arm_positions()
+        return self.plan([start, target], (self.arm.theta1, self.arm.theta2))
@@ -0,0 +1,371 @@
+"""
+Session recording and replay.
+
+SessionRecorder appends one fixed-size record per command sent to the arm
+(wall-clock time, target y/z, joint count and angles, reachable flag,
+client id) to
+preallocated, memory-mapped segment files, so recording a command is a
+struct pack into mapped memory. Segments are named
+<prefix>-000000.armlog, <prefix>-000001.armlog, ... in the session
+directory. Version 1 segments (two joints only) are still read.
+
+read_session iterates the records of a session without loading it into
+memory, and replay sends them back through a RoboticArm (re-solving the
+IK with the current build) or a sender at real time, N times faster, or as
+fast as possible.
+
+Run from the repository root, for example:
+
+    python app.py --record sessions/today
+    python recorder.py info sessions/today
+    python recorder.py replay sessions/today --port 3000 --speed 10
+    python recorder.py replay sessions/fleet --transport fleet --handshake-timeout 1
+"""
+import argparse
+import glob
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+
+# Segment header: magic, version, record size, record count
+SEGMENT_MAGIC = b"ARMLOG\x00\x01"
+SEGMENT_HEADER = struct.Struct('<8sHHxxxxQ')
+SEGMENT_VERSION = 2
+# Record: time, y, z, joint count, angles (unused ones zero), reachable,
+# client id
+RECORD_MAX_JOINTS = 8               # as app.FRAME_MAX_JOINTS
+RECORD = struct.Struct(f'<dffB{RECORD_MAX_JOINTS}dB15s')
+# Version 1 record: time, y, z, theta1, theta2, reachable, client id
+RECORD_V1 = struct.Struct('<dffddB15s')
+COUNT_OFFSET = 16
+
+class Record(namedtuple('Record', 'time y z angles reachable client')):
+    __slots__ = ()
+
+    @property
+    def theta1(self):
+        """First joint angle in radians."""
+        return self.angles[0]
+
+    @property
+    def theta2(self):
+        """Second joint angle in radians."""
+        return self.angles[1]
+
+def segment_paths(directory, prefix="session"):
+    """
+    List a session's segment files in order.
+
+    Args:
+        directory (str): Session directory
+        prefix (str): Segment file name prefix
+
+    Returns:
+        list: Segment paths
+    """
+    return sorted(glob.glob(os.path.join(directory, f"{prefix}-*.armlog")))
+
+class SessionRecorder:
+    def __init__(self, directory, prefix="session", segment_records=65536):
+        """
+        Open a recorder that appends to a session directory.
+
+        Recording continues after the last existing segment, so one
+        directory can hold several runs.
+
+        Args:
+            directory (str): Session directory (created if missing)
+            prefix (str): Segment file name prefix
+            segment_records (int): Records preallocated per segment
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.segment_records = segment_records
+        self.lock = threading.Lock()
+        self.file = None
+        self.map = None
+        self.count = 0
+        self.records_written = 0
+        os.makedirs(directory, exist_ok=True)
+        self.index = len(segment_paths(directory, prefix))
+        self._open_segment()
+
+    def _open_segment(self):
+        """Preallocate and map the next segment file."""
+        path = os.path.join(self.directory, f"{self.prefix}-{self.index:06d}.armlog")
+        self.index += 1
+        self.file = open(path, 'w+b')
+        self.file.truncate(SEGMENT_HEADER.size + self.segment_records * RECORD.size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        SEGMENT_HEADER.pack_into(self.map, 0, SEGMENT_MAGIC, SEGMENT_VERSION, RECORD.size, 0)
+        self.count = 0
+
+    def _close_segment(self):
+        """Unmap the current segment and trim its unused space."""
+        self.map.flush()
+        self.map.close()
+        self.file.truncate(SEGMENT_HEADER.size + self.count * RECORD.size)
+        self.file.close()
+        self.map = self.file = None
+
+    def record(self, y, z, angles, reachable=True, client="", timestamp=None):
+        """
+        Append one command.
+
+        Args:
+            y (float): Target y in cm (NaN when there was no target)
+            z (float): Target z in cm (NaN when there was no target)
+            angles (sequence): Joint angles in radians, one per joint (at
+                most RECORD_MAX_JOINTS)
+            reachable (bool): Whether the target was reachable
+            client (str): Client id, at most 15 bytes are kept
+            timestamp (float): time.time() of the command, default now
+        """
+        if not 0 < len(angles) <= RECORD_MAX_JOINTS:
+            raise ValueError(f"can only record 1 to {RECORD_MAX_JOINTS} joints, got {len(angles)}")
+        timestamp = time.time() if timestamp is None else timestamp
+        client = client.encode('utf-8', 'replace')[:15]
+        padded = list(angles) + [0.0] * (RECORD_MAX_JOINTS - len(angles))
+        with self.lock:
+            if self.map is None:
+                raise ValueError("recorder is closed")
+            if self.count == self.segment_records:
+                self._close_segment()
+                self._open_segment()
+            offset = SEGMENT_HEADER.size + self.count * RECORD.size
+            RECORD.pack_into(self.map, offset, timestamp, y, z, len(angles), *padded,
+                             bool(reachable), client)
+            self.count += 1
+            # The count is published after the record, so readers of a live
+            # session never see a partial record
+            struct.pack_into('<Q', self.map, COUNT_OFFSET, self.count)
+            self.records_written += 1
+
+    def close(self):
+        """Flush and close the current segment."""
+        with self.lock:
+            if self.map is not None:
+                self._close_segment()
+
+def read_segment(path):
+    """
+    Iterate the records of one segment file.
+
+    Args:
+        path (str): Segment file
+
+    Yields:
+        Record: Recorded commands in order
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < SEGMENT_HEADER.size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version, record_size, count = SEGMENT_HEADER.unpack_from(data, 0)
+            layout = {1: RECORD_V1, SEGMENT_VERSION: RECORD}.get(version)
+            if magic != SEGMENT_MAGIC or layout is None or record_size != layout.size:
+                raise ValueError(f"{path} is not a session segment")
+            count = min(count, (size - SEGMENT_HEADER.size) // record_size)
+            for i in range(count):
+                fields = layout.unpack_from(data, SEGMENT_HEADER.size + i * record_size)
+                t, y, z = fields[:3]
+                if version == 1:
+                    angles = fields[3:5]
+                else:
+                    angles = fields[4:4 + fields[3]]
+                reachable, client = fields[-2:]
+                yield Record(t, y, z, tuple(angles), bool(reachable),
+                             client.rstrip(b'\0').decode('utf-8', 'replace'))
+
+def read_session(directory, prefix="session"):
+    """
+    Iterate every record of a session, segment by segment.
+
+    Args:
+        directory (str): Session directory
+        prefix (str): Segment file name prefix
+
+    Yields:
+        Record: Recorded commands in order
+    """
+    for path in segment_paths(directory, prefix):
+        yield from read_segment(path)
+
+def replay(records, target, speed=1.0, clients=None):
+    """
+    Send recorded commands to a RoboticArm or a sender.
+
+    A RoboticArm re-solves the IK for each recorded target (records without
+    a target send their recorded angles); any other target gets the
+    recorded angles through send_to (when it has one and the record has a
+    client id) or send_angles. Every recorded joint is sent, so the arm
+    must have as many joints as the session was recorded with.
+
+    Args:
+        records (iterable): Records, e.g. from read_session
+        target: RoboticArm, AsyncTCPSender, TCPSender or FleetTCPSender
+        speed (float): Time scale (1 = real time, 10 = ten times faster,
+            0 = as fast as possible)
+        clients (set): Only replay records from these client ids
+
+    Returns:
+        dict: Records sent, wall time and the worst lateness in ms
+
+    Raises:
+        ValueError: A record's joint count differs from the arm's
+    """
+    is_arm = hasattr(target, 'inverse_kinematics')
+    send_to = getattr(target, 'send_to', None)
+    start = first = None
+    sent = 0
+    max_late = 0.0
+    for record in records:
+        if clients is not None and record.client not in clients:
+            continue
+        now = time.monotonic()
+        if first is None:
+            start, first = now, record.time
+        if speed > 0:
+            due = start + (record.time - first) / speed
+            if due > now:
+                time.sleep(due - now)
+            else:
+                max_late = max(max_late, now - due)
+
+        if is_arm:
+            if len(record.angles) != len(target.target_angles):
+                raise ValueError(f"record has {len(record.angles)} joints, "
+                                 f"the arm {len(target.target_angles)}")
+            if math.isnan(record.y) or math.isnan(record.z):
+                target.target_theta1, target.target_theta2 = record.theta1, record.theta2
+                if hasattr(target, 'target_joint_angles'):
+                    target.target_joint_angles = record.angles
+            else:
+                target.inverse_kinematics(record.y, record.z)
+            target.set_angles(*target.target_angles)
+            target.send_target_angles()
+        elif send_to is not None and record.client:
+            send_to(record.client, *record.angles)
+        else:
+            target.send_angles(*record.angles)
+        sent += 1
+    return {
+        'records': sent,
+        'seconds': time.monotonic() - start if start is not None else 0.0,
+        'max_late_ms': max_late * 1000.0,
+    }
+
+def main(argv=None):
+    """Inspect or replay a recorded session from the command line."""
+    from app import PROTOCOLS, TRANSPORTS, build_arm
+    from transport import make_sender
+
+    parser = argparse.ArgumentParser(description="Robotic arm session recorder")
+    parser.add_argument('command', choices=('info', 'dump', 'replay'))
+    parser.add_argument('session', help="session directory")
+    parser.add_argument('--prefix', default="session", help="segment file name prefix")
+    parser.add_argument('--port', type=int, default=3000, help="TCP server port for replay")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="replay time scale (1 = real time, 0 = as fast as possible)")
+    parser.add_argument('--resolve', action='store_true',
+                        help="re-solve the IK for recorded targets instead of sending recorded angles")
+    parser.add_argument('--wait', type=float, default=30.0,
+                        help="seconds to wait for the arm to connect before replaying")
+    parser.add_argument('--transport', choices=TRANSPORTS + ('fleet',), default='asyncio',
+                        help="how commands reach the arm (see app.py --transport); 'fleet' "
+                             "serves many arms and sends each client's records to that client")
+    parser.add_argument('--protocol', choices=PROTOCOLS, default='framed', help="wire format")
+    parser.add_argument('--client', action='append', default=None, metavar='ID',
+                        help="only replay records from this client id (repeatable; a single-arm "
+                             "transport replays one client)")
+    parser.add_argument('--handshake-timeout', type=float, default=0.0, metavar='S',
+                        help="with --transport fleet: seconds to wait for an arm's id line")
+    parser.add_argument('--links', default=None, metavar='L1,L2[,L3...]',
+                        help="with --resolve: segment lengths in cm, base first (default 12.5,14)")
+    parser.add_argument('--limits', dest='ideal_workspace', action='store_false', default=False,
+                        help="with --resolve: keep the IK inside the firmware's servo limits "
+                             "(default)")
+    parser.add_argument('--no-limits', dest='ideal_workspace', action='store_true',
+                        help="with --resolve: use the full reach annulus")
+    args = parser.parse_args(argv)
+
+    records = read_session(args.session, args.prefix)
+    if args.command == 'dump':
+        for record in records:
+            angles = " ".join(f"theta{i + 1}={math.degrees(angle):.1f}°"
+                              for i, angle in enumerate(record.angles))
+            print(f"{record.time:.6f} y={record.y:.2f} z={record.z:.2f} {angles} "
+                  f"reachable={record.reachable} client={record.client!r}")
+        return
+    if args.command == 'info':
+        count, first, last, clients = 0, None, None, set()
+        for record in records:
+            count += 1
+            first = record.time if first is None else first
+            last = record.time
+            clients.add(record.client)
+        print(f"segments: {len(segment_paths(args.session, args.prefix))}")
+        print(f"records: {count}")
+        if count:
+            print(f"duration: {last - first:.3f} s")
+            print(f"clients: {sorted(clients)}")
+        return
+
+    if args.transport == 'udp' and args.protocol != 'framed':
+        parser.error("--transport udp needs the framed protocol")
+    links = None
+    if args.links:
+        try:
+            links = [float(length) for length in args.links.split(',')]
+        except ValueError:
+            parser.error(f"--links: expected comma-separated lengths, got {args.links!r}")
+        if len(links) < 2:
+            parser.error("--links needs at least two lengths")
+    clients = set(args.client) if args.client else None
+
+    if args.transport == 'fleet':
+        from fleet import FleetTCPSender
+        if args.resolve and (clients is None or len(clients) != 1):
+            parser.error("--resolve with --transport fleet replays one --client")
+        sender = FleetTCPSender(args.port, handshake_timeout=args.handshake_timeout,
+                                protocol=args.protocol)
+        waiting = clients
+        target = build_arm(args, links, sender.link(*clients)) if args.resolve else sender
+    else:
+        # One arm cannot tell a fleet's clients apart: replay one of them
+        if clients is None:
+            clients = {record.client for record in read_session(args.session, args.prefix)}
+            if len(clients) > 1:
+                parser.error(f"session has clients {sorted(clients)}: choose one with --client "
+                             "or use --transport fleet")
+            clients = None
+        elif len(clients) > 1:
+            parser.error("a single arm replays one --client; use --transport fleet")
+        sender = make_sender(args.transport, args.port, args.protocol)
+        waiting = None
+        target = build_arm(args, links, sender) if args.resolve else sender
+
+    def ready():
+        if waiting is not None:
+            return waiting <= set(sender.connected_arms())
+        return sender.connected
+
+    sender.start_server()
+    try:
+        deadline = time.monotonic() + args.wait
+        while not ready() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        result = replay(records, target, args.speed, clients)
+        # Give the last command time to leave the socket
+        time.sleep(0.1)
+    finally:
+        sender.cleanup()
+    print(result)
+
+if __name__ == "__main__":
+    main()
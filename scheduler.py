@@ -0,0 +1,423 @@
+"""
+Motion-aware command scheduling.
+
+The firmware never acknowledges a command and runs one at a time:
+servo_control_task spends seconds in go_smooth and its pauses, and a new
+single command replaces whatever waits in its queue (xQueueReset, or a
+frame flagged REPLACE). Commands sent while the arm is busy are silently
+lost there, and the host cannot tell when a pose will be reached.
+
+MotionScheduler sits between the arm and its sender and models that
+timing (timing.py): 10 ms per degree, joints one after the other,
+1000 ms after servo 0 and 500 ms after each later joint, and a 50 ms poll
+when idle. It keeps a timeline of the commands sent and not yet finished,
+and from it:
+
+- holds each new command on the host until the firmware is about to take
+  the next one (lead seconds early), so newer commands merge into the held
+  one where they can be counted (coalesced) instead of being overwritten
+  on the arm. A command sent but predicted not to start for a while yet
+  (start_margin) is replaced at once, and counted as dropped, as the
+  firmware overwrites it; one that may already have started is left to run
+- predicts when the latest pose will be reached (estimated_time_to_pose)
+
+The arm reports nothing back, so the model is never corrected, and its
+predictions are off by:
+
+- up to half a poll either way for a command sent while the model has no
+  idle time for the arm (at start-up or after a reconnect), as the poll
+  phase is unknown
+- the difference between latency and the real one-way delay, for a
+  command that finds the arm idle
+- the arm's timing overshoot, which adds up over back-to-back moves, and
+  past start_margin can make the model replace a command the arm has
+  already started, leaving it a whole move off from then on
+
+Run app.py with --schedule (and --time-scale to match emulator.py --speed).
+"""
+import math
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import metrics
+from app import pack_angles, pose_centidegrees, wire_centidegrees, log
+from timing import (servo1_angle, IDLE_POLL_MS, SERVO0_PAUSE_MS, SERVO1_PAUSE_MS, STEP_MS,
+                    STREAM_BUFFER_MS)
+
+SCHEDULE_COALESCED = metrics.counter('arm_schedule_coalesced_total',
+                                     "Commands merged into a newer one while held on the host")
+SCHEDULE_DROPPED = metrics.counter('arm_schedule_dropped_total',
+                                   "Sent commands the firmware overwrites before starting them")
+SCHEDULE_HOLD_SECONDS = metrics.histogram('arm_schedule_hold_seconds',
+                                          "Time a command was held until the firmware could take it")
+
+# One command on the firmware's timeline, in host clock seconds
+Planned = namedtuple('Planned', 'start reached free targets')
+
+def firmware_degrees(angles, legacy=False):
+    """
+    Whole-degree angles the firmware executes for a pose command.
+
+    Args:
+        angles (sequence): Joint angles in radians
+        legacy (bool): Sent with pack_angles (truncated) rather than as a
+            frame (rounded centi-degrees)
+
+    Returns:
+        list: int degrees per joint, as the firmware's message[]
+    """
+    if legacy:
+        return list(pack_angles(*angles)[1:])
+    # Same mapping as apply_frame: back to 0-360, rounded to whole degrees
+    return [((cdeg + 36000 if cdeg < 0 else cdeg) + 50) // 100 for cdeg in pose_centidegrees(angles)]
+
+def firmware_degrees_batch(commands, legacy=False):
+    """
+    firmware_degrees for many commands at once.
+
+    Args:
+        commands (array_like): (count, joints) joint angles in radians
+        legacy (bool): Sent with pack_angles (truncated) rather than as
+            frames (rounded centi-degrees)
+
+    Returns:
+        ndarray: (count, joints) int degrees per joint
+    """
+    commands = np.atleast_2d(np.asarray(commands, dtype=float))
+    if legacy:
+        # pack_angles, vectorized
+        degrees = np.degrees(commands)
+        degrees[:, 1] = np.abs(degrees[:, 1])
+        degrees[:, 2:] = 90 + (degrees[:, 2:] + 180) % 360 - 180
+        return np.trunc(degrees).astype(int)
+    cdeg = wire_centidegrees(commands).astype(int)
+    return (np.where(cdeg < 0, cdeg + 36000, cdeg) + 50) // 100
+
+def servo_targets(degrees):
+    """Angles go_smooth is called with (servo 1 wrapped and clamped)."""
+    return (degrees[0], servo1_angle(degrees[1]), *degrees[2:])
+
+def command_timing(targets, last=None):
+    """
+    Time servo_control_task spends on one command.
+
+    Args:
+        targets (tuple): go_smooth angles per joint (see servo_targets)
+        last (tuple): go_smooth's memory, the previous command's targets,
+            or None after boot (each joint is written in a single step)
+
+    Returns:
+        tuple: (reach, busy) seconds from taking the command until the
+            last joint arrives, and until the next command is taken
+    """
+    ms = 0
+    for joint, target in enumerate(targets):
+        if joint:
+            ms += SERVO0_PAUSE_MS if joint == 1 else SERVO1_PAUSE_MS
+        previous = -1 if last is None else last[joint]
+        steps = 1 if previous in (-1, target) else abs(target - previous) + 1
+        ms += steps * STEP_MS
+    return ms / 1000, (ms + SERVO1_PAUSE_MS) / 1000
+
+class MotionScheduler:
+    def __init__(self, sender, time_scale=1.0, lead=0.02, latency=0.005, start_margin=None,
+                 clock=time.monotonic):
+        """
+        Pace and merge commands against a model of the firmware's timing.
+
+        Has the sender surface (send_angles, connected, port, start_server,
+        cleanup, send_batch, send_waypoints), so it plugs in as a
+        RoboticArm's tcp_sender in front of the real one.
+
+        Args:
+            sender: Sender the commands go out on
+            time_scale (float): Firmware speed-up (emulator.py --speed)
+            lead (float): Seconds before the firmware is free that a held
+                command is sent
+            latency (float): Assumed one-way delay to the arm in seconds
+            start_margin (float): Seconds before its predicted start that a
+                sent command may already have started, so it is not
+                replaced (default one idle poll)
+            clock (callable): Monotonic time source
+        """
+        self.sender = sender
+        self.port = sender.port
+        self.time_scale = time_scale
+        self.lead = lead
+        self.latency = latency
+        if start_margin is None:
+            start_margin = self._host_seconds(IDLE_POLL_MS / 1000)
+        self.start_margin = start_margin
+        self.clock = clock
+        self.legacy = getattr(sender, 'packer', None) is None
+        self.lock = threading.Condition()
+        self.running = False
+        self.thread = None
+
+        # Held command: (angles, time it was requested)
+        self.pending = None
+        # Firmware model: commands sent and not yet finished, go_smooth's
+        # memory and when the arm went idle (its poll phase)
+        self.timeline = []
+        self.memory = None
+        self.idle_since = None
+        self.stream_base = None
+        self.stream_end = None
+
+        self.commands_requested = 0
+        self.commands_sent = 0
+        self.commands_coalesced = 0
+        self.commands_dropped = 0
+
+    @property
+    def connected(self):
+        """Whether the underlying sender has an arm."""
+        return self.sender.connected
+
+    @property
+    def label(self):
+        """Transport name for display."""
+        return getattr(self.sender, 'label', 'TCP')
+
+    @property
+    def packer(self):
+        """The underlying sender's packer (None for the legacy protocol)."""
+        return getattr(self.sender, 'packer', None)
+
+    def start_server(self):
+        """Start the sender and the pacing thread."""
+        self.sender.start_server()
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def cleanup(self):
+        """Stop pacing, send any held command at once and clean up the sender."""
+        with self.lock:
+            self.running = False
+            if self.pending is not None:
+                # The firmware queues it behind the current move
+                self._send_pending(self.clock())
+            self.lock.notify()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(1)
+        self.sender.cleanup()
+
+    def _host_seconds(self, seconds):
+        """Firmware seconds as host seconds (see time_scale)."""
+        return seconds / self.time_scale
+
+    def _prune(self, now):
+        """Retire the commands the firmware has finished by now."""
+        while self.timeline and self.timeline[0].free <= now:
+            done = self.timeline.pop(0)
+            self.memory = done.targets
+            self.idle_since = done.free
+
+    def _start_after(self, free, ready):
+        """When a command arriving at ready is taken by an arm free at free."""
+        poll = self._host_seconds(IDLE_POLL_MS / 1000)
+        if free is None:
+            # Poll phase unknown: half a poll on average, off by at most
+            # poll / 2 either way
+            return ready + poll / 2
+        if ready <= free:
+            return free
+        return free + math.ceil((ready - free) / poll) * poll
+
+    def _plan(self, targets_list, at, replace):
+        """
+        Predict the firmware timeline after sending commands at a time.
+
+        Args:
+            targets_list (list): go_smooth targets per command, in order
+            at (float): Send time
+            replace (bool): The first command drops the ones not started
+
+        Returns:
+            tuple: (new timeline, commands dropped)
+        """
+        ready = at + self.latency
+        timeline = list(self.timeline)
+        dropped = 0
+        if replace:
+            while timeline and timeline[-1].start > ready + self.start_margin:
+                timeline.pop()
+                dropped += 1
+        if timeline:
+            base, free = timeline[-1].targets, timeline[-1].free
+        else:
+            base, free = self.memory, self.idle_since
+        start = self._start_after(free, ready)
+        for targets in targets_list:
+            reach, busy = command_timing(targets, base)
+            planned = Planned(start, start + self._host_seconds(reach),
+                              start + self._host_seconds(busy), targets)
+            timeline.append(planned)
+            base, start = targets, planned.free
+        return timeline, dropped
+
+    def _send_at(self, now):
+        """When the held command should go out."""
+        if not self.sender.connected or not self.timeline:
+            return now
+        last = self.timeline[-1]
+        if last.start > now + self.latency + self.start_margin:
+            # Sent and not started: the firmware would still take a newer one instead
+            return now
+        return max(now, last.free - self.lead)
+
+    def _run(self):
+        """Pacing thread: send the held command when the firmware is about to be free."""
+        with self.lock:
+            while self.running:
+                self.lock.wait(self.poll())
+
+    def poll(self, now=None):
+        """
+        Send the held command if the firmware is about to be free.
+
+        The pacing thread started by start_server calls this; without it,
+        the caller drives the scheduler by calling it instead.
+
+        Args:
+            now (float): Current time from the scheduler's clock, None to
+                read it
+
+        Returns:
+            float: Seconds until the held command is due, or None when no
+                command is held (any more)
+        """
+        with self.lock:
+            if self.pending is None:
+                return None
+            now = self.clock() if now is None else now
+            self._prune(now)
+            due = self._send_at(now)
+            if due > now:
+                return due - now
+            self._send_pending(now)
+            return None
+
+    def _send_pending(self, now):
+        """Send the held command and update the model (lock held)."""
+        angles, requested = self.pending
+        self.pending = None
+        if not self.sender.connected:
+            # The arm's state is unknown until it reconnects
+            self.timeline, self.memory, self.idle_since = [], None, None
+        targets = servo_targets(firmware_degrees(angles, self.legacy))
+        self.timeline, dropped = self._plan([targets], now, replace=True)
+        if dropped:
+            self.commands_dropped += dropped
+            SCHEDULE_DROPPED.inc(dropped)
+        self.commands_sent += 1
+        SCHEDULE_HOLD_SECONDS.observe(now - requested)
+        self.sender.send_angles(*angles)
+        log.debug("Scheduled %s: starts in %.3f s, reached in %.3f s", targets,
+                  self.timeline[-1].start - now, self.timeline[-1].reached - now)
+
+    def send_angles(self, *angles):
+        """
+        Hold the angles until the firmware can take them, replacing any
+        command still held.
+
+        Args:
+            *angles (float): Joint angles in radians (theta1, theta2, ...)
+        """
+        with self.lock:
+            self.commands_requested += 1
+            if self.pending is not None:
+                self.commands_coalesced += 1
+                SCHEDULE_COALESCED.inc()
+            self.pending = (angles, self.clock())
+            self.lock.notify()
+
+    def send_batch(self, commands, replace=False):
+        """
+        Send poses the firmware runs in order, without holding them.
+
+        A command still held is sent first, so the arm sees the calls in
+        order.
+
+        Args:
+            commands (array_like): (count, joints) joint angles in radians
+            replace (bool): Drop poses the firmware has queued but not run
+        """
+        commands = np.atleast_2d(np.asarray(commands, dtype=float))
+        with self.lock:
+            now = self.clock()
+            self._prune(now)
+            if self.pending is not None:
+                self._send_pending(now)
+            targets_list = [servo_targets(firmware_degrees(angles, self.legacy))
+                            for angles in commands]
+            self.timeline, dropped = self._plan(targets_list, now, replace)
+            if dropped:
+                self.commands_dropped += dropped
+                SCHEDULE_DROPPED.inc(dropped)
+            self.commands_sent += len(commands)
+            self.sender.send_batch(commands, replace)
+
+    def send_waypoints(self, waypoints, new_stream=False):
+        """
+        Pass a waypoint batch through (the firmware runs streams first).
+
+        Args:
+            waypoints (list): (t, theta1, theta2) tuples, see pack_waypoints
+            new_stream (bool): First batch of a new move
+        """
+        with self.lock:
+            if waypoints:
+                now = self.clock()
+                if new_stream or self.stream_end is None:
+                    self.stream_base = now + self.latency + self._host_seconds(STREAM_BUFFER_MS / 1000)
+                t_end = waypoints[-1][0]
+                self.stream_end = self.stream_base + self._host_seconds(t_end)
+                # run_waypoint leaves go_smooth's memory at the last waypoint
+                self.memory = servo_targets(firmware_degrees(waypoints[-1][1:]))
+                self.idle_since = self.stream_end
+            self.sender.send_waypoints(waypoints, new_stream)
+
+    def estimated_time_to_pose(self, now=None):
+        """
+        Predict how long until the arm reaches the latest requested pose.
+
+        Args:
+            now (float): Current time from the scheduler's clock, None to
+                read it
+
+        Returns:
+            float: Seconds from now (0 once the pose should be reached)
+        """
+        with self.lock:
+            now = self.clock() if now is None else now
+            self._prune(now)
+            reached = self.stream_end or now
+            if self.pending is not None:
+                targets = servo_targets(firmware_degrees(self.pending[0], self.legacy))
+                timeline, _ = self._plan([targets], self._send_at(now), replace=True)
+                reached = max(reached, timeline[-1].reached)
+            elif self.timeline:
+                reached = max(reached, self.timeline[-1].reached)
+            return max(0.0, reached - now)
+
+    def stats(self):
+        """
+        Report the scheduler's command counts.
+
+        Returns:
+            dict: Commands requested, sent, coalesced on the host and
+                dropped on the arm, and the estimated time to pose
+        """
+        return {
+            'requested': self.commands_requested,
+            'sent': self.commands_sent,
+            'coalesced': self.commands_coalesced,
+            'dropped': self.commands_dropped,
+            'time_to_pose_s': self.estimated_time_to_pose(),
+        }
@@ -0,0 +1,336 @@
+"""
+Vectorized simulation of many arms, for fleet-scale load testing.
+
+RoboticArm keeps one arm's state in Python floats, and the emulator runs
+one asyncio task per arm. Neither scales to thousands of arms. Here every
+per-arm quantity is one entry of a NumPy array: link lengths, targets,
+the command slot and the firmware's servo state. A tick advances all arms
+with a handful of array operations, so the cost per arm is a few
+nanoseconds.
+
+The host side solves the IK for a batch of targets (app.ik_2link, each
+arm with its own lengths) and converts them to the whole degrees the
+firmware runs for the wire protocol (scheduler.firmware_degrees_batch:
+rounded for frames, truncated for legacy commands). The arm side is the
+single command path of firmware/main.c, as timing.py models it:
+
+- a new command replaces the one waiting in the slot (xQueueReset)
+- servo_control_task takes a command after the previous one's final
+  pause, or at the next 50 ms poll when idle
+- go_smooth moves servo 0 one degree per 10 ms, then pauses 1000 ms.
+  Servo 1 follows (wrapped above 180, clamped to 135), then 500 ms
+
+Phase changes are exact to the millisecond whatever the tick length.
+Servo positions are sampled at the end of each tick.
+
+Run from the repository root, for example:
+
+    python simulation.py --arms 10000 --seconds 10 --command-rate 0.5
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app import FRAME_BATCH, FRAME_HEADER, ik_2link, fk_2link
+from control import ControlLoop
+from scheduler import firmware_degrees_batch
+from timing import IDLE_POLL_MS, SERVO0_PAUSE_MS, SERVO1_PAUSE_MS, STEP_MS
+from workspace import FIRMWARE_LIMITS
+
+# servo_control_task phases
+IDLE, MOVE0, PAUSE0, MOVE1, PAUSE1 = range(5)
+
+# Latency histogram: one bucket per servo step, the last one open-ended
+LATENCY_BUCKETS = 2000
+
+class FleetSimulation:
+    def __init__(self, count, l1=12.5, l2=14.0, limits=FIRMWARE_LIMITS, protocol='framed',
+                 seed=0):
+        """
+        Initialize count arms at rest, as after boot.
+
+        Args:
+            count (int): Number of arms
+            l1 (float or array_like): First segment length(s) in cm
+            l2 (float or array_like): Second segment length(s) in cm
+            limits (workspace.JointLimits): Servo limits the host IK
+                respects, or None
+            protocol (str): Wire protocol, 'framed' or 'legacy': the
+                bytes counted in bytes_sent and how angles are rounded
+            seed (int): Seed for the arms' idle poll phases
+        """
+        self.count = count
+        self.l1 = np.broadcast_to(np.asarray(l1, dtype=float), (count,)).copy()
+        self.l2 = np.broadcast_to(np.asarray(l2, dtype=float), (count,)).copy()
+        self.limits = limits
+        self.legacy = protocol == 'legacy'
+        self.command_size = 8 if self.legacy else FRAME_HEADER.size + FRAME_BATCH.size + 4
+        self.now = 0.0                                      # Simulated ms
+
+        # Host side
+        self.targets = np.full((count, 2), np.nan)
+        self.reachable = np.ones(count, dtype=bool)
+
+        # Command slot (wire angles: theta1 and |theta2| in whole degrees)
+        self.command = np.zeros((count, 2), dtype=np.int32)
+        self.pending = np.zeros(count, dtype=bool)
+        self.received = np.zeros(count)
+
+        # servo_control_task state. Arms booted at different times, so
+        # their idle polls are spread over the poll period
+        rng = np.random.default_rng(seed)
+        self.phase = np.full(count, IDLE, dtype=np.int8)
+        self.phase_start = np.zeros(count)
+        self.phase_end = rng.uniform(0, IDLE_POLL_MS, count)
+        self.move_from = np.zeros(count, dtype=np.int32)
+        self.move_to = np.zeros(count, dtype=np.int32)
+        self.move_received = np.zeros(count)
+        self.last_angle = np.full((count, 2), -1, dtype=np.int32)   # go_smooth's memory
+        self.pose = np.full((count, 2), 90, dtype=np.int32)         # Physical servo positions
+
+        # Counters
+        self.commands_sent = 0
+        self.commands_overwritten = 0
+        self.commands_executed = 0
+        self.bytes_sent = 0
+        self.latency_counts = np.zeros(LATENCY_BUCKETS + 1, dtype=np.int64)
+        self.latency_max = 0.0
+
+    def set_targets(self, ys, zs, arms=None):
+        """
+        Solve the IK for new targets and send the resulting commands.
+
+        Args:
+            ys (array_like): Target y coordinates in cm
+            zs (array_like): Target z coordinates in cm
+            arms (array_like): Indices of the arms the targets are for, or
+                None for all arms
+
+        Returns:
+            ndarray: Whether each target was reachable
+        """
+        arms = np.arange(self.count) if arms is None else np.asarray(arms)
+        theta1s, theta2s, reachable = ik_2link(ys, zs, self.l1[arms], self.l2[arms], self.limits)
+        self.targets[arms, 0] = np.abs(ys)
+        self.targets[arms, 1] = np.abs(zs)
+        self.reachable[arms] = reachable
+        self.send(firmware_degrees_batch(np.stack((theta1s, theta2s), axis=-1), self.legacy), arms)
+        return reachable
+
+    def send(self, angles, arms=None):
+        """
+        Deliver commands, replacing any the arms have not started.
+
+        Args:
+            angles (array_like): (count, 2) wire angles in whole degrees
+            arms (array_like): Indices of the receiving arms, or None for all
+        """
+        arms = np.arange(self.count) if arms is None else np.asarray(arms)
+        self.commands_overwritten += int(np.count_nonzero(self.pending[arms]))
+        self.command[arms] = angles
+        self.pending[arms] = True
+        self.received[arms] = self.now
+        self.commands_sent += len(arms)
+        self.bytes_sent += len(arms) * self.command_size
+
+    def step(self, dt=STEP_MS):
+        """
+        Advance all arms.
+
+        Args:
+            dt (float): Simulated milliseconds
+        """
+        self.advance_to(self.now + dt)
+
+    def advance_to(self, end):
+        """
+        Advance all arms to a simulated time.
+
+        Args:
+            end (float): Simulated time in ms
+        """
+        # Every phase lasts at least one 10 ms step, so this terminates
+        while True:
+            due = np.flatnonzero(self.phase_end <= end)
+            if len(due) == 0:
+                break
+            self._advance(due)
+        self.now = end
+        self._update_pose(end)
+
+    def _advance(self, arms):
+        """Move arms whose phase has ended to their next phase."""
+        t = self.phase_end[arms]
+        phase = self.phase[arms]
+
+        # A finished go_smooth leaves the servo at its target
+        for servo, moving in ((0, MOVE0), (1, MOVE1)):
+            done = arms[phase == moving]
+            self.pose[done, servo] = np.clip(self.move_to[done], 0, 180)
+            self.last_angle[done, servo] = self.move_to[done]
+
+        sel = phase == MOVE0
+        self._enter(arms[sel], PAUSE0, t[sel], SERVO0_PAUSE_MS)
+
+        sel = phase == PAUSE0
+        bend = self.command[arms[sel], 1]
+        bend = np.minimum(np.where(bend > 180, 360 - bend, bend), 135)
+        self._start_move(arms[sel], 1, bend, t[sel])
+
+        sel = phase == MOVE1
+        latencies = t[sel] - self.move_received[arms[sel]]
+        if len(latencies):
+            self.commands_executed += len(latencies)
+            buckets = np.minimum((latencies // STEP_MS).astype(np.int64), LATENCY_BUCKETS)
+            self.latency_counts += np.bincount(buckets, minlength=LATENCY_BUCKETS + 1)
+            self.latency_max = max(self.latency_max, float(latencies.max()))
+        self._enter(arms[sel], PAUSE1, t[sel], SERVO1_PAUSE_MS)
+
+        # After the last pause, or at an idle poll: take the next command
+        sel = (phase == PAUSE1) | (phase == IDLE)
+        ready, t_ready = arms[sel], t[sel]
+        has = self.pending[ready]
+        take = ready[has]
+        self.pending[take] = False
+        self.move_received[take] = self.received[take]
+        self._start_move(take, 0, self.command[take, 0], t_ready[has])
+        self._enter(ready[~has], IDLE, t_ready[~has], IDLE_POLL_MS)
+
+    def _enter(self, arms, phase, t, duration):
+        """Start a fixed-length phase."""
+        self.phase[arms] = phase
+        self.phase_start[arms] = t
+        self.phase_end[arms] = t + duration
+
+    def _start_move(self, arms, servo, target, t):
+        """Start go_smooth on one servo: one write per degree, 10 ms each."""
+        start = self.last_angle[arms, servo]
+        steps = np.where((start == -1) | (start == target), 1, np.abs(target - start) + 1)
+        self.move_from[arms] = start
+        self.move_to[arms] = target
+        self._enter(arms, MOVE1 if servo else MOVE0, t, steps * STEP_MS)
+
+    def _update_pose(self, now):
+        """Set the servo positions of arms in the middle of a move."""
+        moving = np.flatnonzero((self.phase == MOVE0) | (self.phase == MOVE1))
+        if len(moving) == 0:
+            return
+        servo = (self.phase[moving] == MOVE1).astype(np.intp)
+        start, target = self.move_from[moving], self.move_to[moving]
+        writes = ((now - self.phase_start[moving]) // STEP_MS).astype(np.int32)
+        delta = target - start
+        position = np.where(start == -1, target,
+                            start + np.sign(delta) * np.minimum(writes, np.abs(delta)))
+        self.pose[moving, servo] = np.clip(position, 0, 180)
+
+    def joint_angles(self):
+        """
+        Physical joint angles in RoboticArm's convention.
+
+        Returns:
+            tuple: (theta1s, theta2s) arrays in radians
+        """
+        return np.radians(self.pose[:, 0]), 2 * np.pi - np.radians(self.pose[:, 1])
+
+    def end_effectors(self):
+        """
+        Physical end effector positions.
+
+        Returns:
+            ndarray: (count, 2) array of (y, z) in cm
+        """
+        return fk_2link(*self.joint_angles(), self.l1, self.l2)[1]
+
+    def idle(self):
+        """
+        Returns:
+            ndarray: Whether each arm has nothing to do
+        """
+        return (self.phase == IDLE) & ~self.pending
+
+    def stats(self):
+        """
+        Summarize the simulation.
+
+        Returns:
+            dict: Counts, traffic, and receipt-to-reached latencies in
+                simulated ms (to the 10 ms bucket)
+        """
+        stats = {
+            'arms': self.count,
+            'time_s': self.now / 1000.0,
+            'commands_sent': self.commands_sent,
+            'commands_overwritten': self.commands_overwritten,
+            'commands_executed': self.commands_executed,
+            'bytes_sent': self.bytes_sent,
+            'moving': int(np.count_nonzero((self.phase == MOVE0) | (self.phase == MOVE1))),
+        }
+        if self.commands_executed:
+            cumulative = np.cumsum(self.latency_counts)
+            for q in (50, 95, 99):
+                bucket = int(np.searchsorted(cumulative, q / 100 * cumulative[-1]))
+                stats[f'latency_p{q}_ms'] = float((bucket + 1) * STEP_MS)
+            stats['latency_max_ms'] = self.latency_max
+        return stats
+
+    def run(self, seconds, rate=100.0, command_rate=0.0, seed=0, policy='skip'):
+        """
+        Simulate in real time, sending random targets.
+
+        Args:
+            seconds (float): Wall-clock (and simulated) duration
+            rate (float): Ticks per second
+            command_rate (float): Targets per arm per second, sent to
+                randomly chosen arms each tick
+            seed (int): Seed for the targets
+            policy (str): ControlLoop overrun policy
+
+        Returns:
+            dict: ControlLoop.stats() plus tick_ms, the mean work per tick
+        """
+        rng = np.random.default_rng(seed)
+        loop = ControlLoop(rate, policy)
+        per_tick = self.count * command_rate / rate
+        base = self.now
+        work = []
+
+        def tick(t):
+            start = time.perf_counter()
+            n = rng.poisson(per_tick) if per_tick else 0
+            if n:
+                arms = rng.choice(self.count, size=min(n, self.count), replace=False)
+                self.set_targets(rng.uniform(0, 25, len(arms)), rng.uniform(0, 25, len(arms)), arms)
+            # Simulated time follows the schedule, skipped ticks included
+            self.advance_to(base + (t - loop.start_time) * 1000.0)
+            work.append(time.perf_counter() - start)
+
+        loop.run(tick, ticks=int(seconds * rate))
+        stats = loop.stats()
+        stats['tick_ms'] = float(np.mean(work) * 1000.0)
+        return stats
+
+def main(argv=None):
+    """Run a real-time fleet simulation and print its statistics."""
+    parser = argparse.ArgumentParser(description="Vectorized fleet simulation")
+    parser.add_argument('--arms', type=int, default=10000, help="number of simulated arms")
+    parser.add_argument('--seconds', type=float, default=10.0, help="simulated (and wall) seconds")
+    parser.add_argument('--rate', type=float, default=100.0, help="ticks per second")
+    parser.add_argument('--command-rate', type=float, default=0.5, metavar='HZ',
+                        help="targets per arm per second")
+    parser.add_argument('--protocol', choices=('framed', 'legacy'), default='framed',
+                        help="wire protocol (bytes counted and angle rounding)")
+    parser.add_argument('--json', metavar='FILE', help="also write the statistics as JSON")
+    args = parser.parse_args(argv)
+
+    sim = FleetSimulation(args.arms, protocol=args.protocol)
+    loop = sim.run(args.seconds, args.rate, args.command_rate)
+    result = {'simulation': sim.stats(), 'loop': loop}
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import numpy as np
+
+from app import pack_angles
+from chain import ChainArm, chain_positions, project_chain
+from timing import servo1_angle, servo_position
+from workspace import FIRMWARE_LIMITS
+
+LENGTHS = [12.5, 14, 6]
+# Whole-degree truncation on the wire moves the tip by up to ~1 cm
+WIRE_TOLERANCE = 1.1
+
+def sample_targets(count, seed=0):
+    """End effector positions of random poses within the firmware limits."""
+    rng = np.random.default_rng(seed)
+    poses = np.column_stack((rng.uniform(0, np.pi, count),
+                             -rng.uniform(0, np.radians(135), count),
+                             rng.uniform(-np.pi / 2, np.pi / 2, count)))
+    return chain_positions(poses, np.array(LENGTHS))[:, -1]
+
+def wire_position(angles):
+    """Where the firmware puts the tip for angles sent with pack_angles."""
+    _, base, elbow, wrist = pack_angles(*angles)
+    pose = np.radians([servo_position(base), -servo1_angle(elbow), servo_position(wrist) - 90])
+    return chain_positions(pose, np.array(LENGTHS))[-1]
+
+def test_project_chain_keeps_elbow_up_and_in_limits():
+    q = project_chain(np.array([[-0.1, 0.4, 2.0], [np.pi + 0.3, -3.0, -2.0]]), FIRMWARE_LIMITS)
+    np.testing.assert_allclose(q[0], [0, 0, np.pi / 2])
+    np.testing.assert_allclose(q[1], [np.pi, -np.radians(135), -np.pi / 2])
+
+def test_reachable_targets_round_trip_through_pack_angles():
+    arm = ChainArm(LENGTHS, tcp_sender=object(), limits=FIRMWARE_LIMITS)
+    targets = sample_targets(200)
+    solved = 0
+    for y, z in targets:
+        *angles, reachable = arm.inverse_kinematics(y, z)
+        arm.set_angles(*angles)
+        if reachable:
+            solved += 1
+            assert np.hypot(*(wire_position(angles) - (abs(y), abs(z)))) <= WIRE_TOLERANCE
+    # Every target came from a pose the firmware can run
+    feasible = np.sum((targets >= 0).all(axis=1))
+    assert solved >= 0.9 * feasible
+
+def test_batch_matches_the_wire():
+    arm = ChainArm(LENGTHS, tcp_sender=object(), limits=FIRMWARE_LIMITS)
+    targets = sample_targets(200, seed=1)
+    *angles, reachable = arm.inverse_kinematics_batch(targets[:, 0], targets[:, 1])
+    assert reachable.mean() > 0.9
+    for pose, (y, z), ok in zip(np.stack(angles, axis=-1), targets, reachable):
+        if ok:
+            assert np.hypot(*(wire_position(pose) - (abs(y), abs(z)))) <= WIRE_TOLERANCE
+
+def test_target_outside_the_limits_is_unreachable():
+    arm = ChainArm(LENGTHS, tcp_sender=object(), limits=FIRMWARE_LIMITS)
+    # Folded back past the 135 degree elbow limit, close to the base
+    *_, reachable = arm.inverse_kinematics(0.5, 0.5)
+    assert not reachable
+
+def test_differential_ik_moves_every_joint():
+    arm = ChainArm(LENGTHS, tcp_sender=object(), limits=FIRMWARE_LIMITS)
+    start = np.array([1.0, -1.0, 0.3])
+    arm.set_angles(*start)
+    target = chain_positions(start + [0.1, -0.1, 0.2], np.array(LENGTHS))[-1]
+    *angles, error = arm.differential_ik(*target)
+    assert len(angles) == 3
+    assert np.all(np.abs(np.array(angles) - start) > 1e-4)
+    assert np.hypot(*(chain_positions(np.array(angles), np.array(LENGTHS))[-1] - target)) < error
+    # The batch form takes the same step
+    *batch, errors = arm.differential_ik_batch(*start, *target)
+    np.testing.assert_allclose(batch, angles)
+    np.testing.assert_allclose(errors, error)
+    assert arm.jacobian().shape == (2, 3)
+    assert len(arm.joint_velocities(1.0, 0.0)) == 3
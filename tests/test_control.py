@@ -0,0 +1,113 @@
+import multiprocessing
+
+import numpy as np
+
+from control import ControlLoop, SharedArmState
+
+JOINTS = 3
+WRITES = 20000
+# Dyadic period and durations keep the fake clock's arithmetic exact
+RATE = 64
+PERIOD = 1.0 / RATE
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def write_status(name, writes):
+    """Writer process: every field of record i holds i."""
+    state = SharedArmState(JOINTS, name)
+    try:
+        for i in range(1, writes + 1):
+            state.status.write(time=i, ticks=i, request_id=i, angles=[i] * JOINTS,
+                               target_angles=[-i] * JOINTS)
+    finally:
+        state.close()
+
+def test_write_then_read():
+    state = SharedArmState(JOINTS)
+    try:
+        state.status.write(ticks=3, angles=[0.1, 0.2, 0.3], connected=True)
+        state.status.write(ticks=4)
+        snapshot = state.status.read()
+        assert snapshot['seq'] == 4 and snapshot['ticks'] == 4 and snapshot['connected']
+        # Fields not written keep their last value
+        np.testing.assert_array_equal(snapshot['angles'], [0.1, 0.2, 0.3])
+        # Attaching by name sees the same record
+        other = SharedArmState(JOINTS, state.name)
+        assert other.status.read()['ticks'] == 4
+        other.close()
+    finally:
+        state.close()
+
+def test_read_gives_up_during_a_write():
+    state = SharedArmState(JOINTS)
+    try:
+        # An odd sequence number: the writer is mid-copy
+        state.request.seq[...] = 1
+        assert state.request.read(retries=10) is None
+    finally:
+        state.close()
+
+def test_snapshots_are_consistent_across_processes():
+    state = SharedArmState(JOINTS)
+    try:
+        process = multiprocessing.get_context('spawn').Process(target=write_status,
+                                                                args=(state.name, WRITES))
+        process.start()
+        seen = set()
+        last = 0
+        while process.is_alive() or last < WRITES:
+            snapshot = state.status.read()
+            if snapshot is None:
+                continue
+            i = int(snapshot['ticks'])
+            # Never a mix of two writes, and never older than one already seen
+            assert snapshot['time'] == snapshot['request_id'] == i >= last
+            assert (snapshot['angles'] == i).all() and (snapshot['target_angles'] == -i).all()
+            assert snapshot['seq'] == 2 * i
+            last = i
+            seen.add(i)
+            if not process.is_alive() and process.exitcode:
+                break
+        process.join()
+        assert process.exitcode == 0 and last == WRITES and len(seen) > 1
+    finally:
+        state.close()
+
+def run_loop(policy, stall, max_catch_up=10, ticks=8):
+    """Run a loop whose third tick takes stall periods; return the step times."""
+    clock = FakeClock()
+    loop = ControlLoop(RATE, policy, max_catch_up, spin=0.0, clock=clock, sleep=clock.sleep)
+    times = []
+
+    def step(t):
+        times.append(t)
+        if len(times) == 3:
+            clock.now += stall * PERIOD
+    loop.run(step, ticks=ticks, start=0.0)
+    return loop, [round(t / PERIOD) for t in times]
+
+def test_control_loop_runs_on_its_deadlines():
+    loop, ticks = run_loop('skip', stall=0.5)
+    assert ticks == list(range(8))
+    assert loop.overruns == loop.skipped == 0 and max(loop.jitter) == 0
+
+def test_skip_drops_the_ticks_missed_during_an_overrun():
+    loop, ticks = run_loop('skip', stall=3.5)
+    # Tick 2 ends at 5.5 periods: 3, 4 and 5 are due, only 5 runs
+    assert ticks == [0, 1, 2, 5, 6, 7, 8, 9]
+    assert loop.overruns == 1 and loop.skipped == 2
+
+def test_catch_up_runs_missed_ticks_back_to_back():
+    loop, ticks = run_loop('catch-up', stall=3.5)
+    assert ticks == list(range(8)) and loop.skipped == 0
+    # Up to max_catch_up of them
+    loop, ticks = run_loop('catch-up', stall=3.5, max_catch_up=2)
+    assert ticks == [0, 1, 2, 4, 5, 6, 7, 8] and loop.skipped == 1
@@ -0,0 +1,70 @@
+import socket
+import time
+
+import numpy as np
+import pytest
+
+from app import make_packer, pack_command, unpack_frame, wire_centidegrees
+from fleet import FleetTCPSender
+
+POSE = (0.5, 4.0)
+FRAME_SIZE = len(pack_command(make_packer('framed'), POSE)[0])
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def recv_pose(sock):
+    """Read one single-pose frame."""
+    data = b''
+    while len(data) < FRAME_SIZE:
+        chunk = sock.recv(FRAME_SIZE - len(data))
+        assert chunk, "connection closed"
+        data += chunk
+    return unpack_frame(data)[3][0].tolist()
+
+@pytest.fixture
+def fleet():
+    fleet = FleetTCPSender(0, handshake_timeout=0.2)
+    fleet.start_server()
+    # Port 0 binds each address family to its own free port
+    fleet.port = next(sock.getsockname()[1] for sock in fleet.server.sockets
+                      if sock.family == socket.AF_INET)
+    yield fleet
+    fleet.cleanup()
+
+def connect(fleet, name=None, receive_buffer=None):
+    sock = socket.socket()
+    if receive_buffer:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+    sock.settimeout(2)
+    sock.connect(('127.0.0.1', fleet.port))
+    if name:
+        sock.sendall(name.encode() + b"\n")
+    return sock
+
+def test_arms_are_identified_by_handshake_or_address(fleet):
+    with connect(fleet, "arm-3") as named, connect(fleet) as anonymous:
+        wait_for(lambda: sorted(fleet.connected_arms()) == ["127.0.0.1", "arm-3"])
+        fleet.send_to("arm-3", *POSE)
+        assert recv_pose(named) == wire_centidegrees([POSE])[0].tolist()
+        fleet.send_to("127.0.0.1", *POSE[::-1])
+        assert recv_pose(anonymous) == wire_centidegrees([POSE[::-1]])[0].tolist()
+
+def test_a_stalled_arm_does_not_hold_up_the_others(fleet):
+    with connect(fleet, "slow", receive_buffer=4096) as slow, connect(fleet, "fast") as fast:
+        wait_for(lambda: sorted(fleet.connected_arms()) == ["fast", "slow"])
+        # The slow arm never reads: its writer blocks once the (small)
+        # socket buffers fill
+        server_side = fleet.links["slow"].writer.get_extra_info('socket')
+        server_side.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        fleet.send_batch_to("slow", np.zeros((50000, 2)))
+        wait_for(lambda: fleet.links["slow"].writer.transport.get_write_buffer_size() > 0)
+        for i in range(5):
+            pose = (0.1 * i, 4.0)
+            fleet.send_to("fast", *pose)
+            assert recv_pose(fast) == wire_centidegrees([pose])[0].tolist()
+        assert fleet.links["slow"].writer.transport.get_write_buffer_size() > 0
+        assert slow.recv(1)
@@ -0,0 +1,30 @@
+import io
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from app import RoboticArm, run_headless
+from transport import LoopbackSender
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_run_headless_sends_each_target():
+    sent = []
+    sender = LoopbackSender(on_angles=sent.append)
+    sender.start_server()
+    arm = RoboticArm(12.5, 14, tcp_sender=sender)
+    run_headless(arm, io.StringIO("# targets\n\n20 5\nnot a target\n40, 0\nquit\n10 10\n"))
+
+    expected = RoboticArm(12.5, 14, tcp_sender=object())
+    theta1, theta2, _ = expected.inverse_kinematics(20, 5)
+    assert len(sent) == 2
+    np.testing.assert_allclose(sent[0], (theta1, theta2))
+    # Out of reach: the nearest point on the workspace edge
+    assert not arm.reachable
+    np.testing.assert_allclose(sent[1], expected.inverse_kinematics(40, 0)[:2])
+
+def test_importing_app_does_not_load_the_gui():
+    code = "import sys, app; sys.exit(any(m in sys.modules for m in ('tkinter', 'matplotlib')))"
+    assert subprocess.run([sys.executable, '-c', code], cwd=ROOT).returncode == 0
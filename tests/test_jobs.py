@@ -0,0 +1,45 @@
+import numpy as np
+
+from app import RoboticArm, make_packer, pack_command
+from emulator import ESP32Emulator
+from jobs import BulkJob
+from scheduler import MotionScheduler
+from timing import move_times
+from transport import LoopbackSender, make_sender
+
+TARGETS = np.array([[20.0, 5.0], [3.3, 18.7], [10.55, 10.45], [25.0, 1.0], [-8.0, 12.0]])
+
+def write_job(tmp_path):
+    path = tmp_path / "job.csv"
+    np.savetxt(path, TARGETS, delimiter=',', header="y,z")
+    return str(path)
+
+def queued(emulator):
+    return [list(angles) for angles, _ in emulator.commands]
+
+def test_wire_angles_match_what_the_firmware_runs(tmp_path):
+    path = write_job(tmp_path)
+    for sender in (make_sender('asyncio'), LoopbackSender(), MotionScheduler(make_sender('asyncio'))):
+        job = BulkJob(RoboticArm(12.5, 14, tcp_sender=sender), path)
+        (_, _, theta1s, theta2s, _), = job.chunks()
+        emulator = ESP32Emulator()
+        packer = make_packer('framed')
+        for pose in zip(theta1s, theta2s):
+            if sender.packer is None:
+                data, _ = pack_command(None, pose)
+                emulator.recv_command(np.frombuffer(data, dtype='<i4'), replace=False)
+            else:
+                emulator.recv_datagram(bytes(packer.pack([pose], replace=False)))
+        assert job.wire_angles(theta1s, theta2s).tolist() == queued(emulator)
+
+def test_run_paces_by_the_modelled_move_times(tmp_path):
+    sent = []
+    sender = LoopbackSender(on_angles=sent.append)
+    sender.start_server()
+    job = BulkJob(RoboticArm(12.5, 14, tcp_sender=sender), write_job(tmp_path), time_scale=10)
+    now = [0.0]
+    result = job.run(clock=lambda: now[0], sleep=lambda seconds: now.__setitem__(0, now[0] + seconds))
+    assert result['sent'] == len(sent) == len(TARGETS)
+    (_, _, theta1s, theta2s, _), = job.chunks()
+    expected = move_times(job.wire_angles(theta1s, theta2s)) / 10 + job.margin
+    assert result['modelled_s'] == result['seconds'] == np.sum(expected)
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from app import IKCache, RoboticArm, dls_step, dls_velocity, ik_2link, jacobian_2link
+from workspace import FIRMWARE_LIMITS
+
+def make_arm(limits=None):
+    return RoboticArm(12.5, 14, tcp_sender=object(), limits=limits)
+
+def test_ik_round_trips_through_fk():
+    arm = make_arm()
+    for y, z in [(20, 5), (3, 18), (10, 10), (25, 1)]:
+        theta1, theta2, reachable = arm.inverse_kinematics(y, z)
+        assert reachable
+        np.testing.assert_allclose(arm.forward_kinematics(theta1, theta2)[2], (y, z), atol=1e-9)
+
+def test_batch_matches_scalar_ik():
+    arm = make_arm(FIRMWARE_LIMITS)
+    rng = np.random.default_rng(0)
+    ys, zs = rng.uniform(-30, 30, (2, 50))
+    theta1s, theta2s, reachable = arm.inverse_kinematics_batch(ys, zs)
+    for y, z, theta1, theta2, ok in zip(ys, zs, theta1s, theta2s, reachable):
+        expected = make_arm(FIRMWARE_LIMITS).inverse_kinematics(y, z)
+        np.testing.assert_allclose((theta1, theta2), expected[:2], atol=1e-9)
+        assert ok == expected[2]
+
+def test_scalar_input_with_limits():
+    # Folded beyond the 135 degree elbow limit: projected in place
+    theta1, theta2, reachable = make_arm(FIRMWARE_LIMITS).inverse_kinematics_batch(5.0, 5.0)
+    assert np.shape(theta1) == np.shape(theta2) == np.shape(reachable) == ()
+    assert not reachable
+    assert FIRMWARE_LIMITS.contains(theta1, theta2)
+
+def test_output_keeps_the_input_shape():
+    theta1s, theta2s, reachable = ik_2link(np.full((3, 4), 5.0), 5.0, 12.5, 14, FIRMWARE_LIMITS)
+    assert theta1s.shape == theta2s.shape == reachable.shape == (3, 4)
+
+def make_cache(arm, directory, **kwargs):
+    return IKCache(arm, cache_dir=str(directory), grid_step=0.5, tolerance=1e-2, **kwargs)
+
+def test_ik_cache_grid_stays_within_its_error_bound(tmp_path):
+    arm = make_arm(FIRMWARE_LIMITS)
+    cache = make_cache(arm, tmp_path)
+    assert 0 < cache.max_error <= cache.tolerance
+    rng = np.random.default_rng(0)
+    for y, z in rng.uniform(0, 26, (2000, 2)):
+        theta1, theta2, reachable = cache.lookup(y, z)
+        expected = arm._solve_ik(y, z)
+        assert max(abs(theta1 - expected[0]), abs(theta2 - expected[1])) <= cache.max_error
+    assert cache.grid_hits > 1000
+
+def test_ik_cache_lru_evicts_the_oldest_target(tmp_path):
+    arm = make_arm()
+    arm.ik_cache = make_cache(arm, tmp_path, max_entries=2)
+    # Beyond the reach, so never on the grid
+    for y in (30.0, 31.0, 30.0, 32.0, 31.0):
+        arm.inverse_kinematics(y, 1.0)
+    assert (arm.ik_cache.misses, arm.ik_cache.lru_hits) == (4, 1)
+    assert list(arm.ik_cache.memo) == [(32000, 1000), (31000, 1000)]
+    assert not arm.reachable
+
+def test_ik_cache_grid_is_saved_and_reloaded(tmp_path, monkeypatch):
+    first = make_cache(make_arm(FIRMWARE_LIMITS), tmp_path)
+    monkeypatch.setattr(IKCache, 'build_grid', lambda self: pytest.fail("grid rebuilt"))
+    second = make_cache(make_arm(FIRMWARE_LIMITS), tmp_path)
+    np.testing.assert_array_equal(second.theta1_grid, first.theta1_grid)
+    assert second.max_error == first.max_error
+
+def test_dls_is_the_exact_inverse_away_from_singularities():
+    theta1, theta2 = np.meshgrid(np.linspace(0, np.pi, 7), np.linspace(-2.5, -0.5, 5))
+    w1, w2 = dls_velocity(theta1, theta2, 1.0, -2.0, 12.5, 14)
+    velocity = jacobian_2link(theta1, theta2, 12.5, 14) @ np.stack((w1, w2), axis=-1)[..., None]
+    np.testing.assert_allclose(velocity[..., 0], np.broadcast_to([1.0, -2.0], theta1.shape + (2,)))
+
+def test_dls_steps_stay_bounded_at_singularities():
+    damping, max_error = 0.5, 2.0
+    # Straight and fully folded, exactly and nearly
+    theta2 = np.array([0.0, -1e-9, -np.pi, -np.pi + 1e-9])
+    for y, z in [(30.0, 2.0), (1.0, 0.5), (10.0, 10.0)]:
+        theta1s, theta2s, _ = dls_step(0.3, theta2, y, z, 12.5, 14, damping, max_error=max_error)
+        steps = np.hypot(theta1s - 0.3, theta2s - theta2)
+        # The damped gain sigma / (sigma^2 + lambda^2) is at most 1 / (2 lambda)
+        assert np.isfinite(steps).all() and (steps <= max_error / (2 * damping) + 1e-9).all()
+        assert (np.sin(theta2s) <= 1e-12).all()
+
+def test_dls_tracks_targets_beyond_and_near_the_workspace_edges():
+    # Beyond reach: the arm straightens towards the target
+    theta1, theta2 = 0.3, -0.5
+    for _ in range(100):
+        theta1, theta2, error = dls_step(theta1, theta2, 30.0, 30.0, 12.5, 14)
+    assert theta1 == pytest.approx(np.pi / 4) and theta2 == 0.0
+    assert error == pytest.approx(np.hypot(30.0, 30.0) - 26.5)
+    # From nearly straight and nearly folded to reachable targets
+    for start, target in [((0.0, -1e-3), (20.0, 5.0)), ((1.0, -np.pi + 1e-4), (3.0, 1.0))]:
+        theta1, theta2 = start
+        for _ in range(100):
+            theta1, theta2, error = dls_step(theta1, theta2, *target, 12.5, 14)
+        assert error < 1e-9
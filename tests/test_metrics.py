@@ -0,0 +1,53 @@
+import logging
+
+import numpy as np
+import pytest
+
+import metrics
+from metrics import Histogram, SampleFilter
+
+@pytest.fixture
+def recording():
+    metrics.enable()
+    yield
+    metrics.disable()
+
+def test_histogram_ignores_values_while_disabled():
+    histogram = Histogram('test_seconds', "test")
+    histogram.observe(0.1)
+    assert histogram.count == 0 and histogram.percentile(50) == 0.0
+
+def test_histogram_percentiles_stay_within_a_bucket(recording):
+    histogram = Histogram('test_seconds', "test")
+    values = np.random.default_rng(0).lognormal(np.log(2e-3), 1.0, 5000)
+    for value in values:
+        histogram.observe(value)
+    for q in (50, 95, 99):
+        # Log buckets double, so an estimate is within a factor of two
+        ratio = histogram.percentile(q) / np.percentile(values, q)
+        assert 0.5 < ratio < 2.0
+    assert histogram.percentile(100) == histogram.max == values.max()
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 5000
+    assert snapshot['mean_ms'] == pytest.approx(values.mean() * 1000.0)
+
+def test_histogram_renders_cumulative_buckets(recording):
+    histogram = Histogram('test_seconds', "test", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value)
+    lines = histogram.render()
+    assert 'test_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{le="1"} 3' in lines
+    assert 'test_seconds_bucket{le="+Inf"} 4' in lines
+    assert 'test_seconds_count 4' in lines
+
+def make_record(level, lineno):
+    return logging.LogRecord('robotic_arm.commands', level, 'app.py', lineno, "sent", None, None)
+
+def test_sample_filter_samples_each_call_site():
+    sampler = SampleFilter(every=3)
+    passed = [sampler.filter(make_record(logging.INFO, 10)) for _ in range(7)]
+    assert passed == [True, False, False, True, False, False, True]
+    # Another call site has its own count, and warnings always pass
+    assert sampler.filter(make_record(logging.INFO, 20))
+    assert all(sampler.filter(make_record(logging.WARNING, 10)) for _ in range(3))
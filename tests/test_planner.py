@@ -0,0 +1,48 @@
+import numpy as np
+
+from app import RoboticArm
+from planner import CartesianPlanner
+
+def make_planner(**kwargs):
+    return CartesianPlanner(RoboticArm(12.5, 14, tcp_sender=object()), **kwargs)
+
+def path_speeds(times):
+    """Per-node path speeds (segments/s) implied by the node times."""
+    dt = np.diff(times)
+    u = np.zeros(len(times))
+    for k, step in enumerate(dt):
+        u[k + 1] = 2.0 / step - u[k] if step > 0 else u[k]
+    return u
+
+def test_joint_speeds_and_accelerations_stay_within_the_limits():
+    velocity, acceleration = np.radians([60.0, 90.0]), np.radians([300.0, 500.0])
+    planner = make_planner(max_velocity=velocity, max_acceleration=acceleration)
+    q = planner.joint_path(planner.path([(20.0, 5.0), (5.0, 20.0)]))
+    times = planner.time_parameterize(q)
+    u = path_speeds(times)
+    dq = np.abs(np.diff(q, axis=0))
+    dt = np.diff(times)
+
+    assert u[0] == 0 and abs(u[-1]) < 1e-6
+    peak = dq * np.maximum(u[:-1], u[1:])[:, None]
+    assert (peak <= velocity * (1 + 1e-9)).all()
+    accel = dq * (np.abs(np.diff(u)) / dt)[:, None]
+    assert (accel <= acceleration * (1 + 1e-6)).all()
+    # Time-optimal: some joint runs at its limit
+    assert np.isclose(peak.max(axis=0) / velocity, 1).any()
+    assert np.isclose(accel.max(axis=0) / acceleration, 1).any()
+
+def test_trajectory_follows_the_straight_line():
+    planner = make_planner()
+    arm = planner.arm
+    trajectory = planner.plan([(20.0, 5.0), (5.0, 20.0)])
+    assert trajectory[0, 0] == 0 and np.all(np.diff(trajectory[:, 0]) > 0)
+    ends = np.array([arm.forward_kinematics(theta1, theta2)[2] for _, theta1, theta2 in trajectory])
+    np.testing.assert_allclose(ends[[0, -1]], [(20.0, 5.0), (5.0, 20.0)], atol=1e-9)
+    # Distance from the line y + z = 25
+    assert np.abs(ends.sum(axis=1) - 25.0).max() / np.sqrt(2) < 0.01
+
+def test_slower_servos_take_longer():
+    fast = make_planner().plan([(20.0, 5.0), (5.0, 20.0)])[-1, 0]
+    slow = make_planner(max_velocity=np.radians(50.0), max_acceleration=np.radians(250.0))
+    assert slow.plan([(20.0, 5.0), (5.0, 20.0)])[-1, 0] > 1.9 * fast
@@ -0,0 +1,65 @@
+import math
+
+import numpy as np
+import pytest
+
+from app import RoboticArm
+from chain import ChainArm
+from recorder import (RECORD_V1, SEGMENT_HEADER, SEGMENT_MAGIC, SessionRecorder, main,
+                      read_session, replay)
+from transport import LoopbackSender
+
+def record_session(directory, commands):
+    recorder = SessionRecorder(str(directory), segment_records=2)
+    for i, (y, z, angles) in enumerate(commands):
+        recorder.record(y, z, angles, client="arm-1", timestamp=100.0 + i)
+    recorder.close()
+
+def test_three_joint_records_round_trip(tmp_path):
+    commands = [(20.0, 5.0, (0.5, -0.8, 0.3)), (float('nan'), float('nan'), (1.0, -0.2, -0.4)),
+                (15.0, 10.0, (0.1, -1.2, 0.0))]
+    record_session(tmp_path, commands)
+    records = list(read_session(str(tmp_path)))
+    assert [record.angles for record in records] == [angles for _, _, angles in commands]
+    assert records[0].theta2 == -0.8
+    assert math.isnan(records[1].y) and records[2].client == "arm-1"
+
+def test_replay_sends_every_joint(tmp_path):
+    lengths = [12.5, 14, 6]
+    arm = ChainArm(lengths, tcp_sender=object())
+    *angles, _ = arm.inverse_kinematics(15.0, 12.0)
+    record_session(tmp_path, [(15.0, 12.0, angles), (float('nan'), float('nan'), (1.0, -0.2, -0.4))])
+
+    sent = []
+    sender = LoopbackSender(on_angles=sent.append)
+    sender.start_server()
+    replay(read_session(str(tmp_path)), sender, speed=0)
+    np.testing.assert_allclose(sent, [angles, (1.0, -0.2, -0.4)])
+
+    sent.clear()
+    replay(read_session(str(tmp_path)), ChainArm(lengths, tcp_sender=sender), speed=0)
+    assert [len(angles) for angles in sent] == [3, 3]
+    np.testing.assert_allclose(sent[1], (1.0, -0.2, -0.4))
+
+def test_replay_refuses_a_different_joint_count(tmp_path):
+    record_session(tmp_path, [(float('nan'), float('nan'), (1.0, -0.2, -0.4))])
+    with pytest.raises(ValueError):
+        replay(read_session(str(tmp_path)), RoboticArm(12.5, 14, tcp_sender=LoopbackSender()), speed=0)
+
+def test_reads_version_1_segments(tmp_path):
+    with open(tmp_path / "session-000000.armlog", 'wb') as f:
+        f.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, 1, RECORD_V1.size, 1))
+        f.write(RECORD_V1.pack(1.0, 20.0, 5.0, 0.5, 4.5, True, b"a"))
+    (record,) = read_session(str(tmp_path))
+    assert record.angles == (0.5, 4.5) and record.client == "a" and record.reachable
+
+def test_replay_command_keeps_fleet_clients_apart(tmp_path, capsys):
+    recorder = SessionRecorder(str(tmp_path))
+    for i, client in enumerate(["arm-1", "arm-2", "arm-2"]):
+        recorder.record(15.0, 12.0, (0.5, -0.8, 0.3), client=client, timestamp=100.0 + i)
+    recorder.close()
+    replay_args = ['replay', str(tmp_path), '--transport', 'loopback', '--speed', '0']
+    with pytest.raises(SystemExit):
+        main(replay_args)
+    main(replay_args + ['--client', 'arm-2', '--resolve', '--links', '12.5,14,6', '--no-limits'])
+    assert "'records': 2" in capsys.readouterr().out
@@ -0,0 +1,112 @@
+import asyncio
+import selectors
+
+import numpy as np
+import pytest
+
+from app import pack_angles
+from emulator import ESP32Emulator, EmulatorClock
+from scheduler import (MotionScheduler, command_timing, firmware_degrees, firmware_degrees_batch,
+                       servo_targets)
+from timing import IDLE_POLL_MS, move_times
+from transport import LoopbackSender
+
+SPEED = 10.0
+# Host seconds: the first command's poll phase is unknown (half a poll)
+TOLERANCE = IDLE_POLL_MS / 1000 / SPEED / 2 + 1e-4
+
+class VirtualSelector(selectors.DefaultSelector):
+    def __init__(self, loop):
+        super().__init__()
+        self.loop = loop
+
+    def select(self, timeout=None):
+        # Nothing to wait for in between: jump to the next timer
+        if timeout:
+            self.loop.now += timeout
+        return super().select(0)
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Event loop on a fake clock, so timing is exact and reproducible."""
+
+    def __init__(self):
+        self.now = 0.0
+        super().__init__(VirtualSelector(self))
+
+    def time(self):
+        return self.now
+
+def test_batch_degrees_match_single_poses():
+    rng = np.random.default_rng(0)
+    commands = rng.uniform(-2 * np.pi, 2 * np.pi, (200, 3))
+    for legacy in (False, True):
+        expected = [firmware_degrees(angles, legacy) for angles in commands]
+        assert firmware_degrees_batch(commands, legacy).tolist() == expected
+
+def test_command_timing_matches_the_emulator():
+    commands = [(30, 100), (120, 250), (120, 250), (0, 10)]
+    last = None
+    for command, expected in zip(commands, move_times(commands)):
+        targets = servo_targets(command)
+        _, busy = command_timing(targets, last)
+        assert busy == pytest.approx(expected)
+        last = targets
+
+def test_commands_that_may_have_started_are_not_replaced():
+    now = [0.0]
+    scheduler = MotionScheduler(LoopbackSender(), clock=lambda: now[0])
+    scheduler.send_batch(np.radians([(30, 100), (60, 90), (90, 80)]))
+    first = scheduler.timeline[0]
+    # Predicted to start in 20 ms: the arm may already be running it
+    now[0] = first.start - 0.02
+    scheduler.send_batch(np.radians([(120, 70)]), replace=True)
+    assert scheduler.commands_dropped == 2
+    assert [planned.start for planned in scheduler.timeline] == [first.start, first.free]
+
+def test_predictions_match_the_emulator():
+    loop = VirtualTimeLoop()
+    emulator = ESP32Emulator(clock=EmulatorClock(SPEED, clock=loop.time), record_steps=False)
+    emulator.running = True
+
+    def deliver(angles):
+        emulator.recv_command(pack_angles(*angles)[1:])
+
+    sender = LoopbackSender(on_angles=deliver)
+    sender.start_server()
+    # Driven by poll below instead of its pacing thread
+    scheduler = MotionScheduler(sender, time_scale=SPEED, latency=0, clock=loop.time)
+    rng = np.random.default_rng(0)
+    predicted = {}
+
+    async def drive():
+        servo_task = asyncio.ensure_future(emulator.servo_control_task())
+        for i in range(30):
+            # A distinct servo 0 angle per target identifies its move
+            theta1 = 10 + i
+            scheduler.send_angles(np.radians(theta1 + 0.2), np.radians(rng.integers(40, 130) + 0.2))
+            predicted[theta1] = loop.time() + scheduler.estimated_time_to_pose()
+            pause_end = loop.time() + rng.uniform(0, 0.06)
+            while loop.time() < pause_end:
+                await asyncio.sleep(min(scheduler.poll() or np.inf, pause_end - loop.time()))
+        while scheduler.pending is not None:
+            await asyncio.sleep(scheduler.poll() or 0)
+        await asyncio.sleep(scheduler.estimated_time_to_pose() + 0.01)
+        emulator.stop()
+        await servo_task
+
+    try:
+        loop.run_until_complete(drive())
+    finally:
+        loop.close()
+
+    errors = []
+    started = None
+    for entry in emulator.timeline:
+        if entry['kind'] == 'move_start':
+            started = entry['angles'][0]
+        elif entry['kind'] == 'reached' and started in predicted:
+            errors.append(emulator.clock.start + entry['t'] / SPEED - predicted[started])
+    assert started == 39 and len(errors) > 2
+    assert np.abs(errors).max() <= TOLERANCE
+    # Requests faster than the arm moves merge on the host
+    assert scheduler.commands_coalesced > 0
@@ -0,0 +1,23 @@
+import numpy as np
+
+from app import ik_2link
+from scheduler import firmware_degrees
+from simulation import FleetSimulation
+from timing import servo1_angle, servo_position
+
+def test_arms_reach_the_degrees_the_firmware_runs():
+    rng = np.random.default_rng(0)
+    ys, zs = rng.uniform(0, 25, (2, 50))
+    poses = {}
+    for protocol in ('framed', 'legacy'):
+        sim = FleetSimulation(len(ys), protocol=protocol)
+        sim.set_targets(ys, zs)
+        sim.advance_to(60000)
+        theta1s, theta2s, _ = ik_2link(ys, zs, 12.5, 14, sim.limits)
+        expected = [firmware_degrees(angles, protocol == 'legacy') for angles in zip(theta1s, theta2s)]
+        np.testing.assert_array_equal(sim.pose, [(servo_position(a0), servo_position(servo1_angle(a1)))
+                                                 for a0, a1 in expected])
+        assert sim.commands_executed == len(ys)
+        poses[protocol] = sim.pose
+    # Frames round where legacy commands truncate
+    assert (poses['framed'] != poses['legacy']).any()
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import re
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app import (FRAME_FLAG_REPLACE, STREAM_FLAG_NEW, STREAM_HEADER, STREAM_MAGIC,
+                 STREAM_WAYPOINT, AsyncTCPSender, make_packer, pack_command, pack_waypoints,
+                 unpack_frame, wire_centidegrees)
+from emulator import ESP32Emulator
+from scheduler import firmware_degrees
+from transport import LoopbackSender, make_sender
+
+FIRMWARE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'firmware', 'main.c')
+C_TYPES = {'uint32_t': 'I', 'uint16_t': 'H', 'int16_t': 'h', 'int32_t': 'i', 'uint8_t': 'B'}
+
+POSES = [(0.3, 4.5, 0.2), (1.2, -0.7, -1.1), (2.9, 5.9, 1.4), (0.0, 0.0, 0.0)]
+
+def queued(emulator):
+    return [list(angles) for angles, _ in emulator.commands]
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def recv_poses(sock, count, joints=2):
+    """Read count single-pose frames, then check nothing else arrives."""
+    size = len(pack_command(make_packer('framed'), (0.0,) * joints)[0])
+    data = b''
+    while len(data) < count * size:
+        chunk = sock.recv(count * size - len(data))
+        assert chunk, "connection closed"
+        data += chunk
+    sock.settimeout(0.1)
+    with pytest.raises(socket.timeout):
+        sock.recv(1)
+    sock.settimeout(2)
+    return [unpack_frame(data, i * size)[3][0].tolist() for i in range(count)]
+
+@pytest.fixture
+def async_sender():
+    sender = AsyncTCPSender(0)
+    sender.start_server()
+    # Port 0 binds each address family to its own free port
+    sender.port = next(sock.getsockname()[1] for sock in sender.server.sockets
+                       if sock.family == socket.AF_INET)
+    yield sender
+    sender.cleanup()
+
+def connect(sender):
+    sock = socket.create_connection(('127.0.0.1', sender.port), timeout=2)
+    # Served once the sender's current writer is this connection
+    wait_for(lambda: sender.writer is not None
+             and sender.writer.get_extra_info('peername') == sock.getsockname())
+    return sock
+
+def test_legacy_packing_matches_the_firmware():
+    emulator = ESP32Emulator(joints=3)
+    for pose in POSES:
+        data, degrees = pack_command(None, pose)
+        emulator.recv_command(np.frombuffer(bytes(data), dtype='<i4'), replace=False)
+        assert list(degrees) == firmware_degrees(pose, legacy=True)
+    assert queued(emulator) == [firmware_degrees(pose, legacy=True) for pose in POSES]
+
+def test_frames_match_the_firmware():
+    emulator = ESP32Emulator(joints=3)
+    packer = make_packer('framed')
+    emulator.recv_datagram(bytes(packer.pack(POSES, replace=True)))
+    assert queued(emulator) == [firmware_degrees(pose) for pose in POSES]
+    # A single pose replaces the queue, like the firmware's xQueueReset
+    emulator.recv_datagram(bytes(pack_command(packer, POSES[0])[0]))
+    assert queued(emulator) == [firmware_degrees(POSES[0])]
+    assert emulator.commands_overwritten == len(POSES) and emulator.frames_skipped == 0
+
+def test_unpack_frame_round_trip():
+    packer = make_packer('framed')
+    packer.sequence = 7
+    frame = bytes(packer.pack(POSES[:2], replace=True))
+    flags, sequence, _, cdeg, end = unpack_frame(frame)
+    assert flags & FRAME_FLAG_REPLACE and sequence == 7 and end == len(frame)
+    np.testing.assert_array_equal(cdeg, wire_centidegrees(POSES[:2]))
+
+def test_udp_drops_stale_datagrams():
+    emulator = ESP32Emulator(joints=3, transport='udp')
+    packer = make_packer('framed')
+    old = bytes(pack_command(packer, POSES[0])[0])
+    new = bytes(pack_command(packer, POSES[1])[0])
+    emulator.recv_datagram(new)
+    emulator.recv_datagram(old)
+    assert queued(emulator) == [firmware_degrees(POSES[1])]
+    assert emulator.frames_stale == 1
+
+def test_replace_flag():
+    packer = make_packer('framed')
+    assert bytes(packer.pack(POSES[:1], replace=True))[7] & FRAME_FLAG_REPLACE
+    assert not bytes(packer.pack(POSES[:1], replace=False))[7] & FRAME_FLAG_REPLACE
+
+def test_loopback_delivers_the_callers_angles():
+    sent, batches = [], []
+    sender = make_sender('loopback')
+    assert isinstance(sender, LoopbackSender)
+    sender.on_angles = sent.append
+    sender.on_batch = lambda commands, replace: batches.append((commands, replace))
+    sender.send_angles(*POSES[0])
+    assert sent == []
+    sender.start_server()
+    sender.send_angles(*POSES[0])
+    sender.send_batch(POSES, replace=True)
+    assert sent == [POSES[0]] and batches == [(POSES, True)]
+    assert sender.last_angles == POSES[-1]
+
+def test_async_sender_sends_only_the_latest_pose(async_sender):
+    # Before the arm connects, and while the loop is busy
+    async_sender.send_angles(*POSES[0][:2])
+    async_sender.send_angles(*POSES[1][:2])
+    with connect(async_sender) as sock:
+        assert recv_poses(sock, 1) == wire_centidegrees([POSES[1][:2]]).tolist()
+        busy = threading.Event()
+        async_sender.loop.call_soon_threadsafe(busy.wait, 2)
+        for pose in POSES:
+            async_sender.send_angles(*pose[:2])
+        busy.set()
+        assert recv_poses(sock, 1) == wire_centidegrees([POSES[-1][:2]]).tolist()
+
+def test_reconnecting_arm_gets_the_latest_pose(async_sender):
+    with connect(async_sender) as first:
+        async_sender.send_angles(*POSES[0][:2])
+        assert recv_poses(first, 1) == wire_centidegrees([POSES[0][:2]]).tolist()
+        # A new connection replaces the old one and is brought up to date
+        with connect(async_sender) as second:
+            assert first.recv(1) == b''
+            assert recv_poses(second, 1) == wire_centidegrees([POSES[0][:2]]).tolist()
+            async_sender.send_angles(*POSES[1][:2])
+            assert recv_poses(second, 1) == wire_centidegrees([POSES[1][:2]]).tolist()
+
+def firmware_struct(source, name):
+    """struct format of a packed typedef struct in the firmware source."""
+    body = re.search(r"typedef struct __attribute__\(\(packed\)\) \{([^{}]*)\} %s;" % name,
+                     source).group(1)
+    fields = re.findall(r"(\w+)\s+\w+(?:\[(\d+)\])?;", body)
+    return '<' + ''.join(C_TYPES[kind] * int(length or 1) for kind, length in fields)
+
+def feed_waypoints(emulator, frame):
+    async def feed():
+        reader = asyncio.StreamReader()
+        # The emulator's connection loop has already read the magic
+        reader.feed_data(frame[4:])
+        reader.feed_eof()
+        await emulator.recv_waypoints(reader)
+    asyncio.run(feed())
+
+def test_waypoint_frames_match_the_firmware_structs():
+    with open(FIRMWARE) as f:
+        source = f.read()
+    assert firmware_struct(source, 'stream_header_t') == STREAM_HEADER.format
+    assert firmware_struct(source, 'waypoint_t') == STREAM_WAYPOINT.format
+    magic = re.search(r"#define STREAM_MAGIC\s+(0x[0-9A-Fa-f]+)", source).group(1)
+    assert int(magic, 16) == STREAM_MAGIC
+
+    frame = pack_waypoints([(0.0, 0.5, -1.0), (0.02, -0.1, 7.0)], new_stream=True)
+    emulator = ESP32Emulator()
+    feed_waypoints(emulator, frame)
+    # theta1 clamped into the servo range, |theta2| wrapped to one turn
+    assert list(emulator.stream) == [(0, 2865, 5730, True), (20, 0, 4107, False)]
+
+def test_empty_waypoint_batches_are_ignored():
+    with pytest.raises(ValueError):
+        pack_waypoints([])
+
+    emulator = ESP32Emulator()
+    emulator.stream.append((0, 9000, 4500, True))
+    feed_waypoints(emulator, STREAM_HEADER.pack(STREAM_MAGIC, 0, STREAM_FLAG_NEW))
+    assert list(emulator.stream) == [(0, 9000, 4500, True)]
@@ -0,0 +1,110 @@
+import matplotlib
+import numpy as np
+import pytest
+
+from app import ArmVisualizer, RoboticArm, sample_move
+from transport import LoopbackSender
+
+matplotlib.use('Agg')
+
+@pytest.fixture
+def sent():
+    return []
+
+@pytest.fixture
+def visualizer(sent):
+    import matplotlib.pyplot as plt
+
+    sender = LoopbackSender(on_angles=sent.append)
+    sender.start_server()
+    visualizer = ArmVisualizer(RoboticArm(12.5, 14, tcp_sender=sender))
+    yield visualizer
+    plt.close(visualizer.fig)
+
+def test_sample_move_starts_with_the_given_velocity_and_ends_at_rest():
+    start, velocity, target = np.array([0.5, -1.0]), np.array([2.0, -1.0]), np.array([1.5, -0.5])
+    angles, velocities = sample_move(start, velocity, target, 0.6, 0.0)
+    np.testing.assert_allclose(angles, start)
+    np.testing.assert_allclose(velocities, velocity)
+    angles, velocities = sample_move(start, velocity, target, 0.6, 0.6)
+    np.testing.assert_allclose(angles, target)
+    np.testing.assert_allclose(velocities, 0, atol=1e-12)
+
+def test_retargeting_keeps_the_pose_and_velocity(visualizer, sent):
+    visualizer.animate_to_target(20.0, 5.0, now=0.0)
+    before = visualizer.sample_animation(0.3)
+    visualizer.animate_to_target(5.0, 20.0, now=0.3)
+    after = visualizer.sample_animation(0.3)
+    np.testing.assert_allclose(after[0], before[0])
+    np.testing.assert_allclose(after[1], before[1])
+    assert np.abs(before[1]).max() > 1.0
+
+    # Only the final target is sent, once the last move ends
+    assert visualizer.advance_animation(0.5) and sent == []
+    assert not visualizer.advance_animation(1.0)
+    theta1, theta2, _ = RoboticArm(12.5, 14, tcp_sender=object()).inverse_kinematics(5.0, 20.0)
+    np.testing.assert_allclose(sent, [(theta1, theta2)])
+
+def test_unchanged_frames_are_skipped(sent):
+    import matplotlib.pyplot as plt
+
+    sender = LoopbackSender(on_angles=sent.append)
+    visualizer = ArmVisualizer(RoboticArm(12.5, 14, tcp_sender=sender), blit=True)
+    canvas = visualizer.fig.canvas
+    draws, blits = [], []
+    canvas.mpl_connect('draw_event', draws.append)
+    canvas.blit = lambda bbox=None: blits.append(bbox)
+    try:
+        visualizer.update_plot()
+        # The first frame is a full draw that caches the background
+        assert len(draws) == 1 and visualizer.background is not None
+        visualizer.update_plot()
+        assert visualizer.frames_skipped == 1 and len(draws) == 1 and blits == []
+
+        visualizer.arm.set_angles(1.0, -0.5)
+        visualizer.update_plot()
+        assert len(draws) == 1 and len(blits) == 1
+        assert visualizer.frames_skipped == 1
+
+        # Connecting changes the status text
+        sender.start_server()
+        visualizer.update_plot()
+        assert len(blits) == 2 and visualizer.connection_text.get_text().endswith('Connected')
+
+        visualizer.invalidate()
+        visualizer.update_plot()
+        assert len(draws) == 2 and len(visualizer.frame_times) == 4
+    finally:
+        plt.close(visualizer.fig)
+
+class MouseEvent:
+    def __init__(self, visualizer, y, z, button=1):
+        self.inaxes = visualizer.ax
+        self.xdata, self.ydata = y, z
+        self.button = button
+
+def test_drag_events_are_coalesced_per_frame(visualizer, sent):
+    visualizer.render = lambda: None    # Only the drag bookkeeping is under test
+    visualizer.enable_drag(command_rate=10.0)
+    visualizer._on_press(MouseEvent(visualizer, 20.0, 5.0))
+    for i in range(5):
+        visualizer._on_motion(MouseEvent(visualizer, 20.0 - i, 5.0 + i))
+    visualizer.advance_animation(0.0)
+    # Six events, one IK solve and one command
+    assert visualizer.drag_events == 6 and visualizer.drag_updates == 1
+    assert visualizer.arm.target == (16.0, 9.0) and len(sent) == 1
+
+    # A motion event every 20 ms frame: commands keep to 10 a second
+    for frame in range(1, 51):
+        visualizer._on_motion(MouseEvent(visualizer, 16.0 - 0.1 * frame, 9.0 + 0.1 * frame))
+        visualizer.advance_animation(0.02 * frame)
+    assert visualizer.drag_updates == 51 and len(sent) == 11
+
+    # Releasing sends the final target as soon as the display settles
+    visualizer._on_release(MouseEvent(visualizer, 10.0, 15.0))
+    now = 1.0
+    while visualizer.advance_animation(now):
+        now += 0.02
+    theta1, theta2, _ = RoboticArm(12.5, 14, tcp_sender=object()).inverse_kinematics(10.0, 15.0)
+    np.testing.assert_allclose(sent[-1], (theta1, theta2))
+    assert len(sent) == 12
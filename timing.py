@@ -0,0 +1,60 @@
+"""
+Timing model of the firmware's servo_control_task (firmware/main.c).
+
+The firmware runs one command at a time: go_smooth moves servo 0 one
+degree every STEP_MS, pauses SERVO0_PAUSE_MS, then moves servo 1 (theta2
+wrapped above 180 and clamped to 135) and pauses SERVO1_PAUSE_MS (then the
+wrist servo and another SERVO1_PAUSE_MS for firmware built with
+JOINT_COUNT 3). When idle it polls its queue every IDLE_POLL_MS, and
+streamed waypoints start STREAM_BUFFER_MS after the first one arrives.
+
+emulator.py runs this model against a real connection; scheduler.py,
+jobs.py and simulation.py use it to predict the arm's motion.
+"""
+import numpy as np
+
+# Firmware timing constants (ms)
+STEP_MS = 10
+SERVO0_PAUSE_MS = 1000
+SERVO1_PAUSE_MS = 500
+IDLE_POLL_MS = 50
+STREAM_BUFFER_MS = 60
+STREAM_LATE_MS = 20
+
+def servo1_angle(angle):
+    """Firmware mapping for the second joint: wrap above 180, clamp to 135."""
+    if angle > 180:
+        angle = 360 - angle
+    return min(angle, 135)
+
+def servo_position(angle):
+    """Physical servo position for a commanded angle (duty clamped to 0-180)."""
+    return min(max(angle, 0), 180)
+
+def move_times(angles, last=None):
+    """
+    Time the firmware spends on each legacy command before taking the next.
+
+    Mirrors servo_control_task: go_smooth on servo 0 (one 10 ms step per
+    degree, plus the final write), the servo 0 pause, go_smooth on servo 1
+    and the servo 1 pause.
+
+    Args:
+        angles (array_like): (N, 2) commanded angles as sent on the wire
+            (theta1 and |theta2| in whole degrees)
+        last (tuple): Previous command's angles, or None after boot (when
+            go_smooth writes the first target in a single step)
+
+    Returns:
+        ndarray: (N,) seconds per command
+    """
+    angles = np.asarray(angles, dtype=int).reshape(-1, 2)
+    if len(angles) == 0:
+        return np.zeros(0)
+    a0 = angles[:, 0]
+    a1 = np.minimum(np.where(angles[:, 1] > 180, 360 - angles[:, 1], angles[:, 1]), 135)
+    first = angles[0] if last is None else np.asarray(last, dtype=int)
+    prev0 = np.concatenate(([first[0]], a0[:-1]))
+    prev1 = np.concatenate(([servo1_angle(int(first[1]))], a1[:-1]))
+    steps = np.abs(a0 - prev0) + np.abs(a1 - prev1) + 2
+    return (steps * STEP_MS + SERVO0_PAUSE_MS + SERVO1_PAUSE_MS) / 1000.0
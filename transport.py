@@ -0,0 +1,290 @@
+"""
+Pluggable arm transports.
+
+RoboticArm only ever calls its sender through one small surface:
+send_angles(*angles), connected, port, start_server() and cleanup(), plus
+send_batch and send_waypoints where the transport supports them. Any
+object with that surface can carry the commands:
+
+- 'asyncio' / 'threaded': the TCP servers in app.py (AsyncTCPSender,
+  TCPSender); ordered and reliable, so a lost segment holds back every
+  newer pose until it is retransmitted
+- 'udp': UDPSender, one framed command per datagram; the arm applies a
+  datagram only if its sequence number is newer than the last one it
+  applied, so a late or reordered pose is dropped instead of undoing a
+  newer one, and a lost pose is simply superseded by the next
+- 'loopback': LoopbackSender, hands the caller's angles straight to an
+  in-process callback (no packing, copies, threads or sockets) for tests
+  and simulations
+
+UDP wire format: the arm sends a UDP_HELLO datagram (magic, next expected
+sequence number) to the host's port every UDP_HELLO_MS; the host sends
+command frames (app.FRAME_HEADER + FRAME_BATCH) back to the address the
+last hello came from. See firmware/main.c (built with USE_UDP 1) and
+emulator.py --transport udp.
+"""
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from app import (TCPSender, AsyncTCPSender, FRAME_MAX_COMMANDS, make_packer,
+                 pack_command, record_write, format_degrees, log, command_log, CONNECTIONS,
+                 FRAMES_SENT, SEND_ERRORS)
+
+UDP_HELLO_MAGIC = 0x484D5241        # b"ARMH"
+UDP_HELLO = struct.Struct('<II')    # magic, next expected sequence number
+UDP_HELLO_MS = 500
+
+def make_sender(transport='asyncio', port=3000, protocol='framed'):
+    """
+    Create the sender for a transport (not started).
+
+    Args:
+        transport (str): One of TRANSPORTS
+        port (int): Port the host listens on (shown for 'loopback')
+        protocol (str): Wire protocol, 'framed' or 'legacy' ('udp' needs
+            'framed'; 'loopback' sends no bytes at all)
+
+    Returns:
+        Sender with the send_angles/connected/port/start_server/cleanup
+        surface
+    """
+    if transport == 'asyncio':
+        return AsyncTCPSender(port, protocol=protocol)
+    if transport == 'threaded':
+        return TCPSender(port, protocol)
+    if transport == 'udp':
+        return UDPSender(port, protocol=protocol)
+    if transport == 'loopback':
+        return LoopbackSender(port=port)
+    raise ValueError(f"unknown transport: {transport!r}")
+
+class UDPSender:
+    label = 'UDP'
+
+    def __init__(self, port=3000, peer_timeout=2.0, protocol='framed'):
+        """
+        Initialize the UDP sender.
+
+        Same surface as AsyncTCPSender, but every command is one datagram
+        sent straight from the calling thread: nothing queues behind a lost
+        packet and there is no connection to re-establish. The arm is
+        found from its hello datagrams; until one arrives the latest pose
+        is only remembered, and it is sent as soon as the arm says hello.
+
+        Args:
+            port (int): UDP port to listen on for arm hellos
+            peer_timeout (float): Seconds without a hello before the arm
+                counts as disconnected
+            protocol (str): Wire protocol; must be 'framed', the sequence
+                numbers are what lets the arm drop stale datagrams
+        """
+        if protocol != 'framed':
+            raise ValueError("UDP needs the framed protocol (sequence numbers)")
+        self.port = port
+        self.protocol = protocol
+        self.packer = make_packer(protocol)
+        self.peer_timeout = peer_timeout
+        self.running = False
+        self.sock = None
+        self.receive_thread = None
+        self.peer = None
+        self.last_hello = None
+        self.last_angles = None
+        # Packing reuses one buffer, and hellos resend from their own thread
+        self.lock = threading.Lock()
+
+    @property
+    def connected(self):
+        """Whether the arm has said hello within peer_timeout."""
+        return self.last_hello is not None and time.monotonic() - self.last_hello < self.peer_timeout
+
+    def start_server(self):
+        """Bind the port and start listening for arm hellos."""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("", self.port))
+        self.sock.settimeout(0.2)
+        self.running = True
+        log.info("Starting UDP server, waiting for the arm's hello...")
+        self.receive_thread = threading.Thread(target=self._receive_thread)
+        self.receive_thread.daemon = True
+        self.receive_thread.start()
+
+    def _receive_thread(self):
+        """Track the arm's address from its hello datagrams."""
+        while self.running:
+            try:
+                data, address = self.sock.recvfrom(64)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if len(data) < UDP_HELLO.size:
+                continue
+            magic, expected = UDP_HELLO.unpack_from(data)
+            if magic != UDP_HELLO_MAGIC:
+                continue
+            new_peer = not self.connected or address != self.peer
+            with self.lock:
+                if new_peer:
+                    # Carry on from the arm's sequence number, so a restarted
+                    # host is not taken for a stale one
+                    self.packer.sequence = expected
+                    self.peer = address
+                self.last_hello = time.monotonic()
+            if new_peer:
+                CONNECTIONS.inc()
+                log.info("Arm hello from: %s", address)
+                # The arm may have missed commands while it was away
+                if self.last_angles is not None:
+                    self._send_pose(self.last_angles)
+
+    def _sendto(self, data):
+        """Send one datagram to the arm; returns False if it failed."""
+        try:
+            self.sock.sendto(data, self.peer)
+        except OSError as e:
+            log.warning("Sender error: %s", e)
+            SEND_ERRORS.inc()
+            return False
+        return True
+
+    def _send_pose(self, angles):
+        """Pack and send one pose command."""
+        with self.lock:
+            data, degrees = pack_command(self.packer, angles)
+            start = time.perf_counter() if metrics.enabled else None
+            sent = self._sendto(data)
+        if sent:
+            record_write(start, len(data))
+            command_log.info("[Sent] FINAL TARGET ANGLES: %s", format_degrees(degrees))
+
+    def send_angles(self, *angles):
+        """
+        Send the angles now, superseding any earlier command.
+
+        Args:
+            *angles (float): Joint angles in radians (theta1, theta2, ...)
+        """
+        self.last_angles = angles
+        if self.running and self.connected:
+            self._send_pose(angles)
+
+    def send_batch(self, commands, replace=False):
+        """
+        Send poses the firmware runs in order, one frame per datagram.
+
+        Delivery is best effort: a lost frame's poses are skipped (the
+        firmware logs the gap) rather than holding back the rest.
+
+        Args:
+            commands (array_like): (count, joints) joint angles in radians
+            replace (bool): Drop poses the firmware has queued but not run
+        """
+        commands = np.atleast_2d(np.asarray(commands, dtype=float))
+        if len(commands):
+            self.last_angles = tuple(commands[-1])
+        if not (self.running and self.connected):
+            return
+        for i in range(0, len(commands), FRAME_MAX_COMMANDS):
+            with self.lock:
+                data = self.packer.pack(commands[i:i + FRAME_MAX_COMMANDS], replace and i == 0)
+                start = time.perf_counter() if metrics.enabled else None
+                sent = self._sendto(data)
+            if sent:
+                record_write(start, len(data), sent=FRAMES_SENT)
+
+    def send_waypoints(self, waypoints, new_stream=False):
+        """Waypoint streams must arrive complete and in order."""
+        raise ValueError("waypoint streaming needs a TCP transport")
+
+    def cleanup(self):
+        """Close the socket and stop the hello thread."""
+        self.running = False
+        if self.sock is not None:
+            self.sock.close()
+        if self.receive_thread is not None and self.receive_thread is not threading.current_thread():
+            self.receive_thread.join(1)
+        self.last_hello = None
+
+class LoopbackSender:
+    label = 'Loopback'
+
+    def __init__(self, on_angles=None, port=None):
+        """
+        Initialize an in-process sender.
+
+        Commands go to the callbacks synchronously, as the exact objects
+        the caller passed: nothing is packed or copied, so a test or
+        simulation sees every command the arm would have been sent. With
+        no callbacks the sender just keeps the latest pose.
+
+        Args:
+            on_angles (callable): Called with the angles tuple of every
+                send_angles
+            port (int): Port reported to the GUI; nothing is opened
+        """
+        self.port = port
+        self.packer = None
+        self.connected = False
+        self.on_angles = on_angles
+        # Optional: on_batch(commands, replace), on_waypoints(waypoints, new_stream)
+        self.on_batch = None
+        self.on_waypoints = None
+        self.last_angles = None
+        self.commands_sent = 0
+
+    def start_server(self):
+        """Start delivering commands."""
+        self.connected = True
+
+    def send_angles(self, *angles):
+        """
+        Deliver the angles to on_angles.
+
+        Args:
+            *angles (float): Joint angles in radians (theta1, theta2, ...)
+        """
+        self.last_angles = angles
+        if not self.connected:
+            return
+        start = time.perf_counter() if metrics.enabled else None
+        if self.on_angles is not None:
+            self.on_angles(angles)
+        self.commands_sent += 1
+        record_write(start, 0)
+
+    def send_batch(self, commands, replace=False):
+        """
+        Deliver poses the arm would run in order to on_batch.
+
+        Args:
+            commands (array_like): (count, joints) joint angles in radians
+            replace (bool): Drop poses queued but not run
+        """
+        if len(commands):
+            self.last_angles = tuple(commands[-1])
+        if self.connected and self.on_batch is not None:
+            self.on_batch(commands, replace)
+
+    def send_waypoints(self, waypoints, new_stream=False):
+        """
+        Deliver a batch of time-stamped waypoints to on_waypoints.
+
+        Args:
+            waypoints (list): (t, theta1, theta2) tuples, see pack_waypoints
+            new_stream (bool): First batch of a new move
+        """
+        if waypoints:
+            self.last_angles = tuple(waypoints[-1][1:])
+        if self.connected and self.on_waypoints is not None:
+            self.on_waypoints(waypoints, new_stream)
+
+    def cleanup(self):
+        """Stop delivering commands."""
+        self.connected = False
@@ -0,0 +1,157 @@
+"""
+Joint limits and the feasible workspace they leave.
+
+The firmware does not execute every pose the IK can produce: the base
+servo is clamped to 0-180 degrees, and the elbow command is mapped to a
+bend angle (360 - x above 180) that is clamped to 135 degrees. JointLimits
+describes those limits on the host, so the IK can tell which targets the
+real arm reaches and where it goes instead.
+
+The arm only has the elbow-up branch, which is one-to-one on the limit
+box. So the feasible workspace is the image of the box, and its boundary
+is the image of the box edges. Each edge traces a circular arc: a fixed
+base angle swings the forearm around the elbow, and a fixed bend swings
+the whole arm around the base. The nearest feasible pose to any target
+is therefore the best of a closed-form projection onto each arc plus the
+four corners. That costs a few vectorized trig calls, with no search or
+spatial index.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+class JointLimits(namedtuple('JointLimits', 'theta1_min theta1_max bend_min bend_max')):
+    """
+    Joint ranges in radians.
+
+    theta1 is the base angle as RoboticArm computes it. The bend is the
+    elbow angle the servo gets: 2*pi - theta2 for the elbow-up solution,
+    0 when the arm is straight.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_degrees(cls, theta1_min, theta1_max, bend_min, bend_max):
+        """
+        Build limits from degrees.
+
+        Args:
+            theta1_min (float): Lowest base angle
+            theta1_max (float): Highest base angle
+            bend_min (float): Smallest elbow bend
+            bend_max (float): Largest elbow bend
+
+        Returns:
+            JointLimits: The limits in radians
+        """
+        return cls(*np.radians([theta1_min, theta1_max, bend_min, bend_max]).tolist())
+
+    def contains(self, theta1, theta2):
+        """
+        Check whether poses are within the limits.
+
+        Args:
+            theta1 (array_like): Base angles in radians
+            theta2 (array_like): Elbow angles in radians (RoboticArm's
+                convention, 2*pi - bend)
+
+        Returns:
+            bool or ndarray: Whether each pose is within the limits
+        """
+        bend = (2 * np.pi - np.asarray(theta2)) % (2 * np.pi)
+        theta1 = np.asarray(theta1) % (2 * np.pi)
+        eps = 1e-9
+        return ((theta1 >= self.theta1_min - eps) & (theta1 <= self.theta1_max + eps)
+                & (bend >= self.bend_min - eps) & (bend <= self.bend_max + eps))
+
+    def clip(self, theta1, theta2):
+        """
+        Clamp poses into the limits joint by joint, like the servos do.
+
+        Args:
+            theta1 (array_like): Base angles in radians
+            theta2 (array_like): Elbow angles in radians
+
+        Returns:
+            tuple: (theta1, theta2) within the limits
+        """
+        theta1 = np.clip(np.asarray(theta1) % (2 * np.pi), self.theta1_min, self.theta1_max)
+        bend = np.clip((2 * np.pi - np.asarray(theta2)) % (2 * np.pi), self.bend_min, self.bend_max)
+        return theta1, 2 * np.pi - bend
+
+    def project(self, ys, zs, l1, l2):
+        """
+        Find the feasible poses whose end effectors are nearest to targets.
+
+        Args:
+            ys (array_like): Target y coordinates in cm
+            zs (array_like): Target z coordinates in cm
+            l1 (float or array_like): First segment lengths in cm
+            l2 (float or array_like): Second segment lengths in cm, either
+                may also be one per target
+
+        Returns:
+            tuple: (theta1s, theta2s) arrays in RoboticArm's convention
+        """
+        ys, zs, l1, l2 = np.broadcast_arrays(np.asarray(ys, dtype=float), np.asarray(zs, dtype=float),
+                                             np.asarray(l1, dtype=float), np.asarray(l2, dtype=float))
+        ys = ys[..., None]
+        zs = zs[..., None]
+        l1 = l1[..., None]
+        l2 = l2[..., None]
+        t_lo, t_hi, b_lo, b_hi = self
+        wrap = lambda a: (a + np.pi) % (2 * np.pi) - np.pi
+
+        # Fixed base angle: the forearm swings around the elbow, aim it at
+        # the target. The bend is measured clockwise from the upper arm
+        t_edge = np.array([t_lo, t_hi])
+        elbow_y = l1 * np.cos(t_edge)
+        elbow_z = l1 * np.sin(t_edge)
+        b_free = np.clip(wrap(t_edge - np.arctan2(zs - elbow_z, ys - elbow_y)), b_lo, b_hi)
+
+        # Fixed bend: the whole arm swings around the base at a constant
+        # radius, aim the end effector at the target
+        b_edge = np.array([b_lo, b_hi])
+        offset = np.arctan2(-l2 * np.sin(b_edge), l1 + l2 * np.cos(b_edge))
+        t_free = np.clip(wrap(np.arctan2(zs, ys) - offset), t_lo, t_hi)
+
+        # Candidates: two arcs of each kind plus the four corners
+        shape = b_free.shape[:-1]
+        t = np.concatenate((np.broadcast_to(t_edge, shape + (2,)), t_free,
+                            np.broadcast_to([t_lo, t_lo, t_hi, t_hi], shape + (4,))), axis=-1)
+        b = np.concatenate((b_free, np.broadcast_to(b_edge, shape + (2,)),
+                            np.broadcast_to([b_lo, b_hi, b_lo, b_hi], shape + (4,))), axis=-1)
+        ee_y = l1 * np.cos(t) + l2 * np.cos(t - b)
+        ee_z = l1 * np.sin(t) + l2 * np.sin(t - b)
+        best = np.argmin((ee_y - ys)**2 + (ee_z - zs)**2, axis=-1)[..., None]
+        theta1 = np.take_along_axis(t, best, -1)[..., 0] % (2 * np.pi)
+        theta2 = 2 * np.pi - np.take_along_axis(b, best, -1)[..., 0]
+        return theta1, theta2
+
+    def boundary(self, l1, l2, step=np.radians(1.0)):
+        """
+        Outline of the feasible workspace, e.g. for plotting.
+
+        Args:
+            l1 (float): First segment length in cm
+            l2 (float): Second segment length in cm
+            step (float): Joint angle step between outline points in radians
+
+        Returns:
+            ndarray: (M, 2) closed polygon of (y, z) points in cm
+        """
+        t_lo, t_hi, b_lo, b_hi = self
+        n_t = max(2, int(np.ceil((t_hi - t_lo) / step)) + 1)
+        n_b = max(2, int(np.ceil((b_hi - b_lo) / step)) + 1)
+        sweep_t = np.linspace(t_lo, t_hi, n_t)
+        sweep_b = np.linspace(b_lo, b_hi, n_b)
+        # Walk the box edges in order: straight arm, high base, full bend
+        # (backwards), low base (backwards)
+        t = np.concatenate((sweep_t, np.full(n_b, t_hi), sweep_t[::-1], np.full(n_b, t_lo)))
+        b = np.concatenate((np.full(n_t, b_lo), sweep_b, np.full(n_t, b_hi), sweep_b[::-1]))
+        return np.stack((l1 * np.cos(t) + l2 * np.cos(t - b),
+                         l1 * np.sin(t) + l2 * np.sin(t - b)), axis=-1)
+
+# What firmware/main.c and servo.c actually execute: servo_write clamps the
+# base to 0-180 and servo1_angle clamps the bend to 135
+FIRMWARE_LIMITS = JointLimits.from_degrees(0, 180, 0, 135)